@@ -0,0 +1,76 @@
+"""notifications outbox
+
+Revision ID: 3b9d2c41e7a0
+Revises: 576695fdb298
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9d2c41e7a0"
+down_revision: Union[str, None] = "576695fdb298"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("channel", sa.String(), nullable=False),
+        sa.Column("recipient", sa.String(), nullable=False),
+        sa.Column("alert_id", sa.Integer(), nullable=True),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["alert_id"],
+            ["alerts.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("outbox_due_index", "outbox", ["status", "channel", "next_attempt_at"], unique=False)
+    # move deliveries to the outbox
+    op.execute(
+        """
+        INSERT INTO outbox (channel, recipient, alert_id, payload, priority, status, attempts)
+        SELECT 'telegram', receiver_id::varchar, alert_id, '{}', 0,
+               CASE WHEN delivered THEN 'sent' ELSE 'pending' END, 0
+        FROM alert_deliveries
+        """
+    )
+    op.drop_table("alert_deliveries")
+
+
+def downgrade() -> None:
+    op.create_table(
+        "alert_deliveries",
+        sa.Column("alert_id", sa.Integer(), nullable=False),
+        sa.Column("receiver_id", sa.Integer(), nullable=False),
+        sa.Column("delivered", sa.Boolean(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["alert_id"],
+            ["alerts.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute(
+        """
+        INSERT INTO alert_deliveries (alert_id, receiver_id, delivered)
+        SELECT alert_id, recipient::integer, status <> 'pending'
+        FROM outbox
+        WHERE channel = 'telegram' AND alert_id IS NOT NULL
+        """
+    )
+    op.drop_index("outbox_due_index", table_name="outbox")
+    op.drop_table("outbox")
@@ -0,0 +1,26 @@
+"""alert snapshots
+
+Revision ID: 8c4e1f0b5a62
+Revises: 3b9d2c41e7a0
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8c4e1f0b5a62"
+down_revision: Union[str, None] = "3b9d2c41e7a0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("alerts", sa.Column("snapshot", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("alerts", "snapshot")
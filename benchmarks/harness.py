@@ -0,0 +1,126 @@
+"""
+Timing of concurrent calls and machine-readable results.
+"""
+
+import asyncio
+import dataclasses
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+
+@dataclasses.dataclass
+class Measurement:
+    name: str
+    iterations: int
+    concurrency: int
+    # seconds of each successful call
+    timings: list[float] = dataclasses.field(repr=False)
+    elapsed: float
+    errors: int = 0
+    # parameters of the case (payload size, table size, ...)
+    params: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    def summary(self) -> dict[str, Any]:
+        timings = sorted(self.timings)
+
+        def percentile(p: float) -> Optional[float]:
+            if not timings:
+                return None
+            return round(timings[min(len(timings) - 1, int(len(timings) * p))] * 1000, 4)
+
+        return {
+            "name": self.name,
+            "params": self.params,
+            "iterations": self.iterations,
+            "concurrency": self.concurrency,
+            "errors": self.errors,
+            "throughput": round(len(timings) / self.elapsed, 2) if self.elapsed else None,
+            "mean_ms": round(statistics.mean(timings) * 1000, 4) if timings else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(timings[-1] * 1000, 4) if timings else None,
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        if not self.timings:
+            return f"{self.name:<40} failed ({self.errors} errors)"
+        return (
+            f"{self.name:<40} {s['throughput']:>10.1f} calls/s"
+            f" | p50 {s['p50_ms']:.3f} ms | p99 {s['p99_ms']:.3f} ms | errors {self.errors}"
+        )
+
+
+async def measure(
+    name: str,
+    call: Callable[[], Awaitable[Any]],
+    iterations: int,
+    concurrency: int = 1,
+    warmup: int = 0,
+    before_each: Optional[Callable[[], Awaitable[Any]]] = None,
+    **params: Any,
+) -> Measurement:
+    """
+    Run `call` `iterations` times by `concurrency` workers. `before_each` is awaited before every call and is not
+    timed (e.g. to reset the state changed by the call).
+    """
+    for _ in range(warmup):
+        if before_each is not None:
+            await before_each()
+        await call()
+
+    timings: list[float] = []
+    errors = 0
+    queue = iter(range(iterations))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            if before_each is not None:
+                await before_each()
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            else:
+                timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return Measurement(
+        name=name,
+        iterations=iterations,
+        concurrency=concurrency,
+        timings=timings,
+        elapsed=time.perf_counter() - started,
+        errors=errors,
+        params=params,
+    )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: Path, measurements: list[Measurement], **environment: Any):
+    results = {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **environment,
+        "results": [measurement.summary() for measurement in measurements],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, ensure_ascii=False))
@@ -0,0 +1,170 @@
+"""
+Local stand-ins for the services the API talks to: a throwaway Postgres cluster, an SSH server which accepts any
+command and an Alertmanager webhook payload generator.
+"""
+
+import asyncio
+import datetime
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import paramiko
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _postgres_bin(name: str) -> str:
+    path = shutil.which(name)
+    if path is None and shutil.which("pg_config"):
+        bindir = subprocess.run(["pg_config", "--bindir"], capture_output=True, text=True).stdout.strip()
+        candidate = Path(bindir) / name
+        path = str(candidate) if candidate.exists() else None
+    if path is None:
+        raise RuntimeError(f"`{name}` is not found, install Postgres or pass --db-url")
+    return path
+
+
+@asynccontextmanager
+async def local_postgres(db_url: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Yield URL of a database for the benchmarks. A new cluster is created with `initdb` in a temporary directory
+    (and removed afterwards) unless `db_url` is given. `initdb` refuses to run as root.
+    """
+    if db_url:
+        yield db_url
+        return
+
+    initdb, pg_ctl = _postgres_bin("initdb"), _postgres_bin("pg_ctl")
+    port = _free_port()
+
+    with tempfile.TemporaryDirectory(prefix="monitoring-bench-") as directory:
+        data = Path(directory) / "data"
+        subprocess.run(
+            [initdb, "-D", str(data), "-U", "postgres", "-A", "trust", "--no-sync"],
+            check=True,
+            capture_output=True,
+        )
+        options = f"-p {port} -k {directory} -c listen_addresses=127.0.0.1 -c fsync=off"
+        subprocess.run(
+            [pg_ctl, "-D", str(data), "-o", options, "-l", str(Path(directory) / "log"), "-w", "start"],
+            check=True,
+            capture_output=True,
+        )
+        try:
+            yield f"postgresql+asyncpg://postgres@127.0.0.1:{port}/postgres"
+        finally:
+            await asyncio.to_thread(
+                subprocess.run, [pg_ctl, "-D", str(data), "-m", "immediate", "-w", "stop"], capture_output=True
+            )
+
+
+class _AnyCommandServer(paramiko.ServerInterface):
+    def __init__(self, username: str, password: str):
+        self.username = username
+        self.password = password
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password"
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        if (username, password) == (self.username, self.password):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel: paramiko.Channel, command: bytes) -> bool:
+        # the command is not executed, the reply is sent after the request is acknowledged
+        threading.Thread(target=self._finish, args=(channel,), daemon=True).start()
+        return True
+
+    @staticmethod
+    def _finish(channel: paramiko.Channel):
+        # closing the channel here could overtake the reply to the exec request, it is closed with the connection
+        channel.send_exit_status(0)
+        channel.shutdown_write()
+
+
+@contextmanager
+def ssh_stand_in(username: str = "bench", password: str = "bench") -> Iterator[tuple[str, int]]:
+    """
+    SSH server on localhost which accepts the password and answers every command with exit status 0.
+    Yields (host, port).
+    """
+    host_key = paramiko.RSAKey.generate(2048)
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(64)
+    transports: list[paramiko.Transport] = []
+
+    def serve(connection: socket.socket):
+        transport = paramiko.Transport(connection)
+        transport.add_server_key(host_key)
+        transports.append(transport)
+        try:
+            transport.start_server(server=_AnyCommandServer(username, password))
+        except (paramiko.SSHException, EOFError, OSError):
+            transport.close()
+
+    def accept_loop():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:  # listener is closed
+                return
+            threading.Thread(target=serve, args=(connection,), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    try:
+        yield listener.getsockname()
+    finally:
+        listener.close()
+        for transport in transports:
+            transport.close()
+
+
+def alertmanager_payload(size: int, target_alias: str, alertname: str = "bench_alert") -> dict[str, Any]:
+    """
+    Alertmanager webhook payload (version 4) with `size` firing alerts of one group.
+    """
+    starts_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    labels = {"alertname": alertname, "target": target_alias, "severity": "critical", "job": "postgres"}
+    alerts = [
+        {
+            "status": "firing",
+            "labels": {**labels, "instance": f"bench-{i}:9187"},
+            "annotations": {"summary": f"Benchmark alert {i}", "description": "Generated by the benchmarks"},
+            "startsAt": starts_at,
+            "endsAt": "0001-01-01T00:00:00Z",
+            "generatorURL": "http://prometheus:9090/graph",
+            "fingerprint": os.urandom(8).hex(),
+        }
+        for i in range(size)
+    ]
+    return {
+        "receiver": "webhook",
+        "status": "firing",
+        "alerts": alerts,
+        "groupLabels": {"alertname": alertname},
+        "commonLabels": labels,
+        "commonAnnotations": {},
+        "externalURL": "http://alertmanager:9093",
+        "version": "4",
+        "groupKey": f'{{}}:{{alertname="{alertname}"}}',
+        "truncatedAlerts": 0,
+    }
@@ -0,0 +1,209 @@
+"""
+Benchmarks of the hot paths: execution of views, ingest of Alertmanager webhooks, polling of due deliveries and steps
+of actions.
+"""
+
+import datetime
+
+import httpx
+from sqlalchemy import text
+
+from benchmarks.harness import Measurement, measure
+from benchmarks.standins import alertmanager_payload
+from src.config import settings
+from src.modules.alerts.ingest import AlertIngestQueue
+from src.modules.outbox.repository import OutboxRepository
+from src.modules.pg.repository import PgRepository
+from src.storages.monitoring.config import settings as monitoring_settings
+from src.storages.sqlalchemy import SQLAlchemyStorage
+from src.storages.sqlalchemy.models.outbox import OutboxChannel
+
+TARGET_ALIAS = "bench"
+
+
+async def views(pg_repository: PgRepository, iterations: int, concurrency: int) -> list[Measurement]:
+    """
+    Every configured view through each execution path. Views which fail on this server (e.g. a missing extension)
+    are skipped.
+    """
+    measurements = []
+
+    for view_alias, view in monitoring_settings.views.items():
+        paths = {
+            "sqlalchemy": lambda sql=view.sql: pg_repository.execute_sql_select(
+                sql, limit=20, offset=0, target_alias=TARGET_ALIAS, primary_only=True
+            ),
+            "hot": lambda sql=view.sql: pg_repository.execute_sql_select(
+                sql, limit=20, offset=0, target_alias=TARGET_ALIAS, primary_only=True, hot=True
+            ),
+            "server_json": lambda sql=view.sql: pg_repository.execute_sql_select_json(
+                sql, limit=20, offset=0, target_alias=TARGET_ALIAS, primary_only=True
+            ),
+        }
+        for path, call in paths.items():
+            try:
+                await call()
+            except Exception as e:
+                print(f"views.{view_alias}.{path} is skipped: {getattr(e, 'detail', None) or e!r}")
+                continue
+            measurements.append(
+                await measure(
+                    f"views.{view_alias}.{path}",
+                    call,
+                    iterations,
+                    concurrency,
+                    warmup=concurrency,
+                    view_alias=view_alias,
+                    path=path,
+                )
+            )
+    return measurements
+
+
+async def webhook(
+    client: httpx.AsyncClient,
+    alert_ingest_queue: AlertIngestQueue,
+    target_alias: str,
+    payload_sizes: list[int],
+    iterations: int,
+    concurrency: int,
+) -> list[Measurement]:
+    """
+    POST /alerts/alertmanager-callback with payloads of different sizes, through the whole ASGI application,
+    and the time the writer needs to save the queued alerts afterwards.
+    """
+    headers = {"Authorization": f"Bearer {settings.BOT_TOKEN.get_secret_value()}"}
+    measurements = []
+
+    for size in payload_sizes:
+        payload = alertmanager_payload(size, target_alias)
+
+        async def call():
+            response = await client.post("/alerts/alertmanager-callback", json=payload, headers=headers)
+            response.raise_for_status()
+
+        calls = max(10, iterations // size)
+        measurements.append(
+            await measure(
+                f"webhook.alerts_{size}",
+                call,
+                # the same number of alerts is ingested for every payload size
+                calls,
+                concurrency,
+                warmup=1,
+                payload_size=size,
+            )
+        )
+        measurements.append(
+            await measure(f"webhook.drain.alerts_{size}", alert_ingest_queue.flush, 1, payload_size=size, calls=calls)
+        )
+    return measurements
+
+
+async def _seed_alerts(storage: SQLAlchemyStorage, rows: int, pending: int):
+    """
+    `rows` alerts with one sent Telegram message each, `pending` of the messages are due.
+    """
+    async with storage.engine.begin() as connection:
+        await connection.execute(text("TRUNCATE alerts, outbox RESTART IDENTITY CASCADE"))
+        await connection.execute(
+            text(
+                "INSERT INTO alerts (alias, target_alias, timestamp, value) "
+                "SELECT 'bench_alert', :target_alias, now() - make_interval(secs => i), '{}' "
+                "FROM generate_series(1, :rows) AS i"
+            ),
+            {"rows": rows, "target_alias": TARGET_ALIAS},
+        )
+        await connection.execute(
+            text(
+                "INSERT INTO outbox (channel, recipient, alert_id, payload, priority, status, attempts) "
+                "SELECT 'telegram', '1', id, '{}', 0, 'sent', 1 FROM alerts"
+            )
+        )
+        await connection.execute(
+            text(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = now() "
+                "WHERE id IN (SELECT id FROM outbox ORDER BY random() LIMIT :pending)"
+            ),
+            {"pending": pending},
+        )
+    async with storage.engine.connect() as connection:
+        await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.execute(text("VACUUM ANALYZE alerts, outbox"))
+
+
+async def delivery_poll(storage: SQLAlchemyStorage, alerts_rows: list[int], iterations: int) -> list[Measurement]:
+    """
+    Leasing of due Telegram messages (as GET /alerts/delivery does) against `alerts` tables of different sizes,
+    when a batch of messages is due and when nothing is due.
+    """
+    outbox_repository = OutboxRepository(storage)
+    batch_size = settings.OUTBOX.BATCH_SIZE
+    lease_timeout = datetime.timedelta(seconds=settings.OUTBOX.LEASE_TIMEOUT)
+    measurements = []
+
+    async def set_due(due: bool):
+        next_attempt_at = "now() - interval '1 second'" if due else "now() + interval '1 day'"
+        async with storage.engine.begin() as connection:
+            await connection.execute(
+                text(f"UPDATE outbox SET next_attempt_at = {next_attempt_at}, attempts = 0 WHERE status = 'pending'")
+            )
+
+    async def poll():
+        await outbox_repository.lease_due(
+            [OutboxChannel.telegram],
+            limit=batch_size,
+            lease_timeout=lease_timeout,
+            alerts_since=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1),
+        )
+
+    for rows in alerts_rows:
+        await _seed_alerts(storage, rows, pending=batch_size * 2)
+
+        # leased messages are made due again before each poll
+        measurements.append(
+            await measure(
+                f"delivery_poll.due.alerts_{rows}",
+                poll,
+                iterations,
+                warmup=3,
+                before_each=lambda: set_due(True),
+                alerts_rows=rows,
+                batch_size=batch_size,
+            )
+        )
+        await set_due(False)
+        measurements.append(
+            await measure(
+                f"delivery_poll.idle.alerts_{rows}",
+                poll,
+                iterations,
+                warmup=3,
+                alerts_rows=rows,
+                batch_size=batch_size,
+            )
+        )
+    return measurements
+
+
+async def actions(pg_repository: PgRepository, iterations: int, concurrency: int) -> list[Measurement]:
+    """
+    Latency of single SQL and SSH steps of actions, the SSH step is executed by the local stand-in server.
+    """
+    return [
+        await measure(
+            "actions.sql_step",
+            lambda: pg_repository.execute_sql("SELECT 1", binds={}, target_alias=TARGET_ALIAS),
+            iterations,
+            concurrency,
+            warmup=concurrency,
+        ),
+        await measure(
+            "actions.ssh_step",
+            lambda: pg_repository.execute_ssh("true", binds={}, target_alias=TARGET_ALIAS),
+            # every step opens a new SSH connection
+            max(10, iterations // 10),
+            concurrency,
+            warmup=1,
+        ),
+    ]
@@ -6,11 +6,17 @@ from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from src.api import docs
-from src.api.routers import routers
+from src.api.routers import routers, include_dynamic_routes
 from src.config import settings, Environment
 from src.api.startup import setup_repositories
-from src.prometheus import generate_prometheus_configs
+from src.prometheus import generate_prometheus_configs, update_prometheus_alert_rules
+from src.storages.monitoring.config import MonitoringConfigChanges
+from src.storages.monitoring.reload import MonitoringConfigWatcher
 from src.api.docs import generate_unique_operation_id
+from src.api.compression import CompressionMiddleware
+from src.api.etag import ETagMiddleware
+from src.api.metrics import MetricsMiddleware
+from src.api.tracing import TracingMiddleware
 
 app = FastAPI(
     title=docs.TITLE,
@@ -39,28 +45,66 @@ if settings.CORS_ALLOW_ORIGINS:
         allow_headers=["*"],
     )
 
+# the ETag is computed from the uncompressed body, then the body is compressed
+app.add_middleware(ETagMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 if settings.SMTP_ENABLED:
     warnings.warn("SMTP and email connection is enabled!")
 else:
     warnings.warn("SMTP and email connection is disabled!")
 
 
+async def rebuild_dynamic_routes(changes: MonitoringConfigChanges):
+    if changes.actions or changes.views:
+        include_dynamic_routes(app)
+
+
+monitoring_config_watcher = MonitoringConfigWatcher(
+    interval=settings.MONITORING_RELOAD_INTERVAL or 0,
+    callbacks=[rebuild_dynamic_routes, update_prometheus_alert_rules],
+)
+
+
 @app.on_event("startup")
 async def startup_event():
+    from src.api.dependencies import Dependencies
+
     await setup_repositories()
+    await Dependencies.get_outbox_scheduler().start()
+    await Dependencies.get_alert_ingest_queue().start()
+    await Dependencies.get_target_health_prober().start()
+    await Dependencies.get_statement_sampler().start()
     await generate_prometheus_configs()
+    if settings.MONITORING_RELOAD_INTERVAL:
+        await monitoring_config_watcher.start()
 
 
 @app.on_event("shutdown")
 async def close_connection():
     from src.api.dependencies import Dependencies
 
+    await monitoring_config_watcher.stop()
+    # queued alerts are saved before the outbox scheduler and the snapshotter are stopped
+    await Dependencies.get_alert_ingest_queue().stop()
+    await Dependencies.get_outbox_scheduler().stop()
+    await Dependencies.get_target_health_prober().stop()
+    await Dependencies.get_statement_sampler().stop()
+    await Dependencies.get_alert_snapshotter().stop()
+    await Dependencies.get_view_execution_log().stop()
+    await Dependencies.get_prometheus_repository().close()
+    if settings.SMTP_ENABLED:
+        await Dependencies.get_smtp_repository().close()
+    await Dependencies.get_target_repository().close()
     storage = Dependencies.get_storage()
     await storage.close_connection()
 
 
 for router in routers:
     app.include_router(router)
+include_dynamic_routes(app)
 
 if settings.ENVIRONMENT == Environment.DEVELOPMENT:
     import logging
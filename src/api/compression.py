@@ -0,0 +1,130 @@
+__all__ = ["CompressionMiddleware", "negotiate_encoding"]
+
+import asyncio
+import gzip
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# bodies larger than this are compressed in a thread, so the event loop is not blocked
+THREAD_THRESHOLD = 64 * 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def _compressors() -> dict[str, Callable[[bytes], bytes]]:
+    # in the order of preference, when the client accepts several equally
+    compressors = {}
+    if zstandard is not None:
+        compressors["zstd"] = lambda body: zstandard.ZstdCompressor(level=settings.COMPRESSION.ZSTD_LEVEL).compress(
+            body
+        )
+    if brotli is not None:
+        compressors["br"] = lambda body: brotli.compress(body, quality=settings.COMPRESSION.BROTLI_QUALITY)
+    compressors["gzip"] = lambda body: gzip.compress(body, compresslevel=settings.COMPRESSION.GZIP_LEVEL, mtime=0)
+    return compressors
+
+
+COMPRESSORS = _compressors()
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Supported encoding with the highest `q` in the Accept-Encoding header, None if the client accepts none of them.
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        qualities[coding] = q
+
+    best, best_q = None, 0.0
+    for encoding in COMPRESSORS:
+        q = qualities.get(encoding, qualities.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress complete responses larger than `MINIMUM_SIZE` with the best encoding accepted by the client
+    (zstd and brotli if their packages are installed, gzip otherwise). Streamed responses are sent as is.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.COMPRESSION.ENABLED:
+            return await self.app(scope, receive, send)
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                # headers are sent with the first part of the body, when it is known whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            passthrough = True
+            headers = MutableHeaders(scope=start_message)
+            if start_message["status"] == 304:
+                # the cached response it refers to may be compressed
+                headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+            if (
+                message.get("more_body", False)
+                or len(body) < settings.COMPRESSION.MINIMUM_SIZE
+                or "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or "no-transform" in headers.get("cache-control", "")
+            ):
+                await send(start_message)
+                await send(message)
+                return
+
+            compress = COMPRESSORS[encoding]
+            if len(body) > THREAD_THRESHOLD:
+                body = await asyncio.to_thread(compress, body)
+            else:
+                body = compress(body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -7,6 +7,13 @@ __all__ = [
     "DEPENDS_WEBAPP",
     "DEPENDS_PG_STAT_REPOSITORY",
     "DEPENDS_ALERT_REPOSITORY",
+    "DEPENDS_ALERT_INGEST_QUEUE",
+    "DEPENDS_OUTBOX_REPOSITORY",
+    "DEPENDS_TARGET_REPOSITORY",
+    "DEPENDS_TARGET_HEALTH_PROBER",
+    "DEPENDS_VIEW_EXECUTION_LOG",
+    "DEPENDS_PROMETHEUS_REPOSITORY",
+    "DEPENDS_STATEMENT_SAMPLER",
     "DEPENDS_VERIFIED_REQUEST",
     "Dependencies",
 ]
@@ -14,9 +21,18 @@ __all__ = [
 from fastapi import Depends
 
 from src.modules.alerts.abc import AbstractAlertRepository
+from src.modules.alerts.ingest import AlertIngestQueue
+from src.modules.alerts.snapshots import AlertSnapshotter
+from src.modules.metrics_proxy.abc import AbstractPrometheusRepository
+from src.modules.outbox.abc import AbstractOutboxRepository
+from src.modules.outbox.scheduler import OutboxScheduler
 from src.modules.pg.abc import AbstractPgRepository
 from src.modules.smtp.abc import AbstractSMTPRepository
+from src.modules.statements.sampler import StatementSampler
+from src.modules.targets.abc import AbstractTargetRepository
+from src.modules.targets.prober import TargetHealthProber
 from src.modules.users.abc import AbstractUserRepository
+from src.modules.views.slow_log import ViewExecutionLog
 from src.storages.sqlalchemy.storage import AbstractSQLAlchemyStorage
 
 
@@ -26,6 +42,15 @@ class Dependencies:
     _smtp_repository: "AbstractSMTPRepository"
     _pg_stat_repository: "AbstractPgRepository"
     _alert_repository: "AbstractAlertRepository"
+    _outbox_repository: "AbstractOutboxRepository"
+    _outbox_scheduler: "OutboxScheduler"
+    _target_repository: "AbstractTargetRepository"
+    _target_health_prober: "TargetHealthProber"
+    _alert_snapshotter: "AlertSnapshotter"
+    _alert_ingest_queue: "AlertIngestQueue"
+    _view_execution_log: "ViewExecutionLog"
+    _prometheus_repository: "AbstractPrometheusRepository"
+    _statement_sampler: "StatementSampler"
 
     @classmethod
     def get_storage(cls) -> "AbstractSQLAlchemyStorage":
@@ -67,6 +92,78 @@ class Dependencies:
     def set_alert_repository(cls, alert_repository: "AbstractAlertRepository"):
         cls._alert_repository = alert_repository
 
+    @classmethod
+    def get_outbox_repository(cls) -> "AbstractOutboxRepository":
+        return cls._outbox_repository
+
+    @classmethod
+    def set_outbox_repository(cls, outbox_repository: "AbstractOutboxRepository"):
+        cls._outbox_repository = outbox_repository
+
+    @classmethod
+    def get_outbox_scheduler(cls) -> "OutboxScheduler":
+        return cls._outbox_scheduler
+
+    @classmethod
+    def set_outbox_scheduler(cls, outbox_scheduler: "OutboxScheduler"):
+        cls._outbox_scheduler = outbox_scheduler
+
+    @classmethod
+    def get_target_repository(cls) -> "AbstractTargetRepository":
+        return cls._target_repository
+
+    @classmethod
+    def set_target_repository(cls, target_repository: "AbstractTargetRepository"):
+        cls._target_repository = target_repository
+
+    @classmethod
+    def get_target_health_prober(cls) -> "TargetHealthProber":
+        return cls._target_health_prober
+
+    @classmethod
+    def set_target_health_prober(cls, target_health_prober: "TargetHealthProber"):
+        cls._target_health_prober = target_health_prober
+
+    @classmethod
+    def get_alert_snapshotter(cls) -> "AlertSnapshotter":
+        return cls._alert_snapshotter
+
+    @classmethod
+    def set_alert_snapshotter(cls, alert_snapshotter: "AlertSnapshotter"):
+        cls._alert_snapshotter = alert_snapshotter
+
+    @classmethod
+    def get_alert_ingest_queue(cls) -> "AlertIngestQueue":
+        return cls._alert_ingest_queue
+
+    @classmethod
+    def set_alert_ingest_queue(cls, alert_ingest_queue: "AlertIngestQueue"):
+        cls._alert_ingest_queue = alert_ingest_queue
+
+    @classmethod
+    def get_view_execution_log(cls) -> "ViewExecutionLog":
+        return cls._view_execution_log
+
+    @classmethod
+    def set_view_execution_log(cls, view_execution_log: "ViewExecutionLog"):
+        cls._view_execution_log = view_execution_log
+
+    @classmethod
+    def get_prometheus_repository(cls) -> "AbstractPrometheusRepository":
+        return cls._prometheus_repository
+
+    @classmethod
+    def set_prometheus_repository(cls, prometheus_repository: "AbstractPrometheusRepository"):
+        cls._prometheus_repository = prometheus_repository
+
+    @classmethod
+    def get_statement_sampler(cls) -> "StatementSampler":
+        return cls._statement_sampler
+
+    @classmethod
+    def set_statement_sampler(cls, statement_sampler: "StatementSampler"):
+        cls._statement_sampler = statement_sampler
+
 
 DEPENDS = Depends(lambda: Dependencies)
 """It's a dependency injection container for FastAPI.
@@ -76,6 +173,13 @@ DEPENDS_USER_REPOSITORY = Depends(Dependencies.get_user_repository)
 DEPENDS_SMTP_REPOSITORY = Depends(Dependencies.get_smtp_repository)
 DEPENDS_PG_STAT_REPOSITORY = Depends(Dependencies.get_pg_stat_repository)
 DEPENDS_ALERT_REPOSITORY = Depends(Dependencies.get_alert_repository)
+DEPENDS_ALERT_INGEST_QUEUE = Depends(Dependencies.get_alert_ingest_queue)
+DEPENDS_OUTBOX_REPOSITORY = Depends(Dependencies.get_outbox_repository)
+DEPENDS_TARGET_REPOSITORY = Depends(Dependencies.get_target_repository)
+DEPENDS_TARGET_HEALTH_PROBER = Depends(Dependencies.get_target_health_prober)
+DEPENDS_VIEW_EXECUTION_LOG = Depends(Dependencies.get_view_execution_log)
+DEPENDS_PROMETHEUS_REPOSITORY = Depends(Dependencies.get_prometheus_repository)
+DEPENDS_STATEMENT_SAMPLER = Depends(Dependencies.get_statement_sampler)
 
 from src.modules.auth.dependencies import verify_bot_token, verify_webapp, verify_request  # noqa: E402
 
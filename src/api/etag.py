@@ -0,0 +1,95 @@
+__all__ = ["ETagMiddleware", "ETAG_ROUTES"]
+
+import hashlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.metrics import route_template
+
+# routes with large responses which are polled and rarely change
+ETAG_ROUTES = {
+    "/views/",
+    "/views/{view_alias}",
+    "/views/batch",
+    "/actions/",
+    "/actions/{action_alias}",
+    "/alerts/by-id/{alert_id}",
+    "/metrics-proxy/panels",
+}
+# results of the generated view routes
+ETAG_ROUTE_PREFIXES = ("/views/execute/",)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # weak comparison, as required for If-None-Match
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag.removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def _has_etag(route: Optional[str]) -> bool:
+    return route is not None and (route in ETAG_ROUTES or route.startswith(ETAG_ROUTE_PREFIXES))
+
+
+class ETagMiddleware:
+    """
+    Weak ETag from the hash of the response body for GET requests of `ETAG_ROUTES`. If the client already has the
+    same body (`If-None-Match`), 304 without the body is sent instead.
+
+    The request is still handled (and authorized) as usual, only the transfer of unchanged data is saved.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                # the route is known once the request is routed
+                if message["status"] != 200 or not _has_etag(route_template(scope)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            passthrough = True
+            if message.get("more_body", False):
+                await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            headers = MutableHeaders(scope=start_message)
+            headers["ETag"] = etag
+            if "cache-control" not in headers:
+                # clients may keep the response, but must check it is still current
+                headers["Cache-Control"] = "private, no-cache"
+
+            if if_none_match is not None and _matches(if_none_match, etag):
+                not_modified = MutableHeaders()
+                for name in ("etag", "cache-control", "vary"):
+                    if name in headers:
+                        not_modified[name] = headers[name]
+                await send({"type": "http.response.start", "status": 304, "headers": not_modified.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
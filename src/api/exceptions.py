@@ -9,13 +9,23 @@ __all__ = [
     "ClientNotFound",
     "ActionNotFoundException",
     "ViewNotFoundException",
+    "PanelNotFoundException",
+    "AlertRuleNotFoundException",
+    "TargetNotFoundException",
+    "TargetUnavailableException",
+    "TargetBusyException",
+    "TraceNotFoundException",
+    "AlertQueueFullException",
     "UserAlreadyHasEmail",
     "ArgumentRequiredException",
     "WrongArgumentTypeException",
     "SQLQueryError",
     "SSHQueryError",
+    "PrometheusQueryError",
+    "PrometheusUnavailableException",
 ]
 
+import math
 from typing import Optional
 
 from fastapi import HTTPException
@@ -217,6 +227,107 @@ class ViewNotFoundException(HTTPException):
     responses = {404: {"description": "View with this alias not found"}}
 
 
+class PanelNotFoundException(HTTPException):
+    """
+    HTTP_404_NOT_FOUND
+    """
+
+    def __init__(self, panel_alias: str):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Panel with alias `{panel_alias}` not found",
+        )
+
+    responses = {404: {"description": "Panel with this alias not found"}}
+
+
+class AlertRuleNotFoundException(HTTPException):
+    """
+    HTTP_404_NOT_FOUND
+    """
+
+    def __init__(self, alert_alias: str):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Alert with alias `{alert_alias}` not found",
+        )
+
+    responses = {404: {"description": "Alert with this alias not found"}}
+
+
+class TargetNotFoundException(HTTPException):
+    """
+    HTTP_404_NOT_FOUND
+    """
+
+    def __init__(self, target_alias: str):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Target with alias `{target_alias}` not found",
+        )
+
+    responses = {404: {"description": "Target with this alias not found"}}
+
+
+class TraceNotFoundException(HTTPException):
+    """
+    HTTP_404_NOT_FOUND
+    """
+
+    def __init__(self, trace_id: str):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Trace `{trace_id}` not found, it may have been dropped from the buffer",
+        )
+
+    responses = {404: {"description": "Trace with this id not found"}}
+
+
+class TargetUnavailableException(HTTPException):
+    """
+    HTTP_503_SERVICE_UNAVAILABLE
+    """
+
+    def __init__(self, target_alias: str, component: str, retry_after: float = 0):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Target `{target_alias}` ({component}) is not available",
+            headers={"Retry-After": str(math.ceil(retry_after))} if retry_after else None,
+        )
+
+    responses = {503: {"description": "Target is not available"}}
+
+
+class TargetBusyException(HTTPException):
+    """
+    HTTP_503_SERVICE_UNAVAILABLE
+    """
+
+    def __init__(self, target_alias: str, component: str, retry_after: float = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Too many concurrent requests to target `{target_alias}` ({component})",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+    responses = {503: {"description": "Too many concurrent requests to the target"}}
+
+
+class AlertQueueFullException(HTTPException):
+    """
+    HTTP_503_SERVICE_UNAVAILABLE
+    """
+
+    def __init__(self, retry_after: float = 5):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many alerts are waiting to be saved, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+    responses = {503: {"description": "Queue of alerts is full"}}
+
+
 class SQLQueryError(HTTPException):
     """
     HTTP_400_BAD_REQUEST
@@ -243,3 +354,31 @@ class SSHQueryError(HTTPException):
         )
 
     responses = {400: {"description": "SSH query error"}}
+
+
+class PrometheusQueryError(HTTPException):
+    """
+    HTTP_400_BAD_REQUEST
+    """
+
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail,
+        )
+
+    responses = {400: {"description": "Prometheus rejected the query"}}
+
+
+class PrometheusUnavailableException(HTTPException):
+    """
+    HTTP_503_SERVICE_UNAVAILABLE
+    """
+
+    def __init__(self, detail: str = "Prometheus is not available"):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+        )
+
+    responses = {503: {"description": "Prometheus is not available or the query timed out"}}
@@ -0,0 +1,94 @@
+__all__ = ["MetricsMiddleware", "router", "route_template"]
+
+import time
+import weakref
+from typing import Callable, Optional
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import settings
+from src.metrics import REQUEST_DURATION
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# route templates by endpoints, endpoints of the reloaded views and actions are dropped with them
+_routes: weakref.WeakKeyDictionary[Callable, str] = weakref.WeakKeyDictionary()
+
+
+def route_template(scope: Scope) -> Optional[str]:
+    """
+    Template of the route which has handled the request, None if no route has matched.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return None
+
+    route = _routes.get(endpoint)
+    if route is None:
+        for candidate in scope["app"].router.routes:
+            if getattr(candidate, "endpoint", None) is endpoint:
+                route = _routes[endpoint] = candidate.path
+                break
+    return route
+
+
+class MetricsMiddleware:
+    """
+    Measure duration of requests, labelled by the route template (not the requested path) and by the view,
+    action and target of the request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    @staticmethod
+    def _labels(scope: Scope, route: str) -> tuple[str, str, str]:
+        from src.storages.monitoring.config import settings as monitoring_settings
+
+        view_alias = action_alias = ""
+        if route.startswith("/views/execute/"):
+            view_alias = route.removeprefix("/views/execute/")
+        elif route.startswith("/actions/execute/"):
+            action_alias = route.removeprefix("/actions/execute/")
+        elif route == "/views/{view_alias}":
+            view_alias = scope.get("path_params", {}).get("view_alias", "")
+            if view_alias not in monitoring_settings.views:
+                view_alias = ""
+
+        target_alias = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("target_alias", [""])[0]
+        # only configured targets, so the label cannot be flooded with arbitrary values
+        if target_alias not in settings.TARGETS:
+            target_alias = ""
+        return view_alias, action_alias, target_alias
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_template(scope)
+            # unmatched paths are not measured to keep the number of series bounded
+            if route is not None and route != "/metrics":
+                REQUEST_DURATION.labels(scope["method"], route, str(status), *self._labels(scope, route)).observe(
+                    time.perf_counter() - started
+                )
@@ -1,9 +1,47 @@
-from src.modules.actions.router import router as router_actions
+from fastapi import APIRouter, FastAPI
+
+from src.api.metrics import router as router_metrics
+from src.api.tracing import router as router_tracing
+from src.modules.actions.router import router as router_actions, build_action_routes
 from src.modules.alerts.router import router as router_alerts
+from src.modules.metrics_proxy.router import router as router_metrics_proxy
 from src.modules.pg.router import router as router_pg
+from src.modules.statements.router import router as router_statements
 from src.modules.users.router import router as router_users
-from src.modules.views.router import router as router_views
+from src.modules.views.router import router as router_views, build_view_routes
+
+routers = [
+    router_users,
+    router_pg,
+    router_statements,
+    router_actions,
+    router_alerts,
+    router_views,
+    router_metrics_proxy,
+    router_metrics,
+    router_tracing,
+]
+
+# routes generated from the monitoring config (actions.yaml, views.yaml)
+dynamic_routers_builders = [build_action_routes, build_view_routes]
+
+
+def include_dynamic_routes(app: FastAPI):
+    """
+    Include generated routes or replace the previously generated ones with the routes for the current
+    monitoring config.
+    """
+    generated = APIRouter()
+    for build in dynamic_routers_builders:
+        generated.include_router(build())
+
+    previous = {id(route) for route in getattr(app.state, "dynamic_routes", [])}
+    kept = [route for route in app.router.routes if id(route) not in previous]
+    # swap the list at once, so requests are routed either by old or by new routes
+    app.router.routes = kept + generated.routes
+    app.state.dynamic_routes = generated.routes
+    # regenerate OpenAPI schema
+    app.openapi_schema = None
 
-routers = [router_users, router_pg, router_actions, router_alerts, router_views]
 
-__all__ = ["routers"]
+__all__ = ["routers", "include_dynamic_routes"]
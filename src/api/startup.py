@@ -2,30 +2,65 @@ from src.config import settings
 
 
 async def setup_repositories():
+    from src.modules.alerts.ingest import AlertIngestQueue
     from src.modules.alerts.repository import AlertRepository
+    from src.modules.alerts.snapshots import AlertSnapshotter
+    from src.modules.metrics_proxy.repository import PrometheusRepository
+    from src.modules.outbox.handlers import email_handler
+    from src.modules.outbox.repository import OutboxRepository
+    from src.modules.outbox.scheduler import OutboxScheduler
     from src.modules.users.repository import UserRepository
+    from src.modules.views.slow_log import ViewExecutionLog
     from src.modules.pg.repository import PgRepository
     from src.modules.smtp.repository import SMTPRepository
+    from src.modules.statements.sampler import StatementSampler
+    from src.modules.targets.prober import TargetHealthProber
+    from src.modules.targets.repository import TargetRepository
     from src.storages.sqlalchemy import SQLAlchemyStorage
+    from src.storages.sqlalchemy.models.outbox import OutboxChannel
     from src.api.dependencies import Dependencies
 
     # ------------------- Repositories Dependencies -------------------
     storage = SQLAlchemyStorage.from_url(settings.DB_URL.get_secret_value())
     user_repository = UserRepository(storage)
     alert_repository = AlertRepository(storage)
-    # TODO: Add target repository
-    target = list(settings.TARGETS.values())[0]
-
-    target_storage = SQLAlchemyStorage.from_url(target.DB_URL.get_secret_value())
-    pg_stat = PgRepository(target_storage)
+    outbox_repository = OutboxRepository(storage)
+    target_repository = TargetRepository(settings.TARGETS)
+    pg_stat = PgRepository(target_repository)
 
     Dependencies.set_storage(storage)
     Dependencies.set_user_repository(user_repository)
+    Dependencies.set_target_repository(target_repository)
+    Dependencies.set_target_health_prober(
+        TargetHealthProber(
+            target_repository,
+            interval=settings.TARGETS_HEALTH.INTERVAL,
+            timeout=settings.TARGETS_HEALTH.TIMEOUT,
+        )
+    )
     Dependencies.set_pg_stat_repository(pg_stat)
+    Dependencies.set_view_execution_log(ViewExecutionLog(pg_stat))
+    Dependencies.set_prometheus_repository(PrometheusRepository())
+    Dependencies.set_statement_sampler(StatementSampler(pg_stat))
     Dependencies.set_alert_repository(alert_repository)
+    alert_snapshotter = AlertSnapshotter(alert_repository, pg_stat)
+    Dependencies.set_alert_snapshotter(alert_snapshotter)
+    Dependencies.set_outbox_repository(outbox_repository)
 
+    # Telegram messages are taken by the bot itself, only emails are delivered in-process
+    outbox_handlers = {}
     if settings.SMTP_ENABLED:
         smtp_repository = SMTPRepository()
         Dependencies.set_smtp_repository(smtp_repository)
+        outbox_handlers[OutboxChannel.email] = email_handler(smtp_repository, alert_repository)
+
+    outbox_scheduler = OutboxScheduler(outbox_repository, outbox_handlers)
+    Dependencies.set_outbox_scheduler(outbox_scheduler)
+    Dependencies.set_alert_ingest_queue(
+        AlertIngestQueue(alert_repository, alert_snapshotter, on_enqueued=outbox_scheduler.wakeup)
+    )
+
+    # connections to unavailable targets time out concurrently and do not block the others
+    await target_repository.warmup()
 
     # await storage.create_all()
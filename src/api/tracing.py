@@ -0,0 +1,140 @@
+__all__ = ["TracingMiddleware", "router"]
+
+import datetime
+from typing import Annotated, Any, Optional
+
+from fastapi import APIRouter, Query
+from pydantic import BaseModel, ConfigDict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.dependencies import DEPENDS_BOT
+from src.api.exceptions import IncorrectCredentialsException, NoCredentialsException, TraceNotFoundException
+from src.api.metrics import route_template
+from src.modules.auth.schemas import VerificationResult
+from src.tracing import Span, get_ring_buffer, trace
+
+router = APIRouter(prefix="/debug", tags=["Debug"])
+
+# requests to these paths are not traced, they would push useful traces out of the buffer
+UNTRACED_PATHS = {"/metrics", "/debug/traces"}
+
+
+class SpanScheme(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    started_at: datetime.datetime
+    # seconds, None if the span is not finished yet
+    duration: Optional[float]
+    attributes: dict[str, Any]
+    error: Optional[str]
+
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    # name of the root span
+    name: str
+    started_at: datetime.datetime
+    duration: Optional[float]
+    spans: int
+    errors: int
+
+
+class TraceScheme(BaseModel):
+    trace_id: str
+    spans: list[SpanScheme]
+
+
+def _summary(trace_id: str, spans: list[Span]) -> TraceSummary:
+    # the root span is exported last, spans of a request in progress have no root yet
+    root = next((s for s in spans if s.parent_id is None), None) or min(spans, key=lambda s: s.started_at)
+    return TraceSummary(
+        trace_id=trace_id,
+        name=root.name,
+        started_at=root.started_at,
+        duration=root.duration if root.parent_id is None else None,
+        spans=len(spans),
+        errors=sum(s.error is not None for s in spans),
+    )
+
+
+@router.get(
+    "/traces",
+    responses={
+        200: {"description": "The last recorded traces, the latest first"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+    },
+)
+async def get_traces(
+    _verification: Annotated[VerificationResult, DEPENDS_BOT],
+    min_duration: Optional[float] = Query(None, description="Only traces longer than this (seconds)"),
+    limit: int = Query(50, ge=1, le=1000),
+) -> list[TraceSummary]:
+    summaries = []
+    for spans in get_ring_buffer().traces():
+        summary = _summary(spans[0].trace_id, spans)
+        if min_duration is not None and (summary.duration is None or summary.duration < min_duration):
+            continue
+        summaries.append(summary)
+        if len(summaries) >= limit:
+            break
+    return summaries
+
+
+@router.get(
+    "/traces/{trace_id}",
+    responses={
+        200: {"description": "Spans of the trace in order of start"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+        **TraceNotFoundException.responses,
+    },
+)
+async def get_trace(
+    _verification: Annotated[VerificationResult, DEPENDS_BOT],
+    trace_id: str,
+) -> TraceScheme:
+    spans = get_ring_buffer().get(trace_id)
+    if spans is None:
+        raise TraceNotFoundException(trace_id)
+    return TraceScheme(
+        trace_id=trace_id,
+        spans=[SpanScheme.model_validate(s) for s in sorted(spans, key=lambda s: s.started_at)],
+    )
+
+
+class TracingMiddleware:
+    """
+    Start a trace for each request, its id is returned in `X-Trace-Id` header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"].removeprefix(scope.get("root_path", ""))
+        if path in UNTRACED_PATHS or path.startswith("/debug/traces/"):
+            return await self.app(scope, receive, send)
+
+        async with trace(f"{scope['method']} {path}", **{"http.method": scope["method"]}) as root:
+            trace_header = [(b"x-trace-id", root.trace_id.encode())] if isinstance(root, Span) else []
+
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status", message["status"])
+                    message["headers"] = [*message.get("headers", []), *trace_header]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                if route is not None and isinstance(root, Span):
+                    # the template keeps names of the traces short and groupable
+                    root.name = f"{scope['method']} {route}"
+                    root.set_attribute("http.route", route)
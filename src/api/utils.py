@@ -1,11 +1,11 @@
 from src.api.exceptions import NotEnoughPermissionsException
-from src.config import Target
+from src.config import settings
 from src.modules.auth.schemas import VerificationResult
 
 
-def permission_check(_verification: VerificationResult, target: Target):
+def permission_check(_verification: VerificationResult, target_alias: str):
     if _verification.user_id is None:
         return
 
-    if _verification.user_id not in target.ADMINS:
+    if not settings.permissions.is_admin(_verification.user_id, target_alias):
         raise NotEnoughPermissionsException()
@@ -1,4 +1,4 @@
-__all__ = ["Environment", "settings", "Settings", "Target"]
+__all__ = ["Environment", "settings", "Settings", "Target", "PermissionIndex"]
 
 import os
 from enum import StrEnum
@@ -6,7 +6,7 @@ from pathlib import Path
 from typing import Optional
 
 import yaml
-from pydantic import SecretStr, model_validator, field_validator, BaseModel, Field, ConfigDict, EmailStr
+from pydantic import PrivateAttr, SecretStr, model_validator, field_validator, BaseModel, Field, ConfigDict, EmailStr
 
 
 class Environment(StrEnum):
@@ -19,6 +19,12 @@ class Prometheus(BaseModel):
     URL: str = "http://localhost:9090"
     ALERT_RULES_PATH: Path = Path("./prometheus/alert_rules.yml")
     PROMETHEUS_CONFIG_PATH: Path = Path("./prometheus/prometheus.yml")
+    # Directory with `file_sd_configs` files of the scrape jobs, Prometheus re-reads them without a reload
+    TARGETS_DIR: Path = Path("./prometheus/targets")
+    # Address of this API for Prometheus, to scrape its own `/metrics`. None to not scrape
+    API_ADDRESS: Optional[str] = "api:8000"
+    # Move subexpressions repeated across the alert rules into generated recording rules
+    RECORDING_RULES: bool = True
 
     @model_validator(mode="before")
     def all_keys_to_upper(cls, values):
@@ -27,10 +33,28 @@ class Prometheus(BaseModel):
 
 class Target(BaseModel):
     DB_URL: SecretStr
+    # Read replicas for views which do not require the primary
+    REPLICA_DB_URLS: list[SecretStr] = Field(default_factory=list)
+    # Replicas lagging behind the primary more than this are not used (seconds)
+    MAX_REPLICA_LAG: float = 30.0
     SSH_HOST: str
     SSH_PORT: int = 22
     SSH_USERNAME: str
     SSH_PASSWORD: str
+    # Remote command of an action is abandoned after this time, its SSH session is held until then (seconds)
+    SSH_COMMAND_TIMEOUT: float = 300.0
+    # Ports of the exporters on SSH_HOST scraped by Prometheus, None to not scrape
+    POSTGRES_EXPORTER_PORT: Optional[int] = 9187
+    NODE_EXPORTER_PORT: Optional[int] = 9100
+    # Timeout for establishing connection to the database (seconds)
+    CONNECT_TIMEOUT: float = 5.0
+    # Concurrent queries to the database (also the size of the connection pool) and SSH sessions
+    MAX_CONCURRENT_QUERIES: int = 4
+    MAX_CONCURRENT_SSH: int = 2
+    # Requests waiting for a free slot, others are rejected with 503
+    MAX_QUEUE_DEPTH: int = 16
+    # Waiting request is rejected after this time (seconds)
+    QUEUE_TIMEOUT: float = 10.0
     ADMINS: list[int] = Field(default_factory=list)
     EMAILS: list[EmailStr] = Field(default_factory=list)
 
@@ -51,11 +75,196 @@ class Target(BaseModel):
         return {key.upper(): value for key, value in values.items()}
 
 
+class PermissionIndex:
+    """
+    Admins of targets indexed in both directions, so access checks do not scan the ADMINS lists.
+    """
+
+    def __init__(self, targets: dict[str, Target]):
+        # target alias -> admins
+        self.admins_by_target: dict[str, frozenset[int]] = {
+            alias: frozenset(target.ADMINS) for alias, target in targets.items()
+        }
+        # user id -> target aliases (in the order of configuration)
+        targets_by_user: dict[int, list[str]] = {}
+        for alias, target in targets.items():
+            for user_id in dict.fromkeys(target.ADMINS):
+                targets_by_user.setdefault(user_id, []).append(alias)
+        self.targets_by_user: dict[int, tuple[str, ...]] = {
+            user_id: tuple(aliases) for user_id, aliases in targets_by_user.items()
+        }
+
+    def is_admin(self, user_id: int, target_alias: str) -> bool:
+        return user_id in self.admins_by_target.get(target_alias, ())
+
+    def admins_of(self, target_alias: str) -> frozenset[int]:
+        return self.admins_by_target.get(target_alias, frozenset())
+
+    def targets_of(self, user_id: int) -> tuple[str, ...]:
+        return self.targets_by_user.get(user_id, ())
+
+
 class Smtp(BaseModel):
     SERVER: str = "mail.innopolis.ru"
     PORT: int = 587
     USERNAME: str
     PASSWORD: SecretStr
+    # Number of authenticated connections kept open
+    POOL_SIZE: int = 4
+    # Timeout for SMTP commands (seconds)
+    TIMEOUT: float = 30.0
+    # Idle connection is checked with NOOP before reuse (seconds)
+    HEALTHCHECK_INTERVAL: float = 60.0
+    # Directory with email templates (`alert.html`, `connect_email.html`), `<locale>/<name>` is preferred if exists.
+    # A template has a `subject` block and a `body` block (the whole template if absent).
+    # Built-in templates are used by default
+    TEMPLATES_PATH: Optional[Path] = None
+    LOCALE: str = "ru"
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class Outbox(BaseModel):
+    # How often the scheduler looks for due messages (seconds)
+    POLL_INTERVAL: float = 5.0
+    # How many messages are leased at once and kept in the in-process queue
+    BATCH_SIZE: int = 50
+    # How many messages are delivered concurrently
+    CONCURRENCY: int = 4
+    # Leased message is considered lost and is offered again after this time (seconds)
+    LEASE_TIMEOUT: float = 60.0
+    # Exponential backoff: BACKOFF_BASE * 2 ** (attempts - 1), capped by BACKOFF_MAX (seconds)
+    BACKOFF_BASE: float = 5.0
+    BACKOFF_MAX: float = 600.0
+    # After this number of attempts message is marked as dead
+    MAX_ATTEMPTS: int = 10
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class AlertIngest(BaseModel):
+    # Alerts waiting to be saved, the webhook is rejected with 503 when there is no room for its alerts
+    QUEUE_SIZE: int = 10000
+    # Maximum number of alerts saved in one transaction
+    BATCH_SIZE: int = 500
+    # Pause before the batch is saved again after a connection error or a timeout (seconds)
+    RETRY_INTERVAL: float = 1.0
+    # Attempts to save a batch, then its alerts are saved one by one and those which still fail are dropped
+    MAX_ATTEMPTS: int = 10
+    # Time to save the queued alerts on shutdown (seconds)
+    SHUTDOWN_TIMEOUT: float = 10.0
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class MetricsProxy(BaseModel):
+    # Timeout of a range query to Prometheus (seconds)
+    TIMEOUT: float = 10.0
+    # Connections to Prometheus kept open
+    MAX_CONNECTIONS: int = 10
+    # Results of range queries kept in memory
+    CACHE_SIZE: int = 256
+    # Points per series queried from Prometheus, responses are downsampled from them (Prometheus allows 11000)
+    RESOLUTION: int = 1000
+    # Minimal step of queries (seconds), there is no point in going below the scrape interval
+    MIN_STEP: float = 5.0
+    # Maximum points per series in a response
+    MAX_POINTS: int = 1000
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class TargetsHealth(BaseModel):
+    # How often targets are probed (seconds)
+    INTERVAL: float = 15.0
+    # Probe of the database or SSH port fails after this time (seconds)
+    TIMEOUT: float = 5.0
+    # Circuit is opened after this number of consecutive failures (of probes or requests)
+    FAILURE_THRESHOLD: int = 3
+    # Open circuit lets a trial request through after this time (seconds)
+    RECOVERY_TIMEOUT: float = 30.0
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class AlertSnapshots(BaseModel):
+    # Execute related views of a firing alert and save their results with the alert
+    ENABLED: bool = True
+    # Views added to the snapshot of every alert
+    VIEWS: list[str] = Field(default_factory=list)
+    # Rows saved for each view
+    LIMIT: int = 100
+    # Snapshot is abandoned after this time (seconds)
+    TIMEOUT: float = 30.0
+    # Alerts of a target firing within this time share one snapshot, each view is executed once (seconds)
+    COALESCE_WINDOW: float = 1.0
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class SlowViews(BaseModel):
+    # Executions of views longer than this are put to the slow log (seconds)
+    THRESHOLD: float = 1.0
+    # Number of entries kept in the slow log
+    SIZE: int = 100
+    # Capture plan of a slow view, at most once per view and target in this time (seconds). None to disable
+    EXPLAIN_INTERVAL: Optional[float] = 300.0
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class Statements(BaseModel):
+    # Sample pg_stat_statements of the targets (the extension must be installed in the target database)
+    ENABLED: bool = True
+    # How often the statistics are sampled (seconds)
+    INTERVAL: float = 60.0
+    # Samples older than this are dropped, the longest window of the top (seconds)
+    RETENTION: float = 3600.0
+    # Texts of statements are cut to this length
+    QUERY_LENGTH: int = 1000
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class Compression(BaseModel):
+    # Compress responses with the best encoding accepted by the client (zstd and brotli need their packages)
+    ENABLED: bool = True
+    # Smaller responses are sent as is (bytes)
+    MINIMUM_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    ZSTD_LEVEL: int = 3
+    BROTLI_QUALITY: int = 4
+
+    @model_validator(mode="before")
+    def all_keys_to_upper(cls, values):
+        return {key.upper(): value for key, value in values.items()}
+
+
+class Tracing(BaseModel):
+    # Record spans of requests, repository methods and calls to targets
+    ENABLED: bool = True
+    # Part of traces which are recorded, from 0 to 1
+    SAMPLE_RATE: float = 1.0
+    # Number of the last traces kept in memory for the debug endpoint
+    BUFFER_SIZE: int = 200
+    # Spans above this number are dropped from a trace
+    MAX_SPANS: int = 256
 
     @model_validator(mode="before")
     def all_keys_to_upper(cls, values):
@@ -80,15 +289,21 @@ class Settings(BaseModel):
 
     model_config = ConfigDict(extra="ignore")
 
+    _permissions: PermissionIndex = PrivateAttr()
+
     # Prefix for the API path (e.g. "/api/v0")
     APP_ROOT_PATH: str = ""
     # App environment
     ENVIRONMENT: Environment = Environment.DEVELOPMENT
     BOT_TOKEN: SecretStr
+    # Webapp initData is accepted for this time after `auth_date` (seconds), None to accept forever
+    WEBAPP_AUTH_TTL: Optional[int] = 24 * 60 * 60
     # PostgreSQL database connection URL
     DB_URL: SecretStr
     # Target DB and SSH for monitoring
     TARGETS: dict[str, Target] = Field(default_factory=dict)
+    # Background health checks and circuit breaking of targets
+    TARGETS_HEALTH: TargetsHealth = Field(default_factory=TargetsHealth)
     # Authentication
     COOKIE: Cookies = Field(default_factory=Cookies)
     # CORS configuration
@@ -99,19 +314,61 @@ class Settings(BaseModel):
     # SMTP server settings
     SMTP_ENABLED: bool = False
     SMTP: Optional[Smtp] = None
+    # Notifications outbox (Telegram and email delivery)
+    OUTBOX: Outbox = Field(default_factory=Outbox)
+    # Results of related views saved at the moment of firing
+    ALERT_SNAPSHOTS: AlertSnapshots = Field(default_factory=AlertSnapshots)
+    # Timings of views and log of slow executions
+    SLOW_VIEWS: SlowViews = Field(default_factory=SlowViews)
+    # Windowed top of statements from pg_stat_statements of the targets
+    STATEMENTS: Statements = Field(default_factory=Statements)
+    # Queue of alerts between the Alertmanager webhook and the database
+    ALERT_INGEST: AlertIngest = Field(default_factory=AlertIngest)
+    # Request tracing
+    TRACING: Tracing = Field(default_factory=Tracing)
+    # Compression of responses
+    COMPRESSION: Compression = Field(default_factory=Compression)
     # Prometheus settings
     PROMETHEUS: Prometheus = Field(default_factory=Prometheus)
+    # Range queries to Prometheus for charts
+    METRICS_PROXY: MetricsProxy = Field(default_factory=MetricsProxy)
     # Monitoring
     ALERTS_CONFIG_PATH: Path = Path("alerts.yaml")
     ACTIONS_CONFIG_PATH: Path = Path("actions.yaml")
     VIEWS_CONFIG_PATH: Path = Path("views.yaml")
+    # Check monitoring config files for changes with this interval (seconds), None to disable reloading
+    MONITORING_RELOAD_INTERVAL: Optional[float] = 5.0
+
+    def model_post_init(self, __context) -> None:
+        self._permissions = PermissionIndex(self.TARGETS)
+
+    @property
+    def permissions(self) -> PermissionIndex:
+        """
+        Index of targets admins, built on config load.
+        """
+        return self._permissions
 
     def flatten(self):
         """
         Flatten settings to dict.
         """
-        nested = self.model_dump(include={"AUTH", "SMTP", "PROMETHEUS"})
-        flattened = self.model_dump(exclude={"model_config", "AUTH", "SMTP", "PROMETHEUS", "TARGETS"})
+        nested_keys = {
+            "AUTH",
+            "SMTP",
+            "PROMETHEUS",
+            "OUTBOX",
+            "TARGETS_HEALTH",
+            "ALERT_SNAPSHOTS",
+            "SLOW_VIEWS",
+            "TRACING",
+            "ALERT_INGEST",
+            "METRICS_PROXY",
+            "STATEMENTS",
+            "COMPRESSION",
+        }
+        nested = self.model_dump(include=nested_keys)
+        flattened = self.model_dump(exclude={"model_config", "TARGETS", *nested_keys})
 
         for key, value in nested.items():
             if isinstance(value, dict):
@@ -0,0 +1,111 @@
+"""
+Metrics of the API itself, exposed on `/metrics` for Prometheus.
+"""
+
+__all__ = [
+    "REQUEST_DURATION",
+    "WEBHOOK_BATCH_SIZE",
+    "CACHE_REQUESTS",
+    "cache_hit",
+    "cache_miss",
+    "StateCollector",
+]
+
+from typing import Iterator
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+REQUEST_DURATION = Histogram(
+    "monitoring_api_request_duration_seconds",
+    "Duration of HTTP requests",
+    ["method", "route", "status", "view_alias", "action_alias", "target_alias"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+WEBHOOK_BATCH_SIZE = Histogram(
+    "monitoring_api_webhook_batch_size",
+    "Number of alerts in one Alertmanager webhook call",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250),
+)
+
+CACHE_REQUESTS = Counter(
+    "monitoring_api_cache_requests",
+    "Lookups of in-process caches",
+    ["cache", "result"],
+)
+
+
+def cache_hit(cache: str):
+    CACHE_REQUESTS.labels(cache, "hit").inc()
+
+
+def cache_miss(cache: str):
+    CACHE_REQUESTS.labels(cache, "miss").inc()
+
+
+class StateCollector(Collector):
+    """
+    Current state of connection pools, concurrency limits and queues, read at the moment of scrape.
+    """
+
+    def collect(self) -> Iterator[Metric]:
+        from src.api.dependencies import Dependencies
+        from src.modules.targets.schemas import TargetComponent
+
+        pool_connections = GaugeMetricFamily(
+            "monitoring_api_target_pool_connections",
+            "Connections of target database pools",
+            labels=["target_alias", "node", "state"],
+        )
+        bulkhead_calls = GaugeMetricFamily(
+            "monitoring_api_target_calls",
+            "Calls to targets in progress or waiting for a free slot (SSH sessions for `ssh` component)",
+            labels=["target_alias", "component", "state"],
+        )
+        outbox_queue = GaugeMetricFamily(
+            "monitoring_api_outbox_queue_size",
+            "Outbox messages leased and waiting for delivery in the process",
+        )
+        alert_ingest_queue = GaugeMetricFamily(
+            "monitoring_api_alert_ingest_queue_size",
+            "Alerts received by the webhook and waiting to be saved",
+        )
+
+        try:
+            target_repository = Dependencies.get_target_repository()
+        except AttributeError:  # not started yet
+            target_repository = None
+
+        if target_repository is not None:
+            for alias in target_repository.aliases():
+                nodes = [("primary", target_repository.get_storage(alias))]
+                nodes.extend((replica.name, replica.storage) for replica in target_repository.get_replicas(alias))
+                for node, storage in nodes:
+                    pool = storage.engine.pool
+                    pool_connections.add_metric([alias, node, "checked_out"], pool.checkedout())
+                    pool_connections.add_metric([alias, node, "idle"], pool.checkedin())
+
+                for component in TargetComponent:
+                    bulkhead = target_repository.get_bulkhead(alias, component)
+                    bulkhead_calls.add_metric([alias, component, "active"], bulkhead.active)
+                    bulkhead_calls.add_metric([alias, component, "waiting"], bulkhead.waiting)
+
+        try:
+            outbox_queue.add_metric([], Dependencies.get_outbox_scheduler().queue_size)
+        except AttributeError:  # not started yet
+            pass
+
+        try:
+            alert_ingest_queue.add_metric([], Dependencies.get_alert_ingest_queue().size)
+        except AttributeError:  # not started yet
+            pass
+
+        yield pool_connections
+        yield bulkhead_calls
+        yield outbox_queue
+        yield alert_ingest_queue
+
+
+REGISTRY.register(StateCollector())
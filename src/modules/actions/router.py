@@ -1,4 +1,4 @@
-__all__ = ["router"]
+__all__ = ["router", "build_action_routes"]
 
 from typing import Annotated
 
@@ -6,7 +6,6 @@ from fastapi import APIRouter, Query
 from pydantic import BaseModel, create_model
 
 from src.api.dependencies import DEPENDS_PG_STAT_REPOSITORY, DEPENDS_VERIFIED_REQUEST
-from src.config import settings, Target
 from src.api.exceptions import (
     ActionNotFoundException,
     IncorrectCredentialsException,
@@ -19,6 +18,7 @@ from src.modules.pg.abc import AbstractPgRepository
 from src.modules.auth.schemas import VerificationResult
 from src.storages.monitoring.config import settings as monitoring_settings, Action
 from src.api.utils import permission_check
+from src.tracing import span
 
 router = APIRouter(prefix="/actions", tags=["Actions"])
 
@@ -28,20 +28,23 @@ class SomeResult(BaseModel):
     detail: str = ""
 
 
-async def _execute_action(pg_repository: AbstractPgRepository, action_alias: str, target: Target, **arguments):
+async def _execute_action(pg_repository: AbstractPgRepository, action_alias: str, target_alias: str, /, **arguments):
     action = monitoring_settings.actions.get(action_alias)
+    if action is None:
+        raise ActionNotFoundException(action_alias)
     # ensure all required arguments are provided
     for argument_name, argument in action.arguments.items():
         if argument.required and argument_name not in arguments:
             raise ArgumentRequiredException(argument_name)
     exceptions = []
 
-    for step in action.steps:
+    for index, step in enumerate(action.steps):
         try:
-            if step.type == Action.Step.Type.sql:
-                await pg_repository.execute_sql(step.query, binds=arguments, target=target)
-            elif step.type == Action.Step.Type.ssh:
-                await pg_repository.execute_ssh(step.query, binds=arguments, target=target)
+            with span("action.step", action_alias=action_alias, step=index, type=step.type):
+                if step.type == Action.Step.Type.sql:
+                    await pg_repository.execute_sql(step.query, binds=arguments, target_alias=target_alias)
+                elif step.type == Action.Step.Type.ssh:
+                    await pg_repository.execute_ssh(step.query, binds=arguments, target_alias=target_alias)
         except (SQLQueryError, SSHQueryError) as e:
             if step.required:
                 return SomeResult(
@@ -63,43 +66,49 @@ async def _execute_action(pg_repository: AbstractPgRepository, action_alias: str
     return SomeResult()
 
 
-# generate routes for each action
-for action_alias, action in monitoring_settings.actions.items():
-    _arguments = {
-        argument_name: (argument.type, argument.field_info()) for argument_name, argument in action.arguments.items()
-    }
-    # for type hints
-    _Arguments: type[BaseModel] = create_model(f"Arguments_{action_alias}", **_arguments)
-
-    def wrapper(binded_action_alias: str):
-        # for function closure (to pass action_alias)
-        async def execute_action(
-            _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
-            pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
-            arguments: _Arguments | None = None,
-            target_alias: str = Query(...),
-        ):
-            arguments: BaseModel
-            target: Target = settings.TARGETS[target_alias]
-            permission_check(_verification, target)
-            return await _execute_action(
-                pg_repository, binded_action_alias, **arguments.model_dump(exclude_none=True), target=target
-            )
-
-        return execute_action
-
-    router.add_api_route(
-        f"/execute/{action_alias}",
-        wrapper(action_alias),
-        methods=["POST"],
-        responses={
-            200: {"description": "Execute action"},
-            **IncorrectCredentialsException.responses,
-            **NoCredentialsException.responses,
-        },
-        name=f"Execute Action {action_alias}",
-        response_model=SomeResult,
-    )
+def build_action_routes() -> APIRouter:
+    """
+    Generate routes for each configured action. Called again when the monitoring config is reloaded.
+    """
+    action_router = APIRouter(prefix="/actions", tags=["Actions"])
+
+    for action_alias, action in monitoring_settings.actions.items():
+        _arguments = {
+            argument_name: (argument.type, argument.field_info())
+            for argument_name, argument in action.arguments.items()
+        }
+        # for type hints
+        _Arguments: type[BaseModel] = create_model(f"Arguments_{action_alias}", **_arguments)
+
+        def wrapper(binded_action_alias: str, arguments_model: type[BaseModel]):
+            # for function closure (to pass action_alias)
+            async def execute_action(
+                _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+                pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
+                arguments: arguments_model | None = None,
+                target_alias: str = Query(...),
+            ):
+                arguments: BaseModel
+                permission_check(_verification, target_alias)
+                arguments = arguments.model_dump(exclude_none=True) if arguments else {}
+                return await _execute_action(pg_repository, binded_action_alias, target_alias, **arguments)
+
+            return execute_action
+
+        action_router.add_api_route(
+            f"/execute/{action_alias}",
+            wrapper(action_alias, _Arguments),
+            methods=["POST"],
+            responses={
+                200: {"description": "Execute action"},
+                **IncorrectCredentialsException.responses,
+                **NoCredentialsException.responses,
+            },
+            name=f"Execute Action {action_alias}",
+            response_model=SomeResult,
+        )
+
+    return action_router
 
 
 class ActionWithAlias(Action):
@@ -1,9 +1,10 @@
 __all__ = ["AbstractAlertRepository"]
 
-import datetime
 from abc import ABCMeta, abstractmethod
+from typing import Callable, Optional
 
-from src.modules.alerts.schemas import AlertDB, MappedAlert, AlertDeliveryScheme
+from src.modules.alerts.schemas import AlertDB, AlertSnapshot, MappedAlert
+from src.modules.outbox.schemas import CreateOutboxMessage
 
 
 class AbstractAlertRepository(metaclass=ABCMeta):
@@ -12,17 +13,21 @@ class AbstractAlertRepository(metaclass=ABCMeta):
         ...
 
     @abstractmethod
-    async def get_alert(self, alert_id: int) -> "MappedAlert":
-        ...
+    async def create_alerts(
+        self,
+        alerts: list["AlertDB"],
+        outbox_messages: Optional[Callable[["MappedAlert"], list["CreateOutboxMessage"]]] = None,
+    ) -> list["MappedAlert"]:
+        """
+        Save alerts in one transaction.
 
-    @abstractmethod
-    async def start_delivery(self, alert_id: int, receivers: list[int]) -> list[int]:
-        ...
+        :param outbox_messages: notifications about a saved alert, they are saved in the same transaction.
+        """
 
     @abstractmethod
-    async def stop_delivery(self, alert_id: int, receivers: list[int]):
+    async def get_alert(self, alert_id: int, with_snapshot: bool = False) -> "MappedAlert":
         ...
 
     @abstractmethod
-    async def check_delivery(self, starting: datetime.datetime) -> list["AlertDeliveryScheme"]:
+    async def save_snapshot(self, alert_id: int, snapshot: "AlertSnapshot") -> None:
         ...
@@ -0,0 +1,185 @@
+__all__ = ["AlertIngestQueue", "IngestQueueFullError"]
+
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from src.config import settings
+from src.modules.alerts.abc import AbstractAlertRepository
+from src.modules.alerts.schemas import AlertDB, MappedAlert
+from src.modules.alerts.snapshots import AlertSnapshotter
+from src.modules.outbox.schemas import CreateOutboxMessage, alert_priority
+from src.storages.sqlalchemy.models.outbox import OutboxChannel
+from src.tracing import trace
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFullError(Exception):
+    pass
+
+
+def outbox_messages(mapped_alert: MappedAlert) -> list[CreateOutboxMessage]:
+    """
+    Notifications of the admins of the target about the alert.
+    """
+    target = settings.TARGETS[mapped_alert.target_alias]
+    priority = alert_priority(mapped_alert.severity)
+    messages = [
+        CreateOutboxMessage(
+            channel=OutboxChannel.telegram,
+            recipient=str(receiver),
+            alert_id=mapped_alert.id,
+            priority=priority,
+        )
+        for receiver in settings.permissions.admins_of(mapped_alert.target_alias)
+    ]
+    if settings.SMTP_ENABLED and mapped_alert.severity == "critical":
+        messages.extend(
+            CreateOutboxMessage(
+                channel=OutboxChannel.email,
+                recipient=email,
+                alert_id=mapped_alert.id,
+                payload={"kind": "alert"},
+                priority=priority,
+            )
+            for email in target.EMAILS
+        )
+    return messages
+
+
+def _is_transient(e: Exception) -> bool:
+    """
+    Errors of the connection or the server which may pass, unlike errors of the data (e.g. DataError).
+    """
+    if isinstance(e, (OperationalError, InterfaceError, PoolTimeoutError, OSError, TimeoutError)):
+        return True
+    return isinstance(e, DBAPIError) and e.connection_invalidated
+
+
+class AlertIngestQueue:
+    """
+    Bounded in-process queue between the Alertmanager webhook and the database.
+
+    The webhook only puts validated alerts here, a single writer saves everything that has accumulated in one
+    transaction (group commit). When the database is slow the queue fills up and the webhook is rejected, so
+    Alertmanager retries later instead of piling up requests.
+    """
+
+    def __init__(
+        self,
+        alert_repository: AbstractAlertRepository,
+        alert_snapshotter: AlertSnapshotter,
+        on_enqueued: Optional[Callable[[], None]] = None,
+    ):
+        self.alert_repository = alert_repository
+        self.alert_snapshotter = alert_snapshotter
+        # called after outbox messages are saved (wakes up the outbox scheduler)
+        self.on_enqueued = on_enqueued
+        self.max_size = settings.ALERT_INGEST.QUEUE_SIZE
+        self._queue: asyncio.Queue[AlertDB] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def size(self) -> int:
+        return self._queue.qsize()
+
+    def put(self, alerts: list[AlertDB]):
+        """
+        Enqueue all alerts of a webhook call or none of them, so a rejected call can be retried as a whole.
+
+        :raises IngestQueueFullError: if there is no room for all alerts
+        """
+        if self._queue.qsize() + len(alerts) > self.max_size:
+            raise IngestQueueFullError()
+        for alert in alerts:
+            self._queue.put_nowait(alert)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        """
+        Write the queued alerts (waiting at most `SHUTDOWN_TIMEOUT`) and stop the writer.
+        """
+        if self._task is None:
+            return
+        try:
+            async with asyncio.timeout(settings.ALERT_INGEST.SHUTDOWN_TIMEOUT):
+                await self.flush()
+        except TimeoutError:
+            logger.warning(f"{self._queue.qsize()} alerts are not saved on shutdown")
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def flush(self):
+        """
+        Wait until all queued alerts are saved.
+        """
+        await self._queue.join()
+
+    def _take_batch(self, first: AlertDB) -> list[AlertDB]:
+        # everything that has arrived while the previous batch was written
+        batch = [first]
+        while len(batch) < settings.ALERT_INGEST.BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _save(self, alerts: list[AlertDB]) -> list[MappedAlert]:
+        """
+        Save alerts with their outbox messages in one transaction. Only connection errors and timeouts are retried,
+        at most `MAX_ATTEMPTS` times.
+        """
+        attempt = 1
+        while True:
+            try:
+                return await self.alert_repository.create_alerts(alerts, outbox_messages)
+            except Exception as e:
+                if not _is_transient(e) or attempt >= settings.ALERT_INGEST.MAX_ATTEMPTS:
+                    raise
+                # the batch is kept and the queue keeps filling up, so new webhooks are rejected meanwhile
+                logger.warning(f"Failed to save {len(alerts)} alerts (attempt {attempt}), retrying: {e!r}")
+                attempt += 1
+                await asyncio.sleep(settings.ALERT_INGEST.RETRY_INTERVAL)
+
+    async def _write_loop(self):
+        while True:
+            batch = self._take_batch(await self._queue.get())
+            try:
+                await self._write(batch)
+            except Exception:
+                # the writer must keep running, otherwise the queue fills up and every webhook is rejected
+                logger.exception(f"Failed to write {len(batch)} alerts")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: list[AlertDB]):
+        with trace("alerts.ingest_batch", alerts=len(batch)):
+            try:
+                mapped_alerts = await self._save(batch)
+            except Exception as e:
+                if len(batch) == 1 or _is_transient(e):
+                    # the database has been unavailable for all attempts
+                    for alert in batch:
+                        logger.error(f"Alert is dropped: {alert.model_dump_json()}")
+                    logger.exception(f"Failed to save {len(batch)} alerts, they are dropped")
+                    return
+                # one bad alert must not cost the others
+                logger.exception(f"Failed to save a batch of {len(batch)} alerts, saving them one by one")
+                mapped_alerts = []
+                for alert in batch:
+                    try:
+                        mapped_alerts.extend(await self._save([alert]))
+                    except Exception:
+                        logger.exception(f"Alert is dropped: {alert.model_dump_json()}")
+
+        for mapped_alert in mapped_alerts:
+            # state of the target at the moment of firing
+            self.alert_snapshotter.schedule(mapped_alert)
+        if self.on_enqueued is not None:
+            self.on_enqueued()
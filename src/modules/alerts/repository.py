@@ -1,13 +1,18 @@
-import datetime
+import zlib
+from typing import Callable, Optional
 
-from sqlalchemy import insert, select, update, and_, not_, delete
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 
 from src.modules.alerts.abc import AbstractAlertRepository
-from src.modules.alerts.schemas import AlertDB, MappedAlert, AlertDeliveryScheme
+from src.modules.alerts.schemas import AlertDB, AlertSnapshot, MappedAlert
+from src.modules.outbox.schemas import CreateOutboxMessage
 from src.storages.monitoring.config import settings as monitoring_settings
 from src.storages.sqlalchemy import AbstractSQLAlchemyStorage
-from src.storages.sqlalchemy.models.alerts import Alert, AlertDelivery
+from src.storages.sqlalchemy.models.alerts import Alert
+from src.storages.sqlalchemy.models.outbox import OutboxMessage
+from src.tracing import traced_methods
 
 
 def map_alert(alert: AlertDB, id_: int) -> MappedAlert:
@@ -59,6 +64,7 @@ def map_alert(alert: AlertDB, id_: int) -> MappedAlert:
         )
 
 
+@traced_methods
 class AlertRepository(AbstractAlertRepository):
     def __init__(self, storage: AbstractSQLAlchemyStorage):
         self.storage = storage
@@ -66,23 +72,6 @@ class AlertRepository(AbstractAlertRepository):
     def _create_session(self) -> AsyncSession:
         return self.storage.create_session()
 
-    async def check_delivery(self, starting: datetime.datetime) -> list["AlertDeliveryScheme"]:
-        async with self._create_session() as session:
-            q = select(AlertDelivery).where(not_(AlertDelivery.delivered))
-            result = await session.scalars(q)
-            if result:
-                deliveries = [AlertDeliveryScheme.model_validate(r, from_attributes=True) for r in result]
-
-                alert_ids = {d.alert_id for d in deliveries}
-                q = select(Alert).where(and_(Alert.id.in_(alert_ids), Alert.timestamp >= starting))
-                filtered = await session.scalars(q)
-                target_alerts = {r.id for r in filtered}
-
-                return [d for d in deliveries if d.alert_id in target_alerts]
-
-            else:
-                return []
-
     async def create_alert(self, alert: "AlertDB") -> MappedAlert:
         async with self._create_session() as session:
             statement = insert(Alert).values(**alert.model_dump()).returning(Alert.id)
@@ -90,53 +79,48 @@ class AlertRepository(AbstractAlertRepository):
             await session.commit()
             return map_alert(alert, id_)
 
-    async def get_alert(self, alert_id: int) -> MappedAlert:
+    async def create_alerts(
+        self,
+        alerts: list["AlertDB"],
+        outbox_messages: Optional[Callable[[MappedAlert], list["CreateOutboxMessage"]]] = None,
+    ) -> list[MappedAlert]:
+        if not alerts:
+            return []
+
+        async with self._create_session() as session:
+            # multi-row insert, ids are returned in the order of the alerts
+            statement = insert(Alert).returning(Alert.id, sort_by_parameter_order=True)
+            ids = list(await session.scalars(statement, [alert.model_dump() for alert in alerts]))
+            mapped_alerts = [map_alert(alert, id_) for alert, id_ in zip(alerts, ids)]
+
+            if outbox_messages is not None:
+                # notifications are committed together with their alerts
+                messages = [
+                    message.model_dump() for mapped_alert in mapped_alerts for message in outbox_messages(mapped_alert)
+                ]
+                if messages:
+                    await session.execute(insert(OutboxMessage).values(messages))
+            await session.commit()
+        return mapped_alerts
+
+    async def get_alert(self, alert_id: int, with_snapshot: bool = False) -> MappedAlert:
         async with self._create_session() as session:
             q = select(Alert).where(Alert.id == alert_id)
+            if not with_snapshot:
+                q = q.options(defer(Alert.snapshot))
             alert = await session.scalar(q)
             if alert:
                 scheme = AlertDB.model_validate(alert, from_attributes=True)
-                return map_alert(scheme, alert_id)
+                mapped_alert = map_alert(scheme, alert_id)
+                if with_snapshot and alert.snapshot is not None:
+                    mapped_alert.snapshot = AlertSnapshot.model_validate_json(zlib.decompress(alert.snapshot))
+                return mapped_alert
+
+    async def save_snapshot(self, alert_id: int, snapshot: "AlertSnapshot") -> None:
+        # results of views are repetitive JSON, compressed several times
+        compressed = zlib.compress(snapshot.model_dump_json().encode())
 
-    async def start_delivery(self, alert_id: int, receivers: list[int]) -> list[int]:
-        async with self._create_session() as session:
-            q = select(AlertDelivery).where(AlertDelivery.alert_id == alert_id)
-            existing = await session.scalars(q)
-            if existing:
-                existing_ids = {r.alert_id for r in existing}
-                existing_ids &= set(receivers)
-                statement = (
-                    update(AlertDelivery).where(AlertDelivery.alert_id.in_(existing_ids)).values(delivered=False)
-                )
-                await session.execute(statement)
-                await session.commit()
-            else:
-                existing_ids = set()
-
-            not_existing_ids = set(receivers) - existing_ids
-            if not_existing_ids:
-                statement = insert(AlertDelivery).values(
-                    [{"alert_id": alert_id, "receiver_id": receiver_id} for receiver_id in not_existing_ids]
-                )
-                await session.execute(statement)
-                await session.commit()
-
-            q = select(AlertDelivery).where(and_(AlertDelivery.alert_id == alert_id, not_(AlertDelivery.delivered)))
-            to_be_delivered = await session.scalars(q)
-            return [r.receiver_id for r in to_be_delivered]
-
-    async def stop_delivery(self, alert_id: int, receivers: list[int]):
         async with self._create_session() as session:
-            q = select(AlertDelivery).where(
-                and_(
-                    AlertDelivery.alert_id == alert_id,
-                    not_(AlertDelivery.delivered),
-                    AlertDelivery.receiver_id.in_(receivers),
-                )
-            )
-            to_be_deleted = await session.scalars(q)
-
-            if to_be_deleted:
-                statement = delete(AlertDelivery).where(AlertDelivery.id.in_([r.id for r in to_be_deleted]))
-                await session.execute(statement)
-                await session.commit()
+            statement = update(Alert).where(Alert.id == alert_id).values(snapshot=compressed)
+            await session.execute(statement)
+            await session.commit()
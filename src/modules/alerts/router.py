@@ -4,14 +4,24 @@ import datetime
 from typing import Any, Annotated
 
 from fastapi import APIRouter
-from fastapi import BackgroundTasks
 from pydantic import BaseModel, ConfigDict
 
-from src.api.dependencies import DEPENDS_ALERT_REPOSITORY, DEPENDS_VERIFIED_REQUEST, DEPENDS_BOT
-from src.config import settings, Target
+from src.api.dependencies import (
+    DEPENDS_ALERT_INGEST_QUEUE,
+    DEPENDS_ALERT_REPOSITORY,
+    DEPENDS_OUTBOX_REPOSITORY,
+    DEPENDS_VERIFIED_REQUEST,
+    DEPENDS_BOT,
+)
+from src.api.exceptions import AlertQueueFullException, IncorrectCredentialsException, NoCredentialsException
+from src.config import settings
+from src.metrics import WEBHOOK_BATCH_SIZE
+from src.modules.alerts.ingest import AlertIngestQueue, IngestQueueFullError
 from src.modules.alerts.repository import AbstractAlertRepository
 from src.modules.alerts.schemas import AlertDB, MappedAlert
 from src.modules.auth.schemas import VerificationResult
+from src.modules.outbox.abc import AbstractOutboxRepository
+from src.storages.sqlalchemy.models.outbox import OutboxChannel
 
 router = APIRouter(prefix="/alerts", tags=["Alerts"])
 
@@ -68,50 +78,45 @@ class AlertManagerRequest(BaseModel):
     alerts: list[dict[str, Any]]
 
 
-@router.post("/alertmanager-callback", status_code=200)
+@router.post(
+    "/alertmanager-callback",
+    status_code=200,
+    responses={
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+        **AlertQueueFullException.responses,
+    },
+)
 async def webhook(
-    alert_repository: Annotated[AbstractAlertRepository, DEPENDS_ALERT_REPOSITORY],
+    alert_ingest_queue: Annotated[AlertIngestQueue, DEPENDS_ALERT_INGEST_QUEUE],
     data: AlertManagerRequest,
     _verification: Annotated[VerificationResult, DEPENDS_BOT],
-    background_tasks: BackgroundTasks,
 ):
+    """
+    Alerts are queued and saved in the background, the call returns before they are in the database.
+    """
+    alerts = []
+    WEBHOOK_BATCH_SIZE.observe(len(data.alerts))
+
     for alert in data.alerts:
-        # get alertname
-        alert_alias = alert["labels"]["alertname"]
-        # get timestamp from iso
-        timestamp = datetime.datetime.fromisoformat(alert["startsAt"])
-        # resolve multiple targets
         try:
+            # get alertname
+            alert_alias = alert["labels"]["alertname"]
+            # get timestamp from iso
+            timestamp = datetime.datetime.fromisoformat(alert["startsAt"])
+            # resolve multiple targets
             target_alias = alert["labels"]["target"]
-            target: Target = settings.TARGETS[target_alias]
-            receivers = target.ADMINS
-
-            # save alert
-            mapped_alert = await alert_repository.create_alert(
-                alert=AlertDB(
-                    target_alias=target_alias,
-                    alias=alert_alias,
-                    timestamp=timestamp,
-                    value=alert,
-                )
-            )
-            # start mailing
-            await alert_repository.start_delivery(mapped_alert.id, receivers)
-            if settings.SMTP_ENABLED and mapped_alert.severity == "critical":
-                from src.api.dependencies import Dependencies
-
-                smtp_repository = Dependencies.get_smtp_repository()
-
-                for email in target.EMAILS:
-                    # send email
-                    background_tasks.add_task(
-                        smtp_repository.send_alert_message,
-                        email=email,
-                        mapped_alert=mapped_alert,
-                    )
-
         except KeyError:
             continue
+        if target_alias not in settings.TARGETS:
+            continue
+
+        alerts.append(AlertDB(target_alias=target_alias, alias=alert_alias, timestamp=timestamp, value=alert))
+
+    try:
+        alert_ingest_queue.put(alerts)
+    except IngestQueueFullError:
+        raise AlertQueueFullException()
 
 
 @router.get("/by-id/{alert_id}", status_code=200)
@@ -120,7 +125,10 @@ async def get_alert(
     alert_id: int,
     _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
 ) -> MappedAlert:
-    return await alert_repository.get_alert(alert_id)
+    """
+    Alert with the results of its related views saved at the moment of firing (`snapshot`)
+    """
+    return await alert_repository.get_alert(alert_id, with_snapshot=True)
 
 
 class GroupedDelivery(MappedAlert):
@@ -130,12 +138,21 @@ class GroupedDelivery(MappedAlert):
 @router.get("/delivery", status_code=200)
 async def check_delivery(
     alert_repository: Annotated[AbstractAlertRepository, DEPENDS_ALERT_REPOSITORY],
+    outbox_repository: Annotated[AbstractOutboxRepository, DEPENDS_OUTBOX_REPOSITORY],
     _verificated: Annotated[VerificationResult, DEPENDS_BOT],
     age: int = 3600,
 ) -> list[GroupedDelivery]:
-    starting = datetime.datetime.utcnow() - datetime.timedelta(seconds=age)
-
-    deliveries = await alert_repository.check_delivery(starting)
+    """
+    Take Telegram messages for delivery. Messages which are not finished in time will be offered again.
+    """
+    starting = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=age)
+
+    deliveries = await outbox_repository.lease_due(
+        [OutboxChannel.telegram],
+        limit=settings.OUTBOX.BATCH_SIZE,
+        lease_timeout=datetime.timedelta(seconds=settings.OUTBOX.LEASE_TIMEOUT),
+        alerts_since=starting,
+    )
     deliveries.sort(key=lambda x: x.alert_id)
     from itertools import groupby
 
@@ -145,7 +162,9 @@ async def check_delivery(
 
     for alert_id, group in grouped:
         mapped_alert = await alert_repository.get_alert(alert_id)
-        grouped_delivery.append(GroupedDelivery(receivers=[x.receiver_id for x in group], **mapped_alert.model_dump()))
+        grouped_delivery.append(
+            GroupedDelivery(receivers=[int(x.recipient) for x in group], **mapped_alert.model_dump())
+        )
 
     return grouped_delivery
 
@@ -157,8 +176,10 @@ class Finish(BaseModel):
 
 @router.post("/finish", status_code=200)
 async def finish_delivery(
-    alert_repository: Annotated[AbstractAlertRepository, DEPENDS_ALERT_REPOSITORY],
+    outbox_repository: Annotated[AbstractOutboxRepository, DEPENDS_OUTBOX_REPOSITORY],
     _verificated: Annotated[VerificationResult, DEPENDS_BOT],
     finish: Finish,
 ):
-    await alert_repository.stop_delivery(finish.alert_id, finish.receivers)
+    await outbox_repository.mark_delivered(
+        OutboxChannel.telegram, finish.alert_id, [str(receiver) for receiver in finish.receivers]
+    )
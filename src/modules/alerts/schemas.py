@@ -11,6 +11,18 @@ class AlertDB(BaseModel):
     value: dict[str, Any]
 
 
+class AlertSnapshot(BaseModel):
+    """
+    Results of views at the moment of firing.
+    """
+
+    taken_at: datetime.datetime
+    # rows by view alias
+    results: dict[str, list[dict[str, Any]]] = Field(default_factory=dict)
+    # error by view alias
+    errors: dict[str, str] = Field(default_factory=dict)
+
+
 class MappedAlert(BaseModel):
     id: int
     status: Optional[str] = None
@@ -24,9 +36,4 @@ class MappedAlert(BaseModel):
     severity: Optional[str] = None
     suggested_actions: list[str] = Field(default_factory=list)
     related_views: list[str] = Field(default_factory=list)
-
-
-class AlertDeliveryScheme(BaseModel):
-    alert_id: int
-    receiver_id: int
-    delivered: bool = False
+    snapshot: Optional[AlertSnapshot] = None
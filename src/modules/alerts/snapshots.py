@@ -0,0 +1,100 @@
+__all__ = ["AlertSnapshotter"]
+
+import asyncio
+import datetime
+import logging
+
+from src.config import settings
+from src.modules.alerts.abc import AbstractAlertRepository
+from src.modules.alerts.schemas import AlertSnapshot, MappedAlert
+from src.modules.pg.abc import AbstractPgRepository
+from src.storages.monitoring.config import settings as monitoring_settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    def __init__(self):
+        # alert id -> its views
+        self.alerts: dict[int, list[str]] = {}
+        self.view_aliases: dict[str, None] = {}
+
+
+class AlertSnapshotter:
+    """
+    Save results of the related views of firing alerts in the background, so the state of the target at the moment
+    of the incident can be investigated later without querying the target again.
+
+    Alerts of a target firing within ``COALESCE_WINDOW`` seconds share one snapshot: each view is executed once and
+    its result is saved with every alert which needs it, so an alert storm does not flood the target with queries.
+    """
+
+    def __init__(self, alert_repository: AbstractAlertRepository, pg_repository: AbstractPgRepository):
+        self.alert_repository = alert_repository
+        self.pg_repository = pg_repository
+        self._tasks: set[asyncio.Task] = set()
+        # target alias -> alerts waiting for the snapshot
+        self._batches: dict[str, _Batch] = {}
+
+    def schedule(self, mapped_alert: MappedAlert):
+        if not settings.ALERT_SNAPSHOTS.ENABLED or mapped_alert.status != "firing":
+            return
+
+        view_aliases = [
+            view_alias
+            for view_alias in dict.fromkeys([*mapped_alert.related_views, *settings.ALERT_SNAPSHOTS.VIEWS])
+            if view_alias in monitoring_settings.views
+        ]
+        if not view_aliases:
+            return
+
+        batch = self._batches.get(mapped_alert.target_alias)
+        if batch is None:
+            batch = self._batches[mapped_alert.target_alias] = _Batch()
+            task = asyncio.create_task(self._take(mapped_alert.target_alias, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch.alerts[mapped_alert.id] = view_aliases
+        batch.view_aliases.update(dict.fromkeys(view_aliases))
+
+    async def _take(self, target_alias: str, batch: _Batch):
+        try:
+            await asyncio.sleep(settings.ALERT_SNAPSHOTS.COALESCE_WINDOW)
+        finally:
+            # alerts scheduled from now on get the next snapshot
+            del self._batches[target_alias]
+
+        views = {view_alias: monitoring_settings.views[view_alias] for view_alias in batch.view_aliases}
+        taken_at = datetime.datetime.now(datetime.timezone.utc)
+
+        try:
+            async with asyncio.timeout(settings.ALERT_SNAPSHOTS.TIMEOUT):
+                results, errors = await self.pg_repository.execute_sql_select_many(
+                    {view_alias: view.sql for view_alias, view in views.items()},
+                    limit=settings.ALERT_SNAPSHOTS.LIMIT,
+                    offset=0,
+                    target_alias=target_alias,
+                    primary_only=any(view.requires_primary for view in views.values()),
+                )
+        except Exception as e:
+            # the target may be unavailable or overloaded, that is also worth saving
+            logger.warning(f"Failed to take snapshot of alerts {list(batch.alerts)}: {e!r}")
+            detail = getattr(e, "detail", None) or repr(e)
+            results, errors = {}, {view_alias: detail for view_alias in views}
+
+        for alert_id, view_aliases in batch.alerts.items():
+            snapshot = AlertSnapshot(
+                taken_at=taken_at,
+                results={view_alias: results[view_alias] for view_alias in view_aliases if view_alias in results},
+                errors={view_alias: errors[view_alias] for view_alias in view_aliases if view_alias in errors},
+            )
+            try:
+                await self.alert_repository.save_snapshot(alert_id, snapshot)
+            except Exception:
+                logger.exception(f"Failed to save snapshot of alert {alert_id}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
@@ -6,10 +6,11 @@ from fastapi import Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import ValidationError
 
-from src.modules.auth.telegram import telegram_webapp_check_authorization, TelegramWidgetData
+from src.modules.auth.telegram import verify_webapp_init_data
 from src.api.exceptions import NoCredentialsException, IncorrectCredentialsException
 from src.modules.auth.repository import TokenRepository
 from src.modules.auth.schemas import VerificationResult
+from src.tracing import traced
 
 bearer_scheme = HTTPBearer(
     scheme_name="Bearer",
@@ -27,6 +28,7 @@ async def get_access_token(
         return bearer.credentials
 
 
+@traced("auth.verify_request")
 async def verify_request(
     bearer: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
 ) -> VerificationResult:
@@ -47,18 +49,17 @@ async def verify_request(
         return bot_verification_result
 
     try:
-        telegram_data = TelegramWidgetData.parse_from_string(bearer.credentials)
+        webapp_verification_result = verify_webapp_init_data(bearer.credentials)
     except ValidationError:
         raise IncorrectCredentialsException()
 
-    webapp_verification_result = telegram_webapp_check_authorization(telegram_data)
-
     if webapp_verification_result.success:
         return webapp_verification_result
 
     raise IncorrectCredentialsException()
 
 
+@traced("auth.verify_bot_token")
 async def verify_bot_token(
     token: Optional[str] = Depends(get_access_token),
 ) -> VerificationResult:
@@ -80,6 +81,7 @@ async def verify_bot_token(
     return verification_result
 
 
+@traced("auth.verify_webapp")
 def verify_webapp(
     bearer: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
 ) -> VerificationResult:
@@ -93,9 +95,7 @@ def verify_webapp(
     if not bearer:
         raise NoCredentialsException()
 
-    telegram_data = TelegramWidgetData.parse_from_string(bearer.credentials)
-
-    verification_result = telegram_webapp_check_authorization(telegram_data)
+    verification_result = verify_webapp_init_data(bearer.credentials)
 
     if not verification_result.success:
         raise IncorrectCredentialsException()
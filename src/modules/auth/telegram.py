@@ -1,10 +1,15 @@
 import hashlib
 import hmac
 import json
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
 
 from pydantic import BaseModel
 
 from src.config import settings
+from src.metrics import cache_hit, cache_miss
 from src.modules.auth.schemas import VerificationResult
 
 
@@ -38,21 +43,87 @@ class TelegramWidgetData(BaseModel):
         return self.string_to_hash.encode("utf-8").decode("unicode-escape").encode("ISO-8859-1")
 
 
+@lru_cache(maxsize=1)
+def _webapp_secret_key(token: str) -> bytes:
+    return hmac.new("WebAppData".encode(), token.encode(), hashlib.sha256).digest()
+
+
+def _is_expired(auth_date: int) -> bool:
+    if settings.WEBAPP_AUTH_TTL is None:
+        return False
+    return auth_date + settings.WEBAPP_AUTH_TTL < time.time()
+
+
 def telegram_webapp_check_authorization(telegram_data: TelegramWidgetData) -> VerificationResult:
     """
     Verify telegram data
 
     https://core.telegram.org/widgets/login#checking-authorization
     """
+    if _is_expired(telegram_data.auth_date):
+        return VerificationResult(success=False)
+
     received_hash = telegram_data.hash
     encoded_telegarm_data = telegram_data.encoded
-    token = settings.BOT_TOKEN.get_secret_value()
-    secret_key = hmac.new("WebAppData".encode(), token.encode(), hashlib.sha256).digest()
+    secret_key = _webapp_secret_key(settings.BOT_TOKEN.get_secret_value())
     evaluated_hash = hmac.new(secret_key, encoded_telegarm_data, hashlib.sha256).hexdigest()
 
-    success = evaluated_hash == received_hash
+    success = hmac.compare_digest(evaluated_hash, received_hash)
 
     if success:
         return VerificationResult(success=success, user_id=telegram_data.user_id)
     else:
         return VerificationResult(success=success)
+
+
+class VerifiedInitDataCache:
+    """
+    LRU of already verified webapp initData. The webapp sends the same initData during the whole session,
+    so the string is parsed and checked only once.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        # sha256 of initData -> (user_id, auth_date)
+        self._entries: OrderedDict[bytes, tuple[int, int]] = OrderedDict()
+
+    def get(self, key: bytes) -> Optional[VerificationResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user_id, auth_date = entry
+        if _is_expired(auth_date):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return VerificationResult(success=True, user_id=user_id)
+
+    def put(self, key: bytes, user_id: int, auth_date: int):
+        self._entries[key] = (user_id, auth_date)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+verified_init_data = VerifiedInitDataCache()
+
+
+def verify_webapp_init_data(init_data: str) -> VerificationResult:
+    """
+    Verify webapp initData string using the cache of already verified ones.
+
+    :raises ValidationError: if initData cannot be parsed
+    """
+    key = hashlib.sha256(init_data.encode()).digest()
+    cached = verified_init_data.get(key)
+    if cached is not None:
+        cache_hit("webapp_init_data")
+        return cached
+    cache_miss("webapp_init_data")
+
+    telegram_data = TelegramWidgetData.parse_from_string(init_data)
+    verification_result = telegram_webapp_check_authorization(telegram_data)
+
+    if verification_result.success:
+        verified_init_data.put(key, verification_result.user_id, telegram_data.auth_date)
+    return verification_result
@@ -0,0 +1,24 @@
+__all__ = ["AbstractPrometheusRepository"]
+
+from abc import ABCMeta, abstractmethod
+
+from src.modules.metrics_proxy.schemas import RangeQueryResult
+
+
+class AbstractPrometheusRepository(metaclass=ABCMeta):
+    @abstractmethod
+    async def query_range(self, expr: str, start: float, end: float, points: int) -> "RangeQueryResult":
+        """
+        Evaluate the expression over the range and downsample each series.
+
+        :param expr: PromQL expression.
+        :param start: unix timestamp.
+        :param end: unix timestamp.
+        :param points: maximum points per series in the result.
+        """
+
+    @abstractmethod
+    async def close(self):
+        """
+        Close connections to Prometheus.
+        """
@@ -0,0 +1,49 @@
+"""
+Downsampling of time series for charts.
+"""
+
+__all__ = ["lttb"]
+
+Point = tuple[float, float]
+
+
+def lttb(points: list[Point], threshold: int) -> list[Point]:
+    """
+    Largest-Triangle-Three-Buckets: keep `threshold` points which preserve the visual shape of the series (peaks
+    and drops survive, unlike with averaging or taking every n-th point). The first and the last points are kept.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points
+
+    sampled = [points[0]]
+    # inner points are split into threshold - 2 buckets
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        bucket_start = int(i * bucket_size) + 1
+        bucket_end = int((i + 1) * bucket_size) + 1
+
+        # average of the next bucket is the third vertex of the triangles
+        next_start = bucket_end
+        next_end = min(int((i + 2) * bucket_size) + 1, len(points))
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(x for x, _ in next_bucket) / len(next_bucket)
+        avg_y = sum(y for _, y in next_bucket) / len(next_bucket)
+
+        ax, ay = points[a]
+        max_area = -1.0
+        max_index = bucket_start
+        for j in range(bucket_start, bucket_end):
+            x, y = points[j]
+            # doubled area, only compared
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                max_index = j
+
+        sampled.append(points[max_index])
+        a = max_index
+
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,104 @@
+__all__ = ["PrometheusRepository"]
+
+import asyncio
+import logging
+import math
+from collections import OrderedDict
+
+import httpx
+
+from src.api.exceptions import PrometheusQueryError, PrometheusUnavailableException
+from src.config import settings
+from src.metrics import cache_hit, cache_miss
+from src.modules.metrics_proxy.abc import AbstractPrometheusRepository
+from src.modules.metrics_proxy.downsampling import lttb
+from src.modules.metrics_proxy.schemas import RangeQueryResult, RangeWindow, Series
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+CacheKey = tuple[str, RangeWindow]
+
+
+class PrometheusRepository(AbstractPrometheusRepository):
+    """
+    Range queries to Prometheus for charts. Results are cached by the expression and the window aligned to the step,
+    and concurrent requests for the same window wait for one query, so many viewers of an incident cost one query.
+    """
+
+    def __init__(self):
+        self._client = httpx.AsyncClient(
+            base_url=settings.PROMETHEUS.URL,
+            timeout=settings.METRICS_PROXY.TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.METRICS_PROXY.MAX_CONNECTIONS,
+                max_keepalive_connections=settings.METRICS_PROXY.MAX_CONNECTIONS,
+            ),
+        )
+        self._cache: OrderedDict[CacheKey, list[Series]] = OrderedDict()
+        self._in_flight: dict[CacheKey, asyncio.Task[list[Series]]] = {}
+
+    async def query_range(self, expr: str, start: float, end: float, points: int) -> RangeQueryResult:
+        window = RangeWindow.aligned(start, end, settings.METRICS_PROXY.RESOLUTION, settings.METRICS_PROXY.MIN_STEP)
+        series = await self._get(expr, window)
+        return RangeQueryResult(
+            expr=expr,
+            start=window.start,
+            end=window.end,
+            step=window.step,
+            series=[Series(labels=item.labels, points=lttb(item.points, points)) for item in series],
+        )
+
+    async def _get(self, expr: str, window: RangeWindow) -> list[Series]:
+        key = (expr, window)
+        if key in self._cache:
+            cache_hit("prometheus_ranges")
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            cache_miss("prometheus_ranges")
+            task = asyncio.create_task(self._fetch(key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            # the same query is already running for another viewer
+            cache_hit("prometheus_ranges")
+        # a viewer who disconnects does not cancel the query for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: CacheKey) -> list[Series]:
+        expr, window = key
+        with span("prometheus.query_range", step=window.step, range=window.end - window.start):
+            try:
+                response = await self._client.post(
+                    "/api/v1/query_range",
+                    data={"query": expr, "start": window.start, "end": window.end, "step": window.step},
+                )
+                body = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning(f"Range query to Prometheus failed: {e!r}")
+                raise PrometheusUnavailableException()
+
+        if body.get("status") != "success":
+            # `bad_data` and `execution` are errors of the expression, others are of Prometheus itself
+            if body.get("errorType") in ("bad_data", "execution"):
+                raise PrometheusQueryError(body.get("error") or "Invalid query")
+            raise PrometheusUnavailableException(body.get("error") or "Prometheus is not available")
+
+        series = []
+        for item in body["data"]["result"]:
+            points = [(float(timestamp), float(value)) for timestamp, value in item["values"]]
+            # NaN and Inf (e.g. division by zero) cannot be sent as JSON, they are gaps on the chart
+            series.append(Series(labels=item["metric"], points=[point for point in points if math.isfinite(point[1])]))
+
+        self._cache[key] = series
+        while len(self._cache) > settings.METRICS_PROXY.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return series
+
+    async def close(self):
+        for task in self._in_flight.values():
+            task.cancel()
+        await self._client.aclose()
@@ -0,0 +1,122 @@
+__all__ = ["router"]
+
+import time
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Query
+
+from src.api.dependencies import DEPENDS_PROMETHEUS_REPOSITORY, DEPENDS_VERIFIED_REQUEST
+from src.api.exceptions import (
+    AlertRuleNotFoundException,
+    IncorrectCredentialsException,
+    NoCredentialsException,
+    PanelNotFoundException,
+    PrometheusQueryError,
+    PrometheusUnavailableException,
+)
+from src.api.utils import permission_check
+from src.config import settings
+from src.modules.auth.schemas import VerificationResult
+from src.modules.metrics_proxy.abc import AbstractPrometheusRepository
+from src.modules.metrics_proxy.schemas import RangeQueryResult
+from src.promql import PromQLSyntaxError, with_label_matchers
+from src.storages.monitoring.config import Panel, settings as monitoring_settings
+
+router = APIRouter(prefix="/metrics-proxy", tags=["Metrics proxy"])
+
+RANGE_RESPONSES = {
+    **IncorrectCredentialsException.responses,
+    **NoCredentialsException.responses,
+    **PrometheusQueryError.responses,
+    **PrometheusUnavailableException.responses,
+}
+
+
+class PanelWithAlias(Panel):
+    alias: str
+
+
+async def _query_target(
+    prometheus_repository: AbstractPrometheusRepository,
+    expr: str,
+    target_alias: str,
+    start: Optional[float],
+    end: Optional[float],
+    points: int,
+) -> RangeQueryResult:
+    try:
+        # only the series of the target, whatever the expression selects
+        expr = with_label_matchers(expr, {"target": target_alias})
+    except PromQLSyntaxError as e:
+        raise PrometheusQueryError(str(e))
+
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    if start >= end:
+        raise PrometheusQueryError("`start` must be before `end`")
+    return await prometheus_repository.query_range(expr, start, end, points)
+
+
+@router.get(
+    "/panels",
+    responses={
+        200: {"description": "Get all panels"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+    },
+)
+async def get_panels(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+) -> list[PanelWithAlias]:
+    return [PanelWithAlias(**panel.model_dump(), alias=alias) for alias, panel in monitoring_settings.panels.items()]
+
+
+@router.get(
+    "/panels/{panel_alias}",
+    responses={
+        200: {"description": "Chart of the panel for the target"},
+        **RANGE_RESPONSES,
+        **PanelNotFoundException.responses,
+    },
+)
+async def query_panel(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    prometheus_repository: Annotated[AbstractPrometheusRepository, DEPENDS_PROMETHEUS_REPOSITORY],
+    panel_alias: str,
+    target_alias: str,
+    start: Optional[float] = Query(None, description="Unix timestamp, an hour before `end` by default"),
+    end: Optional[float] = Query(None, description="Unix timestamp, now by default"),
+    points: int = Query(200, ge=3, le=settings.METRICS_PROXY.MAX_POINTS, description="Maximum points per series"),
+) -> RangeQueryResult:
+    permission_check(_verification, target_alias)
+    panel = monitoring_settings.panels.get(panel_alias)
+    if panel is None:
+        raise PanelNotFoundException(panel_alias)
+    return await _query_target(prometheus_repository, panel.expr, target_alias, start, end, points)
+
+
+@router.get(
+    "/alerts/{alert_alias}",
+    responses={
+        200: {"description": "Chart of the expression of the alert rule for the target"},
+        **RANGE_RESPONSES,
+        **AlertRuleNotFoundException.responses,
+    },
+)
+async def query_alert(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    prometheus_repository: Annotated[AbstractPrometheusRepository, DEPENDS_PROMETHEUS_REPOSITORY],
+    alert_alias: str,
+    target_alias: str,
+    start: Optional[float] = Query(None, description="Unix timestamp, an hour before `end` by default"),
+    end: Optional[float] = Query(None, description="Unix timestamp, now by default"),
+    points: int = Query(200, ge=3, le=settings.METRICS_PROXY.MAX_POINTS, description="Maximum points per series"),
+) -> RangeQueryResult:
+    """
+    The metric behind the alert: `rule.expr` is evaluated over the range for the series of the target.
+    """
+    permission_check(_verification, target_alias)
+    alert = monitoring_settings.alerts.get(alert_alias)
+    if alert is None:
+        raise AlertRuleNotFoundException(alert_alias)
+    return await _query_target(prometheus_repository, alert.rule.expr, target_alias, start, end, points)
@@ -0,0 +1,38 @@
+__all__ = ["RangeWindow", "Series", "RangeQueryResult"]
+
+import dataclasses
+
+from pydantic import BaseModel
+
+
+@dataclasses.dataclass(frozen=True)
+class RangeWindow:
+    """
+    Range of a query aligned to its step, so requests made within one step share the same window.
+    """
+
+    start: float
+    end: float
+    step: float
+
+    @classmethod
+    def aligned(cls, start: float, end: float, resolution: int, min_step: float) -> "RangeWindow":
+        # whole seconds, so windows of requests with slightly different ranges are still equal
+        step = max(min_step, float(-(-(end - start) // resolution)))
+        aligned_end = end // step * step
+        aligned_start = min(start // step * step, aligned_end)
+        return cls(start=aligned_start, end=aligned_end, step=step)
+
+
+class Series(BaseModel):
+    labels: dict[str, str]
+    # (unix timestamp, value)
+    points: list[tuple[float, float]]
+
+
+class RangeQueryResult(BaseModel):
+    expr: str
+    start: float
+    end: float
+    step: float
+    series: list[Series]
@@ -0,0 +1,43 @@
+__all__ = ["AbstractOutboxRepository"]
+
+import datetime
+from abc import ABCMeta, abstractmethod
+from typing import Optional
+
+from src.modules.outbox.schemas import CreateOutboxMessage, OutboxMessageScheme
+from src.storages.sqlalchemy.models.outbox import OutboxChannel
+
+
+class AbstractOutboxRepository(metaclass=ABCMeta):
+    @abstractmethod
+    async def enqueue(self, messages: list["CreateOutboxMessage"]) -> None:
+        ...
+
+    @abstractmethod
+    async def lease_due(
+        self,
+        channels: list["OutboxChannel"],
+        limit: int,
+        lease_timeout: datetime.timedelta,
+        alerts_since: Optional[datetime.datetime] = None,
+    ) -> list["OutboxMessageScheme"]:
+        """
+        Take due messages for delivery. Leased messages are not offered again until the lease expires.
+
+        :param channels: channels to take messages from.
+        :param limit: maximum number of messages.
+        :param lease_timeout: time for delivery before the message is offered again.
+        :param alerts_since: take only messages about alerts that started after this moment.
+        """
+
+    @abstractmethod
+    async def mark_sent(self, message_ids: list[int]) -> None:
+        ...
+
+    @abstractmethod
+    async def mark_delivered(self, channel: "OutboxChannel", alert_id: int, recipients: list[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def mark_failed(self, message: "OutboxMessageScheme", error: str) -> None:
+        ...
@@ -0,0 +1,23 @@
+__all__ = ["email_handler"]
+
+from src.modules.alerts.abc import AbstractAlertRepository
+from src.modules.outbox.scheduler import Handler
+from src.modules.outbox.schemas import OutboxMessageScheme
+from src.modules.smtp.abc import AbstractSMTPRepository
+
+
+def email_handler(smtp_repository: AbstractSMTPRepository, alert_repository: AbstractAlertRepository) -> Handler:
+    async def handle(message: OutboxMessageScheme):
+        kind = message.payload.get("kind")
+
+        if kind == "alert":
+            mapped_alert = await alert_repository.get_alert(message.alert_id)
+            if mapped_alert is None:
+                raise ValueError(f"Alert {message.alert_id} not found")
+            await smtp_repository.send_alert_message(message.recipient, mapped_alert)
+        elif kind == "connect_email":
+            await smtp_repository.send_connect_email(message.recipient, message.payload["auth_code"])
+        else:
+            raise ValueError(f"Unknown email kind `{kind}`")
+
+    return handle
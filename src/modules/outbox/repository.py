@@ -0,0 +1,142 @@
+__all__ = ["OutboxRepository", "backoff_delay"]
+
+import datetime
+import logging
+import random
+from typing import Optional
+
+from sqlalchemy import insert, select, update, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.modules.outbox.abc import AbstractOutboxRepository
+from src.modules.outbox.schemas import CreateOutboxMessage, OutboxMessageScheme
+from src.storages.sqlalchemy import AbstractSQLAlchemyStorage
+from src.storages.sqlalchemy.models.alerts import Alert
+from src.storages.sqlalchemy.models.outbox import OutboxMessage, OutboxChannel, OutboxStatus
+from src.tracing import traced_methods
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempts: int) -> datetime.timedelta:
+    """
+    Exponential backoff with jitter, so messages failed at the same moment are not retried at the same moment.
+    """
+    delay = min(settings.OUTBOX.BACKOFF_BASE * 2 ** max(attempts - 1, 0), settings.OUTBOX.BACKOFF_MAX)
+    return datetime.timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+@traced_methods
+class OutboxRepository(AbstractOutboxRepository):
+    def __init__(self, storage: AbstractSQLAlchemyStorage):
+        self.storage = storage
+
+    def _create_session(self) -> AsyncSession:
+        return self.storage.create_session()
+
+    async def enqueue(self, messages: list["CreateOutboxMessage"]) -> None:
+        if not messages:
+            return
+
+        async with self._create_session() as session:
+            statement = insert(OutboxMessage).values([message.model_dump() for message in messages])
+            await session.execute(statement)
+            await session.commit()
+
+    async def lease_due(
+        self,
+        channels: list["OutboxChannel"],
+        limit: int,
+        lease_timeout: datetime.timedelta,
+        alerts_since: Optional[datetime.datetime] = None,
+    ) -> list["OutboxMessageScheme"]:
+        now = _now()
+
+        async with self._create_session() as session:
+            q = (
+                select(OutboxMessage)
+                .where(
+                    and_(
+                        OutboxMessage.status == OutboxStatus.pending,
+                        OutboxMessage.channel.in_(channels),
+                        OutboxMessage.next_attempt_at <= now,
+                    )
+                )
+                .order_by(OutboxMessage.priority, OutboxMessage.next_attempt_at)
+                .limit(limit)
+                # several workers must not take the same message
+                .with_for_update(skip_locked=True, of=OutboxMessage)
+            )
+            if alerts_since is not None:
+                q = q.join(Alert, Alert.id == OutboxMessage.alert_id).where(Alert.timestamp >= alerts_since)
+
+            due = list(await session.scalars(q))
+            leased = []
+
+            for message in due:
+                scheme = OutboxMessageScheme.model_validate(message)
+                if message.attempts >= settings.OUTBOX.MAX_ATTEMPTS:
+                    # lease has expired too many times (delivery was never confirmed)
+                    message.status = OutboxStatus.dead
+                    message.last_error = message.last_error or "Delivery was not confirmed"
+                    logger.warning(f"Outbox message {message.id} ({message.channel}) is dead: {message.last_error}")
+                    continue
+
+                message.attempts += 1
+                message.next_attempt_at = now + lease_timeout + backoff_delay(message.attempts)
+                leased.append(scheme)
+
+            await session.commit()
+            return leased
+
+    async def mark_sent(self, message_ids: list[int]) -> None:
+        if not message_ids:
+            return
+
+        async with self._create_session() as session:
+            statement = (
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(message_ids))
+                .values(status=OutboxStatus.sent, last_error=None)
+            )
+            await session.execute(statement)
+            await session.commit()
+
+    async def mark_delivered(self, channel: "OutboxChannel", alert_id: int, recipients: list[str]) -> None:
+        async with self._create_session() as session:
+            statement = (
+                update(OutboxMessage)
+                .where(
+                    and_(
+                        OutboxMessage.channel == channel,
+                        OutboxMessage.alert_id == alert_id,
+                        OutboxMessage.recipient.in_(recipients),
+                        OutboxMessage.status == OutboxStatus.pending,
+                    )
+                )
+                .values(status=OutboxStatus.sent, last_error=None)
+            )
+            await session.execute(statement)
+            await session.commit()
+
+    async def mark_failed(self, message: "OutboxMessageScheme", error: str) -> None:
+        # attempts were already counted when the message was leased
+        attempts = message.attempts + 1
+
+        if attempts >= settings.OUTBOX.MAX_ATTEMPTS:
+            logger.warning(
+                f"Outbox message {message.id} ({message.channel}) is dead after {attempts} attempts: {error}"
+            )
+            values = dict(status=OutboxStatus.dead, last_error=error)
+        else:
+            values = dict(next_attempt_at=_now() + backoff_delay(attempts), last_error=error)
+
+        async with self._create_session() as session:
+            statement = update(OutboxMessage).where(OutboxMessage.id == message.id).values(**values)
+            await session.execute(statement)
+            await session.commit()
@@ -0,0 +1,108 @@
+__all__ = ["OutboxScheduler", "Handler"]
+
+import asyncio
+import datetime
+import logging
+from typing import Awaitable, Callable
+
+from src.config import settings
+from src.modules.outbox.abc import AbstractOutboxRepository
+from src.modules.outbox.schemas import OutboxMessageScheme
+from src.storages.sqlalchemy.models.outbox import OutboxChannel
+from src.tracing import trace
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[OutboxMessageScheme], Awaitable[None]]
+
+
+class OutboxScheduler:
+    """
+    In-process delivery of outbox messages.
+
+    One task leases due messages into a bounded priority queue, a fixed number of workers deliver them.
+    Failed messages are rescheduled by the repository with exponential backoff, so a degraded channel
+    costs at most ``CONCURRENCY`` deliveries at a time.
+    """
+
+    def __init__(self, outbox_repository: AbstractOutboxRepository, handlers: dict[OutboxChannel, Handler]):
+        self.outbox_repository = outbox_repository
+        self.handlers = handlers
+        self._queue: asyncio.PriorityQueue[
+            tuple[int, datetime.datetime, int, OutboxMessageScheme]
+        ] = asyncio.PriorityQueue(maxsize=settings.OUTBOX.BATCH_SIZE)
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def wakeup(self):
+        """
+        Notify the scheduler about new messages without waiting for the next poll.
+        """
+        self._wakeup.set()
+
+    async def start(self):
+        if self._tasks or not self.handlers:
+            return
+        self._tasks.append(asyncio.create_task(self._lease_loop()))
+        for _ in range(settings.OUTBOX.CONCURRENCY):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _lease_loop(self):
+        lease_timeout = datetime.timedelta(seconds=settings.OUTBOX.LEASE_TIMEOUT)
+
+        while True:
+            free = self._queue.maxsize - self._queue.qsize()
+            if free > 0:
+                try:
+                    messages = await self.outbox_repository.lease_due(
+                        list(self.handlers), limit=free, lease_timeout=lease_timeout
+                    )
+                except Exception:
+                    logger.exception("Failed to lease outbox messages")
+                    messages = []
+
+                for message in messages:
+                    self._queue.put_nowait((message.priority, message.next_attempt_at, message.id, message))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.OUTBOX.POLL_INTERVAL)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _worker(self):
+        while True:
+            *_, message = await self._queue.get()
+            try:
+                # each delivery is a trace of its own, there is no request to attach it to
+                with trace("outbox.deliver", message_id=message.id, channel=message.channel):
+                    try:
+                        await self.handlers[message.channel](message)
+                    except Exception as e:
+                        logger.warning(f"Failed to deliver outbox message {message.id} ({message.channel}): {e!r}")
+                        await self._report(self.outbox_repository.mark_failed(message, repr(e)))
+                    else:
+                        await self._report(self.outbox_repository.mark_sent([message.id]))
+            finally:
+                self._queue.task_done()
+
+            if self._queue.empty():
+                self.wakeup()
+
+    @staticmethod
+    async def _report(coro: Awaitable[None]):
+        # message stays leased and will be offered again if the result cannot be saved
+        try:
+            await coro
+        except Exception:
+            logger.exception("Failed to save outbox delivery result")
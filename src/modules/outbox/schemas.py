@@ -0,0 +1,37 @@
+__all__ = ["CreateOutboxMessage", "OutboxMessageScheme", "alert_priority"]
+
+import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field, ConfigDict
+
+from src.storages.sqlalchemy.models.outbox import OutboxChannel, OutboxStatus
+
+
+def alert_priority(severity: Optional[str]) -> int:
+    """
+    Lower value is delivered first.
+    """
+    if severity == "critical":
+        return 0
+    if severity == "warning":
+        return 1
+    return 2
+
+
+class CreateOutboxMessage(BaseModel):
+    channel: OutboxChannel
+    recipient: str
+    alert_id: Optional[int] = None
+    payload: dict[str, Any] = Field(default_factory=dict)
+    priority: int = 0
+
+
+class OutboxMessageScheme(CreateOutboxMessage):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    status: OutboxStatus
+    attempts: int
+    next_attempt_at: datetime.datetime
+    last_error: Optional[str] = None
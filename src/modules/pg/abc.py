@@ -3,25 +3,66 @@ __all__ = ["AbstractPgRepository"]
 from abc import ABCMeta, abstractmethod
 from typing import Optional, Any
 
-from src.config import Target
-
 
 class AbstractPgRepository(metaclass=ABCMeta):
     # ----------------- CRUD ----------------- #
     @abstractmethod
-    async def execute_sql(self, sql: str, binds: dict[str, Any], target: Target) -> None:
+    async def execute_sql(self, sql: str, binds: dict[str, Any], target_alias: str) -> None:
         ...
 
     @abstractmethod
     async def execute_sql_select(
-        self, sql: str, limit: int, offset: int, target: Target
+        self,
+        sql: str,
+        limit: int,
+        offset: int,
+        target_alias: str,
+        primary_only: bool = False,
+        hot: bool = False,
     ) -> Optional[list[dict[str, Any]]]:
-        ...
+        """
+        :param primary_only: do not route the query to a replica
+        :param hot: execute the query by the driver as a prepared statement cached per connection
+        """
 
     @abstractmethod
-    async def execute_ssh(self, command: str, binds: dict[str, Any], target: Target) -> str:
-        ...
+    async def execute_sql_select_json(
+        self, sql: str, limit: int, offset: int, target_alias: str, primary_only: bool = False
+    ) -> bytes:
+        """
+        Same as `execute_sql_select`, but rows are serialized to a JSON array by the database. Queries the database
+        rejects once wrapped (e.g. several statements) are executed as is and serialized here.
+
+        :return: UTF-8 encoded JSON array
+        """
+
+    @abstractmethod
+    async def explain_sql(
+        self, sql: str, limit: int, offset: int, target_alias: str, primary_only: bool = False
+    ) -> Any:
+        """
+        Plan of the query without executing it (`EXPLAIN (ANALYZE off, FORMAT JSON)`).
+        """
 
     @abstractmethod
-    async def fetch_targets(self) -> list[str]:
+    async def execute_sql_select_many(
+        self, sqls: dict[str, str], limit: int, offset: int, target_alias: str, primary_only: bool = False
+    ) -> tuple[dict[str, list[dict[str, Any]]], dict[str, str]]:
+        """
+        Execute queries on one connection in one REPEATABLE READ READ ONLY transaction, so that their results
+        are consistent with each other.
+
+        :param sqls: queries by keys
+        :param primary_only: do not route the queries to a replica
+        :return: results and errors of failed queries by keys
+        """
+
+    @abstractmethod
+    async def execute_ssh(self, command: str, binds: dict[str, Any], target_alias: str) -> str:
         ...
+
+    @abstractmethod
+    async def fetch_targets(self, user_id: Optional[int] = None) -> list[str]:
+        """
+        Aliases of all targets or only of the targets where the user is an admin.
+        """
@@ -0,0 +1,69 @@
+__all__ = ["PreparedStatements", "compile_binds"]
+
+import functools
+import re
+import weakref
+from typing import Any
+
+import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+
+from src.metrics import cache_hit, cache_miss
+
+# `:name` binds of `sqlalchemy.text`, but not `::type` casts
+_BIND_RE = re.compile(r"(?<![:\w\\]):(\w+)(?!:)")
+
+
+@functools.lru_cache(maxsize=256)
+def compile_binds(sql: str) -> tuple[str, tuple[str, ...]]:
+    """
+    Replace `:name` binds with asyncpg positional `$n` parameters.
+
+    :return: query and names of the parameters in order of their positions
+    """
+    names: list[str] = []
+
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _BIND_RE.sub(replace, sql), tuple(names)
+
+
+class PreparedStatements:
+    """
+    Prepared statements cached per asyncpg connection, so a frequently executed query is parsed and planned
+    by the server once per connection. Statements are dropped together with their connection.
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._statements: weakref.WeakKeyDictionary[
+            asyncpg.Connection, dict[str, PreparedStatement]
+        ] = weakref.WeakKeyDictionary()
+
+    async def _prepare(self, connection: asyncpg.Connection, sql: str) -> PreparedStatement:
+        statements = self._statements.setdefault(connection, {})
+        statement = statements.get(sql)
+        if statement is not None:
+            cache_hit("prepared_statements")
+        else:
+            cache_miss("prepared_statements")
+            if len(statements) >= self.max_size:
+                # the oldest one
+                statements.pop(next(iter(statements)))
+            statement = statements[sql] = await connection.prepare(sql)
+        return statement
+
+    async def fetch(self, connection: asyncpg.Connection, sql: str, binds: dict[str, Any]) -> list[asyncpg.Record]:
+        query, names = compile_binds(sql)
+        args = [binds.get(name) for name in names]
+
+        try:
+            return await (await self._prepare(connection, query)).fetch(*args)
+        except (asyncpg.InvalidCachedStatementError, asyncpg.OutdatedSchemaCacheError):
+            # schema of the used tables has changed
+            self._statements.get(connection, {}).pop(query, None)
+            return await (await self._prepare(connection, query)).fetch(*args)
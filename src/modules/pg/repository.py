@@ -1,25 +1,38 @@
+import asyncio
 import datetime
-from typing import Optional, Any
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Mapping, Optional, Any, TypeVar
 
+import asyncpg
 import jinja2
 import paramiko
 from paramiko.ssh_exception import SSHException
-from sqlalchemy import Row
-from sqlalchemy.exc import DBAPIError
+from sqlalchemy import Row, TextClause
+from sqlalchemy.exc import DBAPIError, InterfaceError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.sql import text
 
-from src.api.exceptions import SQLQueryError, SSHQueryError
+from src.api.exceptions import SQLQueryError, SSHQueryError, TargetBusyException, TargetUnavailableException
 from src.config import settings, Target
 from src.modules.pg.abc import AbstractPgRepository
-from src.storages.sqlalchemy import AbstractSQLAlchemyStorage
+from src.modules.pg.prepared import PreparedStatements
+from src.modules.targets.abc import AbstractTargetRepository
+from src.modules.targets.bulkhead import BulkheadFullError
+from src.modules.targets.replicas import Replica
+from src.modules.targets.schemas import TargetComponent
+from src.tracing import span, traced_methods
 
+logger = logging.getLogger(__name__)
 
-def table_rows_to_list_of_dicts(table_rows: list[Row], /) -> list[dict[str, Any]]:
+T = TypeVar("T")
+
+
+def _mappings_to_list_of_dicts(mappings: Iterable[Mapping], /) -> list[dict[str, Any]]:
     rows = []
-    for table_row in table_rows:
-        r = table_row._mapping
+    for r in mappings:
         row = dict()
         # translate to dict[str, str]
         for k, v in r.items():
@@ -34,53 +47,285 @@ def table_rows_to_list_of_dicts(table_rows: list[Row], /) -> list[dict[str, Any]
     return rows
 
 
-class PgRepository(AbstractPgRepository):
-    def __init__(self, storage: AbstractSQLAlchemyStorage):
-        self.storage = storage
+def table_rows_to_list_of_dicts(table_rows: list[Row], /) -> list[dict[str, Any]]:
+    return _mappings_to_list_of_dicts(table_row._mapping for table_row in table_rows)
+
+
+def records_to_list_of_dicts(records: list[asyncpg.Record], /) -> list[dict[str, Any]]:
+    return _mappings_to_list_of_dicts(records)
+
+
+def _json_default(value: Any) -> str:
+    # dates are left as is by `_mappings_to_list_of_dicts`, format them like Postgres does
+    return value.isoformat()
 
-    def _create_session(self) -> AsyncSession:
-        return self.storage.create_session()
 
-    async def execute_sql(self, sql: str, binds: dict[str, Any], target: Target) -> None:
-        engine = create_async_engine(target.DB_URL.get_secret_value(), pool_recycle=3600)
+def _wrap_in_json_agg(sql: str) -> Optional[str]:
+    """
+    Query returning rows of `sql` serialized to a JSON array, None if `sql` can't be wrapped.
+    """
+    sql = sql.strip().rstrip(";")
+    # the newline ends a trailing `-- comment` of the query
+    wrapped = f"SELECT convert_to(coalesce(json_agg(view_rows), '[]'::json)::text, 'UTF8') FROM ({sql}\n) AS view_rows"
+    try:
+        if text(wrapped).compile().params.keys() != text(sql).compile().params.keys():
+            return None
+    except Exception:  # noqa
+        return None
+    return wrapped
+
+
+def _paginated(sql: str, limit: int, offset: int) -> TextClause:
+    statement = text(sql)
+    # get all params from statement
+    params = statement.compile().params
+    binds = dict(limit=limit, offset=offset)
+    binds = {k: v for k, v in binds.items() if k in params}
+    return statement.bindparams(**binds)
+
+
+# bytes read from the channel at once, also the tail of stderr put to the error
+_SSH_READ_SIZE = 4096
+
+
+def _run_ssh_command(target: Target, command: str, timeout: float) -> None:
+    client = paramiko.client.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+    try:
+        try:
+            client.connect(
+                hostname=target.SSH_HOST,
+                port=target.SSH_PORT,
+                username=target.SSH_USERNAME,
+                password=target.SSH_PASSWORD,
+                timeout=timeout,
+                banner_timeout=timeout,
+                auth_timeout=timeout,
+            )
+        except paramiko.ssh_exception.AuthenticationException as e:
+            raise SSHQueryError(str(e)) from e
+        except SSHException as e:
+            # SSH handshake has failed, the server is not usable
+            raise ConnectionError(str(e)) from e
 
         try:
-            async with engine.connect() as session:
+            _stdin, stdout, stderr = client.exec_command(command)
+        except SSHException as e:
+            raise SSHQueryError(str(e)) from e
+
+        # the session (and the slot of the target) is held until the command has finished
+        channel = stdout.channel
+        deadline = time.monotonic() + target.SSH_COMMAND_TIMEOUT
+        error = b""
+        while not channel.status_event.wait(0.1):
+            # output is drained, otherwise the command blocks once the window of the channel is full
+            while channel.recv_ready():
+                channel.recv(_SSH_READ_SIZE)
+            while channel.recv_stderr_ready():
+                error = (error + channel.recv_stderr(_SSH_READ_SIZE))[-_SSH_READ_SIZE:]
+            if time.monotonic() > deadline:
+                raise SSHQueryError(f"Command has not finished in {target.SSH_COMMAND_TIMEOUT} seconds")
+        exit_status = channel.recv_exit_status()
+        if exit_status > 0:
+            error = (error + stderr.read())[-_SSH_READ_SIZE:]
+            raise SSHQueryError(f"Command exited with status {exit_status}: {error.decode(errors='replace').strip()}")
+    finally:
+        client.close()
+
+
+@traced_methods
+class PgRepository(AbstractPgRepository):
+    def __init__(self, target_repository: AbstractTargetRepository):
+        self.target_repository = target_repository
+        self._prepared_statements = PreparedStatements()
+        # queries rejected by the database once wrapped in `json_agg`, their rows are serialized here
+        self._not_wrappable: set[str] = set()
+
+    def _create_session(self, target_alias: str) -> AsyncSession:
+        return self.target_repository.get_storage(target_alias).create_session()
+
+    @asynccontextmanager
+    async def _call_target(
+        self, target_alias: str, component: TargetComponent, replica: Optional[Replica] = None
+    ) -> AsyncIterator[None]:
+        """
+        Fail immediately if the circuit of the target (or its replica) is open or too many calls are waiting for it,
+        report the result of the call to the breaker.
+        """
+        if replica is None:
+            breaker = self.target_repository.get_breaker(target_alias, component)
+            bulkhead = self.target_repository.get_bulkhead(target_alias, component)
+            name = component
+        else:
+            breaker, bulkhead, name = replica.breaker, replica.bulkhead, f"replica {replica.name}"
+
+        node = "primary" if replica is None else replica.name
+        async with span(f"target.{component}", target_alias=target_alias, node=node):
+            if not breaker.allow():
+                raise TargetUnavailableException(target_alias, name, breaker.retry_after())
+
+            try:
+                async with bulkhead.acquire():
+                    yield
+            except BulkheadFullError as e:
+                breaker.release()
+                raise TargetBusyException(target_alias, name) from e
+            except (OSError, InterfaceError, asyncpg.PostgresConnectionError) as e:
+                # connection refused, timed out or dropped
+                breaker.record_failure()
+                raise TargetUnavailableException(target_alias, name, breaker.retry_after()) from e
+            except DBAPIError as e:
+                if e.connection_invalidated:
+                    breaker.record_failure()
+                    raise TargetUnavailableException(target_alias, name, breaker.retry_after()) from e
+                breaker.record_success()
+                raise SQLQueryError(str(e))
+            except asyncpg.PostgresError as e:
+                # error of a query executed by the driver directly
+                breaker.record_success()
+                raise SQLQueryError(str(e))
+            except Exception:
+                # the target has answered
+                breaker.record_success()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                breaker.record_success()
+
+    async def execute_sql(self, sql: str, binds: dict[str, Any], target_alias: str) -> None:
+        async with self._call_target(target_alias, TargetComponent.db):
+            async with self._create_session(target_alias) as session:
                 statement = text(sql)
                 # get all params from statement
                 params = statement.compile().params
                 binds = {k: v for k, v in binds.items() if k in params}
                 statement = statement.bindparams(**binds)
-                try:
-                    await session.execute(statement)
-                except DBAPIError as e:
-                    raise SQLQueryError(str(e))
+                await session.execute(statement)
                 await session.commit()
-        except ConnectionRefusedError as e:
-            raise SQLQueryError(str(e))
+
+    @asynccontextmanager
+    async def _read_session(self, target_alias: str, replica: Optional[Replica]) -> AsyncIterator[AsyncSession]:
+        async with self._call_target(target_alias, TargetComponent.db, replica):
+            if replica is None:
+                session = self._create_session(target_alias)
+            else:
+                session = replica.storage.create_session()
+
+            async with session:
+                yield session
+
+    async def _read(
+        self,
+        target_alias: str,
+        primary_only: bool,
+        read: Callable[[Optional[Replica]], Awaitable[T]],
+    ) -> T:
+        """
+        Run `read` on a replica if possible, on the primary otherwise.
+        """
+        if not primary_only:
+            replica = self.target_repository.select_replica(target_alias)
+            if replica is not None:
+                try:
+                    return await read(replica)
+                except TargetUnavailableException as e:
+                    logger.warning(f"{e.detail}, the query is sent to the primary")
+
+        return await read(None)
 
     async def execute_sql_select(
-        self, sql: str, limit: int, offset: int, target: Target
+        self,
+        sql: str,
+        limit: int,
+        offset: int,
+        target_alias: str,
+        primary_only: bool = False,
+        hot: bool = False,
     ) -> Optional[list[dict[str, Any]]]:
-        engine = create_async_engine(target.DB_URL.get_secret_value(), pool_recycle=3600)
-
-        async with engine.connect() as session:
-            statement = text(sql)
-            # get all params from statement
-            params = statement.compile().params
-            binds = dict(limit=limit, offset=offset)
-            binds = {k: v for k, v in binds.items() if k in params}
-            statement = statement.bindparams(**binds)
-            try:
-                r = await session.execute(statement)
-            except DBAPIError as e:
-                raise SQLQueryError(str(e))
-            table_rows = r.fetchall()
+        async def read(replica: Optional[Replica]) -> list[dict[str, Any]]:
+            async with self._read_session(target_alias, replica) as session:
+                if hot:
+                    # bypass SQLAlchemy statement compilation and result wrappers
+                    connection = await session.connection()
+                    raw_connection = await connection.get_raw_connection()
+                    records = await self._prepared_statements.fetch(
+                        raw_connection.driver_connection, sql, dict(limit=limit, offset=offset)
+                    )
+                    return records_to_list_of_dicts(records)
+
+                r = await session.execute(_paginated(sql, limit, offset))
+                table_rows = r.fetchall()
             return table_rows_to_list_of_dicts(list(table_rows))
 
-    async def execute_ssh(self, command: str, binds: dict[str, Any], target: Target) -> None:
-        client = paramiko.client.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        return await self._read(target_alias, primary_only, read)
+
+    async def execute_sql_select_json(
+        self, sql: str, limit: int, offset: int, target_alias: str, primary_only: bool = False
+    ) -> bytes:
+        # rows are serialized by Postgres, only one value is transferred and nothing is parsed here
+        wrapped = None if sql in self._not_wrappable else _wrap_in_json_agg(sql)
+
+        async def read(replica: Optional[Replica]) -> bytes:
+            async with self._read_session(target_alias, replica) as session:
+                if wrapped is not None:
+                    try:
+                        return await session.scalar(_paginated(wrapped, limit, offset))
+                    except DBAPIError as e:
+                        if not isinstance(e.orig.__cause__, asyncpg.PostgresSyntaxError):
+                            raise
+                        logger.warning(f"Query can't be serialized by the database, rows are serialized here: {e}")
+                        self._not_wrappable.add(sql)
+                        await session.rollback()
+
+                r = await session.execute(_paginated(sql, limit, offset))
+                rows = table_rows_to_list_of_dicts(list(r.fetchall()))
+            return json.dumps(rows, default=_json_default, ensure_ascii=False).encode()
+
+        return await self._read(target_alias, primary_only, read)
+
+    async def explain_sql(
+        self, sql: str, limit: int, offset: int, target_alias: str, primary_only: bool = False
+    ) -> Any:
+        explain = f"EXPLAIN (ANALYZE off, FORMAT JSON) {sql.strip().rstrip(';')}"
+
+        async def read(replica: Optional[Replica]) -> Any:
+            async with self._read_session(target_alias, replica) as session:
+                plan = await session.scalar(_paginated(explain, limit, offset))
+            # json is not decoded by the driver
+            return json.loads(plan) if isinstance(plan, str) else plan
+
+        return await self._read(target_alias, primary_only, read)
+
+    async def execute_sql_select_many(
+        self, sqls: dict[str, str], limit: int, offset: int, target_alias: str, primary_only: bool = False
+    ) -> tuple[dict[str, list[dict[str, Any]]], dict[str, str]]:
+        async def read(replica: Optional[Replica]) -> tuple[dict[str, list[dict[str, Any]]], dict[str, str]]:
+            results, errors = {}, {}
+
+            async with self._read_session(target_alias, replica) as session:
+                # all queries see the same snapshot of the database
+                await session.connection(
+                    execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+                )
+                for key, sql in sqls.items():
+                    try:
+                        # failed query does not abort the transaction for the others
+                        async with session.begin_nested():
+                            r = await session.execute(_paginated(sql, limit, offset))
+                            results[key] = table_rows_to_list_of_dicts(list(r.fetchall()))
+                    except DBAPIError as e:
+                        if e.connection_invalidated or isinstance(e, InterfaceError):
+                            raise
+                        errors[key] = str(e)
+            return results, errors
+
+        return await self._read(target_alias, primary_only, read)
+
+    async def execute_ssh(self, command: str, binds: dict[str, Any], target_alias: str) -> None:
+        target = self.target_repository.get(target_alias)
 
         command_template = jinja2.Environment(autoescape=True).from_string(command)
         target_db_url = target.DB_URL.get_secret_value()
@@ -88,22 +333,12 @@ class PgRepository(AbstractPgRepository):
         target_dict["TARGET__DB_URL"] = target_db_url
         binds.update(**settings.flatten(), **target_dict)
         binded = command_template.render(**binds)
-        try:
-            client.connect(
-                hostname=target.SSH_HOST,
-                port=target.SSH_PORT,
-                username=target.SSH_USERNAME,
-                password=target.SSH_PASSWORD,
-            )
-        except paramiko.ssh_exception.AuthenticationException as e:
-            raise SSHQueryError(str(e))
-        # TODO: Think how to fetch responses better
 
-        try:
-            _stdin, _stdout, _stderr = client.exec_command(binded)
-        except SSHException as e:
-            print(e)
-            raise SSHQueryError(str(e))
+        async with self._call_target(target_alias, TargetComponent.ssh):
+            # paramiko is blocking, it must not stop the event loop
+            await asyncio.to_thread(_run_ssh_command, target, binded, target.CONNECT_TIMEOUT)
 
-    async def fetch_targets(self) -> list[str]:
-        return list(settings.TARGETS.keys())
+    async def fetch_targets(self, user_id: Optional[int] = None) -> list[str]:
+        if user_id is None:
+            return self.target_repository.aliases()
+        return list(settings.permissions.targets_of(user_id))
@@ -4,13 +4,20 @@ from typing import Annotated
 
 from fastapi import APIRouter
 
-from src.api.dependencies import DEPENDS_BOT, DEPENDS_PG_STAT_REPOSITORY
+from src.api.dependencies import (
+    DEPENDS_BOT,
+    DEPENDS_PG_STAT_REPOSITORY,
+    DEPENDS_TARGET_HEALTH_PROBER,
+    DEPENDS_VERIFIED_REQUEST,
+)
 from src.api.exceptions import (
     IncorrectCredentialsException,
     NoCredentialsException,
 )
 from src.modules.auth.schemas import VerificationResult
 from src.modules.pg.repository import AbstractPgRepository
+from src.modules.targets.prober import TargetHealthProber
+from src.modules.targets.schemas import TargetHealth
 
 router = APIRouter(prefix="/pg", tags=["Postgres"])
 
@@ -28,3 +35,42 @@ async def targets(
     pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
 ) -> list[str]:
     return await pg_repository.fetch_targets()
+
+
+@router.get(
+    "/targets/available",
+    responses={
+        200: {"description": "Aliases of targets available for the caller"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+    },
+)
+async def available_targets(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
+) -> list[str]:
+    """
+    Targets where the user is an admin (all targets for the bot itself)
+    """
+    return await pg_repository.fetch_targets(user_id=_verification.user_id)
+
+
+@router.get(
+    "/targets/health",
+    responses={
+        200: {"description": "Last health checks of the targets available for the caller"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+    },
+)
+async def targets_health(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
+    target_health_prober: Annotated[TargetHealthProber, DEPENDS_TARGET_HEALTH_PROBER],
+) -> list[TargetHealth]:
+    """
+    Availability of databases and SSH servers of the targets. Targets are checked in the background,
+    the endpoint does not connect to them.
+    """
+    target_aliases = await pg_repository.fetch_targets(user_id=_verification.user_id)
+    return target_health_prober.health(target_aliases)
@@ -7,7 +7,7 @@ from src.modules.alerts.schemas import MappedAlert
 
 class AbstractSMTPRepository(metaclass=ABCMeta):
     @abstractmethod
-    def send(self, message: str, to: str):
+    async def send(self, message: str, to: str):
         """
         Send message to email.
 
@@ -16,7 +16,7 @@ class AbstractSMTPRepository(metaclass=ABCMeta):
         """
 
     @abstractmethod
-    def send_connect_email(self, email: str, auth_code: str):
+    async def send_connect_email(self, email: str, auth_code: str):
         """
         Send message to email.
 
@@ -25,7 +25,7 @@ class AbstractSMTPRepository(metaclass=ABCMeta):
         """
 
     @abstractmethod
-    def send_alert_message(
+    async def send_alert_message(
         self,
         email: str,
         mapped_alert: "MappedAlert",
@@ -35,3 +35,9 @@ class AbstractSMTPRepository(metaclass=ABCMeta):
 
         :param email: email address.
         """
+
+    @abstractmethod
+    async def close(self):
+        """
+        Close all connections to the SMTP server.
+        """
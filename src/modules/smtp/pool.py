@@ -0,0 +1,137 @@
+__all__ = ["SMTPConnectionPool"]
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiosmtplib
+
+from src.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Connection is dropped and established again on these errors, any SMTP error response to NOOP
+# (e.g. 421 service not available) means the connection can't be reused either
+_CONNECTION_ERRORS = (
+    aiosmtplib.SMTPException,
+    OSError,
+)
+
+
+class _Connection:
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Small pool of authenticated SMTP connections.
+
+    Connections are established lazily, reused between messages and checked with ``NOOP`` after being idle
+    for ``healthcheck_interval`` seconds. Broken connections are replaced with new ones.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str,
+        password: str,
+        size: int = 4,
+        timeout: float = 30,
+        healthcheck_interval: float = 60,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+
+        self._semaphore = asyncio.Semaphore(size)
+        # LIFO to keep the most recently used (warmest) connections busy
+        self._idle: list[_Connection] = []
+
+    async def _connect(self) -> _Connection:
+        # STARTTLS and login are done by `connect` as the server supports it
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            timeout=self.timeout,
+        )
+        await client.connect()
+        return _Connection(client)
+
+    async def _is_healthy(self, connection: _Connection) -> bool:
+        if not connection.client.is_connected:
+            return False
+        if time.monotonic() - connection.last_used < self.healthcheck_interval:
+            return True
+        try:
+            await connection.client.noop()
+            return True
+        except _CONNECTION_ERRORS:
+            return False
+
+    async def _acquire(self) -> _Connection:
+        while self._idle:
+            connection = self._idle.pop()
+            try:
+                healthy = await self._is_healthy(connection)
+            except BaseException:
+                # already taken out of the pool, don't leak it
+                await self._discard(connection)
+                raise
+            if healthy:
+                return connection
+            await self._discard(connection)
+        return await self._connect()
+
+    @staticmethod
+    async def _discard(connection: _Connection):
+        try:
+            connection.client.close()
+        except Exception:  # noqa
+            pass
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        async with self._semaphore:
+            connection = await self._acquire()
+            try:
+                yield connection.client
+            except BaseException:
+                # the connection is broken or its state is unknown (e.g. cancelled in the middle of a transaction)
+                await self._discard(connection)
+                raise
+            else:
+                connection.last_used = time.monotonic()
+                self._idle.append(connection)
+
+    async def sendmail(self, sender: str, recipients: list[str], message: str | bytes):
+        """
+        Send message over a pooled connection. Retries once over a new connection if the reused one was dropped
+        by the server.
+        """
+        with span("smtp.sendmail", recipients=len(recipients)):
+            try:
+                async with self.connection() as client:
+                    await client.sendmail(sender, recipients, message)
+            except aiosmtplib.SMTPServerDisconnected:
+                logger.info("SMTP connection was closed by the server, reconnecting")
+                async with self.connection() as client:
+                    await client.sendmail(sender, recipients, message)
+
+    async def close(self):
+        while self._idle:
+            connection = self._idle.pop()
+            try:
+                await connection.client.quit()
+            except Exception:  # noqa
+                await self._discard(connection)
@@ -1,100 +1,117 @@
 __all__ = ["SMTPRepository"]
 
-import smtplib
+import email.policy
+import html as html_lib
+from collections import OrderedDict
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from pathlib import Path
 
+import jinja2
 from email_validator import validate_email, EmailNotValidError
-from jinja2 import Template
 
 from src.config import settings
+from src.metrics import cache_hit, cache_miss
 from src.modules.smtp.abc import AbstractSMTPRepository
+from src.modules.smtp.pool import SMTPConnectionPool
 from src.modules.alerts.schemas import MappedAlert
+from src.tracing import traced_methods
 
+DEFAULT_TEMPLATES_PATH = Path(__file__).parent / "templates"
 
+
+@traced_methods
 class SMTPRepository(AbstractSMTPRepository):
+    # Rendered alert emails, so an alert is rendered once for all of its recipients
+    ALERT_MESSAGES_CACHE_SIZE = 256
+
     def __init__(self):
-        self._server = smtplib.SMTP(settings.SMTP.SERVER, settings.SMTP.PORT)
+        self._pool = SMTPConnectionPool(
+            hostname=settings.SMTP.SERVER,
+            port=settings.SMTP.PORT,
+            username=settings.SMTP.USERNAME,
+            password=settings.SMTP.PASSWORD.get_secret_value(),
+            size=settings.SMTP.POOL_SIZE,
+            timeout=settings.SMTP.TIMEOUT,
+            healthcheck_interval=settings.SMTP.HEALTHCHECK_INTERVAL,
+        )
+        # Templates are compiled once and compiled again only if the file has changed
+        self._templates = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(settings.SMTP.TEMPLATES_PATH or DEFAULT_TEMPLATES_PATH),
+            autoescape=True,
+            auto_reload=True,
+        )
+        self._alert_messages: OrderedDict[tuple[int, str], bytes] = OrderedDict()
+
+    def _get_template(self, name: str, locale: str) -> jinja2.Template:
+        return self._templates.select_template([f"{locale}/{name}", name])
+
+    def _render(self, name: str, locale: str, **context) -> tuple[str, str]:
+        """
+        Subject and HTML body of the email, from the `subject` and `body` blocks of the template of the locale.
+        """
+        template = self._get_template(name, locale)
+        if "subject" not in template.blocks:
+            raise ValueError(f"Email template `{template.name}` has no `subject` block")
+        template_context = template.new_context(context)
+        # the subject is plain text, not HTML: escaping of the values is undone
+        subject = html_lib.unescape(" ".join("".join(template.blocks["subject"](template_context)).split()))
+        if "body" in template.blocks:
+            html = "".join(template.blocks["body"](template_context))
+        else:
+            html = template.render(context)
+        return subject, html
+
+    @staticmethod
+    def _create_mail(subject: str, html: str) -> MIMEMultipart:
+        mail = MIMEMultipart("related", policy=email.policy.SMTP)
+        msgHtml = MIMEText(html, "html", policy=email.policy.SMTP)
+        mail.attach(msgHtml)
+        mail["From"] = settings.SMTP.USERNAME
+        mail["Subject"] = subject
+        # "To" header is added for each recipient in `send`
+        return mail
 
-    def send(self, message: str, to: str):
+    async def send(self, message: str | bytes, to: str):
         try:
-            valid = validate_email(to)
+            valid = validate_email(to, check_deliverability=False)
             to = valid.normalized
         except EmailNotValidError as e:
             raise ValueError(e)
-        self._server.starttls()
-        self._server.login(settings.SMTP.USERNAME, settings.SMTP.PASSWORD.get_secret_value())
-        self._server.sendmail(settings.SMTP.USERNAME, to, message)
-        self._server.quit()
-
-    def send_connect_email(self, email: str, auth_code: str):
-        mail = MIMEMultipart("related")
-        # Jinja2 for html template
-        main = Template(
-            """
-            <html>
-                <body>
-                    <p>Hi!</p>
-                    <p>Here is your temporary code for registration: {{ code }}</p>
-                </body>
-            </html>
-            """,
-            autoescape=True,
-        )
 
-        html = main.render(code=auth_code)
-        msgHtml = MIMEText(html, "html")
-        mail.attach(msgHtml)
+        if isinstance(message, bytes):
+            message = f"To: {to}\r\n".encode() + message
+        await self._pool.sendmail(settings.SMTP.USERNAME, [to], message)
 
-        mail["Subject"] = "Registration in Monitoring Service"
-        mail["From"] = settings.SMTP.USERNAME
-        mail["To"] = email
+    async def send_connect_email(self, email: str, auth_code: str):
+        subject, html = self._render("connect_email.html", settings.SMTP.LOCALE, code=auth_code)
+        mail = self._create_mail(subject, html)
+
+        await self.send(mail.as_bytes(), email)
+
+    def _render_alert_message(self, mapped_alert: "MappedAlert", locale: str) -> bytes:
+        key = (mapped_alert.id, locale)
+        if key in self._alert_messages:
+            cache_hit("alert_emails")
+            self._alert_messages.move_to_end(key)
+            return self._alert_messages[key]
+        cache_miss("alert_emails")
 
-        self._server.starttls()
-        self._server.login(settings.SMTP.USERNAME, settings.SMTP.PASSWORD.get_secret_value())
-        self._server.sendmail(settings.SMTP.USERNAME, email, mail.as_string())
-        self._server.quit()
+        subject, html = self._render("alert.html", locale, alert=mapped_alert)
+        mail = self._create_mail(subject, html)
 
-    def send_alert_message(
+        message = self._alert_messages[key] = mail.as_bytes()
+        if len(self._alert_messages) > self.ALERT_MESSAGES_CACHE_SIZE:
+            self._alert_messages.popitem(last=False)
+        return message
+
+    async def send_alert_message(
         self,
         email: str,
         mapped_alert: "MappedAlert",
     ):
-        mail = MIMEMultipart("related")
-        # Jinja2 for html template
-        main = Template(
-            """
-            {% if alert.status == "resolved" %}
-            Проблема устранена: <b>{{ alert.title }}</b> ✅ <br/>
-            {% else %}
-            {% set emoji = "⚠️" if alert.severity == "warning" else "🚨" %}
-            {{ emoji }} <b>{{ alert.title }}</b> {{ emoji }} <br/>
-            {% endif %}
-
-            Сервер: <b>{{ alert.target_alias }} </b> <br/>
-
-            Время: {{ alert.timestamp.strftime("%Y-%m-%d %H:%M:%S") }} <br/>
-
-            {% if alert.description %}
-            Описание: <br/>
-            {{ alert.description }} <br/>
-            {% endif %}
-            """,
-            autoescape=True,
-        )
-
-        html = main.render(alert=mapped_alert)
-        msgHtml = MIMEText(html, "html")
-        mail.attach(msgHtml)
-        subject = f"Оповещение: {mapped_alert.target_alias} {mapped_alert.title}"
-        mail["Subject"] = subject
-        mail["From"] = settings.SMTP.USERNAME
-        mail["To"] = email
-
-        self._server.starttls()
-        self._server.login(settings.SMTP.USERNAME, settings.SMTP.PASSWORD.get_secret_value())
-        self._server.sendmail(settings.SMTP.USERNAME, email, mail.as_string())
-        self._server.quit()
+        message = self._render_alert_message(mapped_alert, settings.SMTP.LOCALE)
+        await self.send(message, email)
 
-    def close(self):
-        self._server.quit()
+    async def close(self):
+        await self._pool.close()
@@ -0,0 +1,42 @@
+__all__ = ["router"]
+
+from typing import Annotated
+
+from fastapi import APIRouter, Query
+
+from src.api.dependencies import DEPENDS_STATEMENT_SAMPLER, DEPENDS_VERIFIED_REQUEST
+from src.api.exceptions import IncorrectCredentialsException, NoCredentialsException, TargetNotFoundException
+from src.api.utils import permission_check
+from src.config import settings
+from src.modules.auth.schemas import VerificationResult
+from src.modules.statements.sampler import StatementSampler
+from src.modules.statements.schemas import StatementOrder, TopStatements
+
+router = APIRouter(prefix="/statements", tags=["Statements"])
+
+
+@router.get(
+    "/top",
+    responses={
+        200: {"description": "The heaviest statements of the target during the last `window` seconds"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+        **TargetNotFoundException.responses,
+    },
+)
+async def top_statements(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    statement_sampler: Annotated[StatementSampler, DEPENDS_STATEMENT_SAMPLER],
+    target_alias: str,
+    window: float = Query(300, gt=0, le=settings.STATEMENTS.RETENTION),
+    by: StatementOrder = StatementOrder.total_time,
+    limit: int = Query(10, ge=1, le=100),
+) -> TopStatements:
+    """
+    Built from `pg_stat_statements` samples taken every `STATEMENTS.INTERVAL` seconds: calls, execution time,
+    rows and IO of each statement between samples, not since the last reset of the statistics.
+    """
+    permission_check(_verification, target_alias)
+    if target_alias not in settings.TARGETS:
+        raise TargetNotFoundException(target_alias)
+    return statement_sampler.top(target_alias, window, by, limit)
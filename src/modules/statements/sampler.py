@@ -0,0 +1,238 @@
+__all__ = ["StatementSampler"]
+
+import asyncio
+import dataclasses
+import datetime
+import heapq
+import logging
+from collections import deque
+from typing import Optional
+
+from src.config import settings
+from src.modules.pg.abc import AbstractPgRepository
+from src.modules.statements.schemas import StatementOrder, StatementStats, TopStatements
+
+logger = logging.getLogger(__name__)
+
+# columns are read from `to_jsonb`, so the query works with both `total_time` (before PG 13) and `total_exec_time`;
+# top-level and nested executions of the same statement are summed. All statements are read (their number is
+# bounded by `pg_stat_statements.max`): a statement missing from the previous sample is then a new one, not one
+# which has just climbed into a cut of the heaviest
+STATEMENTS_SQL = """
+WITH statements AS (SELECT to_jsonb(s) AS s FROM pg_stat_statements AS s)
+SELECT
+    (s->>'queryid')::bigint AS queryid,
+    (s->>'dbid')::bigint AS dbid,
+    (s->>'userid')::bigint AS userid,
+    left(min(s->>'query'), {query_length}) AS query,
+    sum((s->>'calls')::bigint)::bigint AS calls,
+    sum(coalesce((s->>'total_exec_time')::float8, (s->>'total_time')::float8, 0)) AS total_time,
+    sum((s->>'rows')::bigint)::bigint AS rows,
+    sum(
+        (s->>'shared_blks_read')::bigint + (s->>'shared_blks_written')::bigint
+        + (s->>'temp_blks_read')::bigint + (s->>'temp_blks_written')::bigint
+    )::bigint AS io_blocks
+FROM statements
+WHERE s->>'queryid' IS NOT NULL
+GROUP BY 1, 2, 3
+"""
+
+# the view exists since PG 14, the time of the last full `pg_stat_statements_reset()`
+STATS_RESET_SQL = "SELECT stats_reset FROM pg_stat_statements_info"
+
+# (queryid, dbid, userid)
+StatementKey = tuple[int, int, int]
+
+
+@dataclasses.dataclass(slots=True)
+class Counters:
+    calls: int = 0
+    total_time: float = 0.0
+    rows: int = 0
+    io_blocks: int = 0
+
+    def delta(self, previous: Optional["Counters"]) -> "Counters":
+        # a new statement, or its entry was evicted and created again: all of it is new
+        if previous is None or self.calls < previous.calls:
+            return self
+        return Counters(
+            calls=self.calls - previous.calls,
+            total_time=self.total_time - previous.total_time,
+            rows=self.rows - previous.rows,
+            io_blocks=self.io_blocks - previous.io_blocks,
+        )
+
+    def add(self, other: "Counters"):
+        self.calls += other.calls
+        self.total_time += other.total_time
+        self.rows += other.rows
+        self.io_blocks += other.io_blocks
+
+
+@dataclasses.dataclass
+class Sample:
+    # time of the previous sample
+    started_at: datetime.datetime
+    taken_at: datetime.datetime
+    # only statements executed since the previous sample
+    deltas: dict[StatementKey, Counters]
+
+
+class TargetStatements:
+    def __init__(self, max_samples: int):
+        # cumulative counters of the last sample
+        self.totals: dict[StatementKey, Counters] = {}
+        self.taken_at: Optional[datetime.datetime] = None
+        # None if unknown (before PG 14)
+        self.stats_reset: Optional[str] = None
+        self.samples: deque[Sample] = deque(maxlen=max_samples)
+        self.queries: dict[StatementKey, str] = {}
+        self.error: Optional[str] = None
+
+    def add_sample(self, rows: list[dict], taken_at: datetime.datetime, stats_reset: Optional[str] = None):
+        totals: dict[StatementKey, Counters] = {}
+        queries: dict[StatementKey, str] = {}
+        for row in rows:
+            key = (row["queryid"], row["dbid"], row["userid"])
+            totals[key] = Counters(
+                calls=row["calls"] or 0,
+                total_time=row["total_time"] or 0.0,
+                rows=row["rows"] or 0,
+                io_blocks=row["io_blocks"] or 0,
+            )
+            queries[key] = row["query"] or ""
+
+        # the first sample is only the baseline for the next one
+        if self.taken_at is not None:
+            # all counters started again from zero since the previous sample
+            reset = stats_reset is not None and self.stats_reset is not None and stats_reset != self.stats_reset
+            deltas = {}
+            for key, counters in totals.items():
+                delta = counters.delta(None if reset else self.totals.get(key))
+                if delta.calls or delta.total_time:
+                    deltas[key] = delta
+            self.samples.append(Sample(started_at=self.taken_at, taken_at=taken_at, deltas=deltas))
+        self.totals = totals
+        self.taken_at = taken_at
+        self.stats_reset = stats_reset
+
+        # texts of statements which are still in the window, even if pg_stat_statements has evicted them
+        for sample in self.samples:
+            for key in sample.deltas.keys() - queries.keys():
+                if key in self.queries:
+                    queries[key] = self.queries[key]
+        self.queries = queries
+        self.error = None
+
+    def top(
+        self, since: datetime.datetime, by: StatementOrder, limit: int
+    ) -> tuple[list[StatementStats], list[Sample]]:
+        # samples which started within the window
+        samples = [sample for sample in self.samples if sample.started_at >= since]
+        window: dict[StatementKey, Counters] = {}
+        for sample in samples:
+            for key, delta in sample.deltas.items():
+                counters = window.get(key)
+                if counters is None:
+                    counters = window[key] = Counters()
+                counters.add(delta)
+
+        # only `limit` entries are ordered, not all statements of the window
+        top = heapq.nlargest(limit, window.items(), key=lambda item: getattr(item[1], by.value))
+        statements = [
+            StatementStats(
+                queryid=queryid,
+                dbid=dbid,
+                userid=userid,
+                query=self.queries.get((queryid, dbid, userid), ""),
+                **dataclasses.asdict(counters),
+            )
+            for (queryid, dbid, userid), counters in top
+        ]
+        return statements, samples
+
+
+class StatementSampler:
+    """
+    Sample `pg_stat_statements` of every target in the background and keep what each statement did between
+    consecutive samples.
+
+    Cumulative totals show what has been heavy since the last reset, the deltas show what is heavy now. The top
+    of a window is computed from memory and does not touch the target.
+    """
+
+    def __init__(self, pg_repository: AbstractPgRepository):
+        self.pg_repository = pg_repository
+        self._targets: dict[str, TargetStatements] = {}
+        self._max_samples = max(1, int(settings.STATEMENTS.RETENTION // settings.STATEMENTS.INTERVAL))
+        self._sql = STATEMENTS_SQL.format(query_length=int(settings.STATEMENTS.QUERY_LENGTH))
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None and settings.STATEMENTS.ENABLED:
+            self._task = asyncio.create_task(self._sample_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sample_loop(self):
+        while True:
+            try:
+                await self.sample_all()
+            except Exception:
+                logger.exception("Failed to sample pg_stat_statements")
+            await asyncio.sleep(settings.STATEMENTS.INTERVAL)
+
+    async def sample_all(self):
+        target_aliases = await self.pg_repository.fetch_targets()
+        await asyncio.gather(*(self.sample(target_alias) for target_alias in target_aliases))
+
+    def _target(self, target_alias: str) -> TargetStatements:
+        statements = self._targets.get(target_alias)
+        if statements is None:
+            statements = self._targets[target_alias] = TargetStatements(self._max_samples)
+        return statements
+
+    async def sample(self, target_alias: str):
+        statements = self._target(target_alias)
+        taken_at = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            # statistics of the primary, replicas have their own
+            results, errors = await self.pg_repository.execute_sql_select_many(
+                {"statements": self._sql, "stats_reset": STATS_RESET_SQL},
+                limit=0,
+                offset=0,
+                target_alias=target_alias,
+                primary_only=True,
+            )
+        except Exception as e:
+            errors = {"statements": getattr(e, "detail", None) or repr(e)}
+
+        if "statements" in errors:
+            error = errors["statements"]
+            if statements.error != error:
+                logger.warning(f"Failed to sample pg_stat_statements of target `{target_alias}`: {error}")
+            statements.error = error
+            return
+        # no `pg_stat_statements_info` before PG 14
+        stats_reset = next((str(row["stats_reset"]) for row in results.get("stats_reset", [])), None)
+        statements.add_sample(results["statements"], taken_at, stats_reset)
+
+    def top(self, target_alias: str, window: float, by: StatementOrder, limit: int) -> TopStatements:
+        """
+        Statements with the largest `by` in the samples taken during the last `window` seconds.
+        """
+        statements = self._target(target_alias)
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=window)
+        top, samples = statements.top(since, by, limit)
+        return TopStatements(
+            target_alias=target_alias,
+            by=by,
+            window_start=samples[0].started_at if samples else None,
+            window_end=samples[-1].taken_at if samples else None,
+            statements=top,
+            error=statements.error,
+        )
@@ -0,0 +1,42 @@
+__all__ = ["StatementOrder", "StatementStats", "TopStatements"]
+
+import datetime
+from enum import StrEnum
+from typing import Optional
+
+from pydantic import BaseModel, computed_field
+
+
+class StatementOrder(StrEnum):
+    total_time = "total_time"
+    calls = "calls"
+    io_blocks = "io_blocks"
+
+
+class StatementStats(BaseModel):
+    queryid: int
+    dbid: int
+    userid: int
+    query: str
+    calls: int = 0
+    # milliseconds of execution
+    total_time: float = 0.0
+    rows: int = 0
+    # shared and temporary blocks read and written
+    io_blocks: int = 0
+
+    @computed_field
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+class TopStatements(BaseModel):
+    target_alias: str
+    by: StatementOrder
+    # period covered by the samples in the window, None if there are no samples yet
+    window_start: Optional[datetime.datetime] = None
+    window_end: Optional[datetime.datetime] = None
+    statements: list[StatementStats]
+    # last sampling error (e.g. the extension is not installed)
+    error: Optional[str] = None
@@ -0,0 +1,71 @@
+__all__ = ["AbstractTargetRepository"]
+
+from abc import ABCMeta, abstractmethod
+from typing import Optional
+
+from src.config import Target
+from src.modules.targets.breaker import CircuitBreaker
+from src.modules.targets.bulkhead import Bulkhead
+from src.modules.targets.replicas import Replica
+from src.modules.targets.schemas import TargetComponent
+from src.storages.sqlalchemy import AbstractSQLAlchemyStorage
+
+
+class AbstractTargetRepository(metaclass=ABCMeta):
+    @abstractmethod
+    def get(self, target_alias: str) -> "Target":
+        """
+        :raises TargetNotFoundException: if target is not configured
+        """
+
+    @abstractmethod
+    def get_storage(self, target_alias: str) -> "AbstractSQLAlchemyStorage":
+        """
+        Storage (connection pool) of the target database.
+
+        :raises TargetNotFoundException: if target is not configured
+        """
+
+    @abstractmethod
+    def get_breaker(self, target_alias: str, component: "TargetComponent") -> "CircuitBreaker":
+        """
+        Circuit breaker of the target database or SSH server.
+
+        :raises TargetNotFoundException: if target is not configured
+        """
+
+    @abstractmethod
+    def get_bulkhead(self, target_alias: str, component: "TargetComponent") -> "Bulkhead":
+        """
+        Limit of concurrent queries or SSH sessions to the target.
+
+        :raises TargetNotFoundException: if target is not configured
+        """
+
+    @abstractmethod
+    def get_replicas(self, target_alias: str) -> list["Replica"]:
+        """
+        :raises TargetNotFoundException: if target is not configured
+        """
+
+    @abstractmethod
+    def select_replica(self, target_alias: str) -> Optional["Replica"]:
+        """
+        Healthy replica with acceptable lag and the lowest load, None if the primary must be used.
+
+        :raises TargetNotFoundException: if target is not configured
+        """
+
+    @abstractmethod
+    def aliases(self) -> list[str]:
+        ...
+
+    @abstractmethod
+    async def warmup(self) -> None:
+        """
+        Establish connections to all targets concurrently. Unavailable targets are skipped.
+        """
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
@@ -0,0 +1,65 @@
+__all__ = ["CircuitBreaker", "CircuitState"]
+
+import time
+from enum import StrEnum
+
+
+class CircuitState(StrEnum):
+    closed = "closed"
+    open = "open"
+    half_open = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive failures open the circuit, so requests fail immediately instead of waiting for a dead target.
+
+    After ``recovery_timeout`` seconds one trial request is let through: its success closes the circuit, its
+    failure opens it again. Successful health probe closes the circuit as well.
+    """
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self._state = CircuitState.closed
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def retry_after(self) -> float:
+        """
+        Seconds until the next trial request is allowed.
+        """
+        if self._state != CircuitState.open:
+            return 0.0
+        return max(self._opened_at + self.recovery_timeout - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        if self._state == CircuitState.closed:
+            return True
+        if self._state == CircuitState.open and self.retry_after() == 0:
+            # only this request is let through until it reports the result
+            self._state = CircuitState.half_open
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._state = CircuitState.closed
+
+    def record_failure(self):
+        self.failures += 1
+        if self._state == CircuitState.half_open or self.failures >= self.failure_threshold:
+            self._state = CircuitState.open
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Request has finished without telling anything about the target (e.g. was cancelled).
+        """
+        if self._state == CircuitState.half_open:
+            self._state = CircuitState.open
+            self._opened_at = time.monotonic() - self.recovery_timeout
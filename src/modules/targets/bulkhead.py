@@ -0,0 +1,53 @@
+__all__ = ["Bulkhead", "BulkheadFullError"]
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+class BulkheadFullError(Exception):
+    pass
+
+
+class Bulkhead:
+    """
+    Limit of concurrent calls to one target with a bounded queue of waiting calls.
+
+    Calls beyond the queue or waiting longer than ``queue_timeout`` seconds are rejected with
+    :class:`BulkheadFullError`, so a slow target does not accumulate requests.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def _wait(self):
+        if self.waiting >= self.max_queue:
+            raise BulkheadFullError(f"{self.waiting} calls are already waiting")
+
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            raise BulkheadFullError(f"Waited for more than {self.queue_timeout} seconds")
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        if self._semaphore.locked():
+            await self._wait()
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
@@ -0,0 +1,176 @@
+__all__ = ["TargetHealthProber"]
+
+import asyncio
+import datetime
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import text
+
+from src.modules.targets.abc import AbstractTargetRepository
+from src.modules.targets.breaker import CircuitState
+from src.modules.targets.replicas import REPLICATION_LAG_SQL, Replica
+from src.modules.targets.schemas import ComponentHealth, ReplicaHealth, TargetComponent, TargetHealth
+
+logger = logging.getLogger(__name__)
+
+
+class TargetHealthProber:
+    """
+    Check databases and SSH servers of all targets in the background.
+
+    Results are cached for the health endpoint and drive the circuit breakers of the target repository, so a dead
+    target is detected without spending request time on it.
+    """
+
+    def __init__(self, target_repository: AbstractTargetRepository, interval: float, timeout: float):
+        self.target_repository = target_repository
+        self.interval = interval
+        self.timeout = timeout
+        self._results: dict[tuple[str, TargetComponent], ComponentHealth] = {}
+        self._replica_results: dict[tuple[str, str], ReplicaHealth] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _probe_loop(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception:
+                logger.exception("Failed to probe targets")
+            await asyncio.sleep(self.interval)
+
+    async def probe_all(self):
+        await asyncio.gather(
+            *(
+                self._probe(alias, component)
+                for alias in self.target_repository.aliases()
+                for component in TargetComponent
+            ),
+            *(
+                self._probe_replica(alias, replica)
+                for alias in self.target_repository.aliases()
+                for replica in self.target_repository.get_replicas(alias)
+            ),
+        )
+
+    async def _probe_db(self, target_alias: str):
+        storage = self.target_repository.get_storage(target_alias)
+        async with storage.engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    async def _probe_ssh(self, target_alias: str):
+        target = self.target_repository.get(target_alias)
+        reader, writer = await asyncio.open_connection(target.SSH_HOST, target.SSH_PORT)
+        try:
+            # SSH server sends its identification string first
+            banner = await reader.readline()
+            if not banner.startswith(b"SSH-"):
+                raise ConnectionError(f"Unexpected SSH banner: {banner[:64]!r}")
+        finally:
+            writer.close()
+
+    async def _probe(self, target_alias: str, component: TargetComponent):
+        probe: Callable[[str], Awaitable[None]] = self._probe_db if component == TargetComponent.db else self._probe_ssh
+        breaker = self.target_repository.get_breaker(target_alias, component)
+        started = time.monotonic()
+        error = None
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                await probe(target_alias)
+        except Exception as e:
+            error = repr(e)
+
+        if error is None:
+            breaker.record_success()
+        else:
+            previous = self._results.get((target_alias, component))
+            if previous is None or previous.available:
+                logger.warning(f"Target `{target_alias}` ({component}) is not available: {error}")
+            breaker.record_failure()
+
+        self._results[target_alias, component] = ComponentHealth(
+            available=error is None,
+            circuit=breaker.state,
+            latency_ms=round((time.monotonic() - started) * 1000, 3) if error is None else None,
+            error=error,
+            checked_at=datetime.datetime.now(datetime.timezone.utc),
+        )
+
+    async def _probe_replica(self, target_alias: str, replica: Replica):
+        started = time.monotonic()
+        error = None
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with replica.storage.engine.connect() as connection:
+                    lag = await connection.scalar(text(REPLICATION_LAG_SQL))
+            if lag is None:
+                raise ValueError("Server is not in recovery, it is not a replica")
+            replica.lag = float(lag)
+        except Exception as e:
+            error = repr(e)
+            replica.lag = None
+
+        if error is None:
+            replica.breaker.record_success()
+        else:
+            previous = self._replica_results.get((target_alias, replica.name))
+            if previous is None or previous.available:
+                logger.warning(f"Replica {replica.name} of target `{target_alias}` is not available: {error}")
+            replica.breaker.record_failure()
+
+        self._replica_results[target_alias, replica.name] = ReplicaHealth(
+            name=replica.name,
+            available=error is None,
+            circuit=replica.breaker.state,
+            latency_ms=round((time.monotonic() - started) * 1000, 3) if error is None else None,
+            error=error,
+            checked_at=datetime.datetime.now(datetime.timezone.utc),
+            lag=replica.lag,
+        )
+
+    def _replica_health(self, target_alias: str, replica: Replica) -> ReplicaHealth:
+        result = self._replica_results.get((target_alias, replica.name))
+        if result is None:
+            return ReplicaHealth(name=replica.name, available=False, circuit=replica.breaker.state)
+        return result.model_copy(update={"circuit": replica.breaker.state})
+
+    def _component_health(self, target_alias: str, component: TargetComponent) -> ComponentHealth:
+        breaker = self.target_repository.get_breaker(target_alias, component)
+        result = self._results.get((target_alias, component))
+        if result is None:
+            # not probed yet
+            return ComponentHealth(available=breaker.state != CircuitState.open, circuit=breaker.state)
+        # circuit may have changed since the probe because of requests
+        return result.model_copy(update={"circuit": breaker.state})
+
+    def health(self, target_aliases: Optional[list[str]] = None) -> list[TargetHealth]:
+        """
+        Cached results of the last probes.
+        """
+        if target_aliases is None:
+            target_aliases = self.target_repository.aliases()
+
+        return [
+            TargetHealth(
+                alias=alias,
+                db=self._component_health(alias, TargetComponent.db),
+                ssh=self._component_health(alias, TargetComponent.ssh),
+                replicas=[
+                    self._replica_health(alias, replica) for replica in self.target_repository.get_replicas(alias)
+                ],
+            )
+            for alias in target_aliases
+        ]
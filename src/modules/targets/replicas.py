@@ -0,0 +1,37 @@
+__all__ = ["Replica", "REPLICATION_LAG_SQL"]
+
+from typing import Optional
+
+from src.modules.targets.breaker import CircuitBreaker
+from src.modules.targets.bulkhead import Bulkhead
+from src.storages.sqlalchemy import SQLAlchemyStorage
+
+# Replay lag of a standby (seconds), zero if everything received is replayed (the primary may be just idle)
+REPLICATION_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class Replica:
+    """
+    Read replica of a target with its own connection pool, circuit breaker and concurrency limit.
+    """
+
+    def __init__(self, name: str, storage: SQLAlchemyStorage, breaker: CircuitBreaker, bulkhead: Bulkhead):
+        self.name = name
+        self.storage = storage
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+        # replication lag measured by the health prober (seconds), None if unknown or not a standby
+        self.lag: Optional[float] = None
+
+    @property
+    def load(self) -> float:
+        """
+        Share of the concurrency limit that is in use or waited for.
+        """
+        return (self.bulkhead.active + self.bulkhead.waiting) / self.bulkhead.limit
@@ -0,0 +1,135 @@
+__all__ = ["TargetRepository"]
+
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import make_url, text
+
+from src.api.exceptions import TargetNotFoundException
+from src.config import settings, Target
+from src.modules.targets.abc import AbstractTargetRepository
+from src.modules.targets.breaker import CircuitBreaker, CircuitState
+from src.modules.targets.bulkhead import Bulkhead
+from src.modules.targets.replicas import Replica
+from src.modules.targets.schemas import TargetComponent
+from src.storages.sqlalchemy import AbstractSQLAlchemyStorage, SQLAlchemyStorage
+
+logger = logging.getLogger(__name__)
+
+
+def _replica_name(url: str) -> str:
+    url = make_url(url)
+    return f"{url.host}:{url.port or 5432}"
+
+
+class TargetRepository(AbstractTargetRepository):
+    def __init__(self, targets: dict[str, Target]):
+        self.targets = targets
+        self.storages: dict[str, SQLAlchemyStorage] = {
+            alias: self._create_storage(target.DB_URL.get_secret_value(), target) for alias, target in targets.items()
+        }
+        self.breakers: dict[tuple[str, TargetComponent], CircuitBreaker] = {
+            (alias, component): self._create_breaker() for alias in targets for component in TargetComponent
+        }
+        self.bulkheads: dict[tuple[str, TargetComponent], Bulkhead] = {}
+        for alias, target in targets.items():
+            self.bulkheads[alias, TargetComponent.db] = Bulkhead(
+                target.MAX_CONCURRENT_QUERIES, target.MAX_QUEUE_DEPTH, target.QUEUE_TIMEOUT
+            )
+            self.bulkheads[alias, TargetComponent.ssh] = Bulkhead(
+                target.MAX_CONCURRENT_SSH, target.MAX_QUEUE_DEPTH, target.QUEUE_TIMEOUT
+            )
+        self.replicas: dict[str, list[Replica]] = {
+            alias: [
+                Replica(
+                    name=_replica_name(url.get_secret_value()),
+                    storage=self._create_storage(url.get_secret_value(), target),
+                    breaker=self._create_breaker(),
+                    bulkhead=Bulkhead(target.MAX_CONCURRENT_QUERIES, target.MAX_QUEUE_DEPTH, target.QUEUE_TIMEOUT),
+                )
+                for url in target.REPLICA_DB_URLS
+            ]
+            for alias, target in targets.items()
+        }
+
+    @staticmethod
+    def _create_storage(url: str, target: Target) -> SQLAlchemyStorage:
+        return SQLAlchemyStorage.from_url(
+            url,
+            connect_args={"timeout": target.CONNECT_TIMEOUT},
+            # one more connection for the health prober
+            pool_size=target.MAX_CONCURRENT_QUERIES + 1,
+            max_overflow=0,
+        )
+
+    @staticmethod
+    def _create_breaker() -> CircuitBreaker:
+        return CircuitBreaker(
+            failure_threshold=settings.TARGETS_HEALTH.FAILURE_THRESHOLD,
+            recovery_timeout=settings.TARGETS_HEALTH.RECOVERY_TIMEOUT,
+        )
+
+    def get(self, target_alias: str) -> "Target":
+        target = self.targets.get(target_alias)
+        if target is None:
+            raise TargetNotFoundException(target_alias)
+        return target
+
+    def get_storage(self, target_alias: str) -> "AbstractSQLAlchemyStorage":
+        storage = self.storages.get(target_alias)
+        if storage is None:
+            raise TargetNotFoundException(target_alias)
+        return storage
+
+    def get_breaker(self, target_alias: str, component: "TargetComponent") -> "CircuitBreaker":
+        breaker = self.breakers.get((target_alias, component))
+        if breaker is None:
+            raise TargetNotFoundException(target_alias)
+        return breaker
+
+    def get_bulkhead(self, target_alias: str, component: "TargetComponent") -> "Bulkhead":
+        bulkhead = self.bulkheads.get((target_alias, component))
+        if bulkhead is None:
+            raise TargetNotFoundException(target_alias)
+        return bulkhead
+
+    def get_replicas(self, target_alias: str) -> list["Replica"]:
+        replicas = self.replicas.get(target_alias)
+        if replicas is None:
+            raise TargetNotFoundException(target_alias)
+        return replicas
+
+    def select_replica(self, target_alias: str) -> Optional["Replica"]:
+        max_lag = self.get(target_alias).MAX_REPLICA_LAG
+        candidates = [
+            replica
+            for replica in self.get_replicas(target_alias)
+            if replica.breaker.state == CircuitState.closed and replica.lag is not None and replica.lag <= max_lag
+        ]
+        if not candidates:
+            return None
+        # the least loaded one, the freshest of equally loaded
+        return min(candidates, key=lambda replica: (replica.load, replica.lag))
+
+    def aliases(self) -> list[str]:
+        return list(self.targets.keys())
+
+    async def _warmup(self, target_alias: str):
+        storage = self.storages[target_alias]
+        try:
+            async with asyncio.timeout(self.targets[target_alias].CONNECT_TIMEOUT):
+                async with storage.engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.warning(f"Target `{target_alias}` is not available: {e!r}")
+            self.breakers[target_alias, TargetComponent.db].record_failure()
+
+    async def warmup(self) -> None:
+        await asyncio.gather(*(self._warmup(alias) for alias in self.storages))
+
+    async def close(self) -> None:
+        storages = [*self.storages.values()]
+        for replicas in self.replicas.values():
+            storages.extend(replica.storage for replica in replicas)
+        await asyncio.gather(*(storage.close_connection() for storage in storages))
@@ -0,0 +1,35 @@
+__all__ = ["TargetComponent", "ComponentHealth", "ReplicaHealth", "TargetHealth"]
+
+import datetime
+from enum import StrEnum
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from src.modules.targets.breaker import CircuitState
+
+
+class TargetComponent(StrEnum):
+    db = "db"
+    ssh = "ssh"
+
+
+class ComponentHealth(BaseModel):
+    available: bool
+    circuit: CircuitState
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+    checked_at: Optional[datetime.datetime] = None
+
+
+class ReplicaHealth(ComponentHealth):
+    name: str
+    # replay lag (seconds)
+    lag: Optional[float] = None
+
+
+class TargetHealth(BaseModel):
+    alias: str
+    db: ComponentHealth
+    ssh: ComponentHealth
+    replicas: list[ReplicaHealth] = Field(default_factory=list)
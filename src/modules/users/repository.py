@@ -11,6 +11,7 @@ from src.modules.users.abc import AbstractUserRepository
 from src.modules.users.schemas import ViewUser, CreateUser, ViewEmailFlow
 from src.storages.sqlalchemy.models.users import User, EmailFlow
 from src.storages.sqlalchemy.storage import AbstractSQLAlchemyStorage
+from src.tracing import traced_methods
 
 
 def _generate_auth_code() -> str:
@@ -18,6 +19,7 @@ def _generate_auth_code() -> str:
     return str(random.randint(100_000, 999_999))
 
 
+@traced_methods
 class UserRepository(AbstractUserRepository):
     storage: AbstractSQLAlchemyStorage
 
@@ -4,17 +4,18 @@ __all__ = ["router"]
 from typing import Annotated
 
 from fastapi import APIRouter
-from fastapi import BackgroundTasks
 
-from src.api.dependencies import DEPENDS_BOT
-from src.api.dependencies import DEPENDS_SMTP_REPOSITORY, DEPENDS_USER_REPOSITORY
+from src.api.dependencies import DEPENDS_BOT, Dependencies
+from src.api.dependencies import DEPENDS_OUTBOX_REPOSITORY, DEPENDS_USER_REPOSITORY
 from src.config import settings
 from src.api.exceptions import (
     IncorrectCredentialsException,
     NoCredentialsException,
     UserAlreadyExistsException,
 )
-from src.modules.smtp.abc import AbstractSMTPRepository
+from src.modules.outbox.abc import AbstractOutboxRepository
+from src.modules.outbox.schemas import CreateOutboxMessage
+from src.storages.sqlalchemy.models.outbox import OutboxChannel
 from src.modules.users.abc import AbstractUserRepository
 from src.modules.auth.schemas import VerificationResult
 from src.modules.users.schemas import ViewUser, CreateUser
@@ -73,8 +74,7 @@ if settings.SMTP_ENABLED:
     async def connect_email(
         email: str,
         user_id: int,
-        background_tasks: BackgroundTasks,
-        smtp_repository: Annotated[AbstractSMTPRepository, DEPENDS_SMTP_REPOSITORY],
+        outbox_repository: Annotated[AbstractOutboxRepository, DEPENDS_OUTBOX_REPOSITORY],
         _verification: Annotated[VerificationResult, DEPENDS_BOT],
         user_repository: Annotated[AbstractUserRepository, DEPENDS_USER_REPOSITORY],
     ):
@@ -83,7 +83,16 @@ if settings.SMTP_ENABLED:
         """
 
         email_flow = await user_repository.start_connect_email(user_id, email)
-        background_tasks.add_task(smtp_repository.send_connect_email, email_flow.email, email_flow.auth_code)
+        await outbox_repository.enqueue(
+            [
+                CreateOutboxMessage(
+                    channel=OutboxChannel.email,
+                    recipient=email_flow.email,
+                    payload={"kind": "connect_email", "auth_code": email_flow.auth_code},
+                )
+            ]
+        )
+        Dependencies.get_outbox_scheduler().wakeup()
 
     @router.post("/connect-email/finish", tags=["Email"])
     async def finish_connect_email(
@@ -0,0 +1,133 @@
+__all__ = ["BLOCKING_SQL", "BlockingSession", "BlockingTree", "build_blocking_tree"]
+
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+
+# Sessions waiting for a lock and the sessions they wait for. `pg_blocking_pids` is called only for sessions which
+# wait for a lock, it is not cheap
+BLOCKING_SQL = """
+WITH waiting AS (
+    SELECT pid, pg_blocking_pids(pid) AS blocked_by
+    FROM pg_catalog.pg_stat_activity
+    WHERE wait_event_type = 'Lock'
+),
+blocked AS (
+    SELECT pid, blocked_by FROM waiting WHERE cardinality(blocked_by) > 0
+)
+SELECT
+    a.pid,
+    a.usename,
+    a.datname,
+    a.application_name,
+    a.client_addr::text AS client_addr,
+    a.state,
+    a.wait_event_type,
+    a.wait_event,
+    left(a.query, 1000) AS query,
+    extract(epoch FROM now() - a.query_start)::float8 AS query_duration,
+    extract(epoch FROM now() - a.xact_start)::float8 AS xact_duration,
+    coalesce(b.blocked_by, '{}') AS blocked_by
+FROM pg_catalog.pg_stat_activity AS a
+LEFT JOIN blocked AS b ON b.pid = a.pid
+WHERE b.pid IS NOT NULL OR a.pid IN (SELECT unnest(blocked_by) FROM blocked)
+"""
+
+
+class BlockingSession(BaseModel):
+    pid: int
+    usename: Optional[str] = None
+    datname: Optional[str] = None
+    application_name: Optional[str] = None
+    client_addr: Optional[str] = None
+    state: Optional[str] = None
+    wait_event_type: Optional[str] = None
+    wait_event: Optional[str] = None
+    query: Optional[str] = None
+    # seconds since the start of the current query and transaction
+    query_duration: Optional[float] = None
+    xact_duration: Optional[float] = None
+    # all sessions this one waits for, it is put in the tree under the first of them
+    blocked_by: list[int] = Field(default_factory=list)
+    # this session and all sessions waiting for it, directly or not
+    subtree_size: int = 1
+    # the longest wait in the subtree (seconds), waits are measured from the start of the waiting query
+    max_wait: float = 0.0
+    blocked: list["BlockingSession"] = Field(default_factory=list)
+
+
+class BlockingTree(BaseModel):
+    target_alias: str
+    # sessions which block others and wait for nobody, the most blocking first. `pid` of a root can be passed
+    # to the `terminate_session` action
+    roots: list[BlockingSession]
+    blocked_sessions: int
+
+
+def build_blocking_tree(target_alias: str, rows: list[dict[str, Any]]) -> BlockingTree:
+    """
+    Build the blocking forest in linear time. Sessions waiting for several others are attached to the first of
+    them, sessions waiting in a cycle (a deadlock not resolved yet) become roots.
+    """
+    sessions = {row["pid"]: BlockingSession(**row) for row in rows}
+
+    parents: dict[int, int] = {}
+    for pid, session in sessions.items():
+        parent = next((blocker for blocker in session.blocked_by if blocker in sessions and blocker != pid), None)
+        if parent is not None:
+            parents[pid] = parent
+            sessions[parent].blocked.append(session)
+
+    roots = [session for pid, session in sessions.items() if pid not in parents]
+    # sessions of a cycle (and their waiters) are not reachable from the roots, the cycle is broken at its lowest pid
+    visited: set[int] = set()
+    order: list[BlockingSession] = []
+
+    def visit(root: BlockingSession):
+        stack = [root]
+        while stack:
+            session = stack.pop()
+            if session.pid in visited:
+                continue
+            visited.add(session.pid)
+            order.append(session)
+            stack.extend(session.blocked)
+
+    for root in roots:
+        visit(root)
+    for pid in sorted(sessions.keys() - visited):
+        if pid in visited:
+            continue
+        # the session may only wait for a cycle, the first pid met twice on the way up is a member of it
+        seen: set[int] = set()
+        while pid not in seen:
+            seen.add(pid)
+            pid = parents[pid]
+        member, cycle = pid, [pid]
+        while (member := parents[member]) != pid:
+            cycle.append(member)
+
+        session = sessions[min(cycle)]
+        # detach from its parent in the cycle
+        parent = sessions[parents.pop(session.pid)]
+        parent.blocked = [child for child in parent.blocked if child is not session]
+        roots.append(session)
+        visit(session)
+
+    # children are after their parents in `order`, so sizes are summed from the leaves up
+    for session in reversed(order):
+        if session.blocked_by:
+            session.max_wait = max(session.max_wait, session.query_duration or 0.0)
+        parent = parents.get(session.pid)
+        if parent is not None:
+            sessions[parent].subtree_size += session.subtree_size
+            sessions[parent].max_wait = max(sessions[parent].max_wait, session.max_wait)
+
+    for session in order:
+        session.blocked.sort(key=lambda child: child.subtree_size, reverse=True)
+    roots.sort(key=lambda root: root.subtree_size, reverse=True)
+    return BlockingTree(
+        target_alias=target_alias,
+        roots=roots,
+        blocked_sessions=sum(1 for session in sessions.values() if session.blocked_by),
+    )
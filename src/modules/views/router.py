@@ -1,12 +1,13 @@
-__all__ = ["router"]
+__all__ = ["router", "build_view_routes", "ViewsBatchResult"]
 
+import json
 from typing import Annotated, Optional, Any
 
 from fastapi import APIRouter
-from fastapi import Query
+from fastapi import Query, Response
+from pydantic import BaseModel, Field
 
-from src.api.dependencies import DEPENDS_PG_STAT_REPOSITORY, DEPENDS_VERIFIED_REQUEST
-from src.config import Target, settings
+from src.api.dependencies import DEPENDS_PG_STAT_REPOSITORY, DEPENDS_VERIFIED_REQUEST, DEPENDS_VIEW_EXECUTION_LOG
 from src.api.exceptions import (
     IncorrectCredentialsException,
     NoCredentialsException,
@@ -14,7 +15,10 @@ from src.api.exceptions import (
     SQLQueryError,
 )
 from src.modules.auth.schemas import VerificationResult
+from src.config import settings
 from src.modules.pg.abc import AbstractPgRepository
+from src.modules.views.blocking import BLOCKING_SQL, BlockingTree, build_blocking_tree
+from src.modules.views.slow_log import SlowViewEntry, ViewExecutionLog, ViewTiming
 from src.storages.monitoring.config import settings as monitoring_settings, View
 from src.api.utils import permission_check
 
@@ -25,6 +29,13 @@ class ViewWithAlias(View):
     alias: str
 
 
+class ViewsBatchResult(BaseModel):
+    # rows by view alias
+    results: dict[str, list[dict[str, Any]]]
+    # error by view alias
+    errors: dict[str, str] = Field(default_factory=dict)
+
+
 @router.get(
     "/",
     responses={
@@ -39,6 +50,107 @@ async def get_views(
     return [ViewWithAlias(**view.dict(), alias=view_alias) for view_alias, view in monitoring_settings.views.items()]
 
 
+@router.get(
+    "/batch",
+    responses={
+        200: {"description": "Execute several views on one connection and one snapshot of the target"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+        **ViewNotFoundException.responses,
+    },
+)
+async def execute_views_batch(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
+    target_alias: str,
+    view_aliases: list[str] = Query(..., alias="view"),
+    limit: int = 20,
+    offset: int = 0,
+) -> ViewsBatchResult:
+    """
+    Results of the views are consistent with each other, e.g. for `related_views` of an alert.
+    Failed views are reported in `errors` and do not affect the others.
+    """
+    permission_check(_verification, target_alias)
+
+    views: dict[str, View] = {}
+    for view_alias in dict.fromkeys(view_aliases):
+        view = monitoring_settings.views.get(view_alias)
+        if view is None:
+            raise ViewNotFoundException(view_alias)
+        views[view_alias] = view
+
+    results, errors = await pg_repository.execute_sql_select_many(
+        {view_alias: view.sql for view_alias, view in views.items()},
+        limit=limit,
+        offset=offset,
+        target_alias=target_alias,
+        primary_only=any(view.requires_primary for view in views.values()),
+    )
+    return ViewsBatchResult(results=results, errors=errors)
+
+
+def _available_targets(_verification: VerificationResult) -> Optional[set[str]]:
+    if _verification.user_id is None:
+        return None
+    return set(settings.permissions.targets_of(_verification.user_id))
+
+
+@router.get(
+    "/timings",
+    responses={
+        200: {"description": "Execution time of views by view and target, the most expensive first"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+    },
+)
+async def get_view_timings(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    view_execution_log: Annotated[ViewExecutionLog, DEPENDS_VIEW_EXECUTION_LOG],
+) -> list[ViewTiming]:
+    return view_execution_log.get_timings(_available_targets(_verification))
+
+
+@router.get(
+    "/slow-log",
+    responses={
+        200: {"description": "Slow executions of views with their plans, the latest first"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+    },
+)
+async def get_slow_views(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    view_execution_log: Annotated[ViewExecutionLog, DEPENDS_VIEW_EXECUTION_LOG],
+) -> list[SlowViewEntry]:
+    return view_execution_log.get_slow(_available_targets(_verification))
+
+
+@router.get(
+    "/builtin/blocking-tree",
+    responses={
+        200: {"description": "Sessions blocking others on the target, as a forest of root blockers"},
+        **IncorrectCredentialsException.responses,
+        **NoCredentialsException.responses,
+        **SQLQueryError.responses,
+    },
+)
+async def get_blocking_tree(
+    _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+    pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
+    target_alias: str,
+) -> BlockingTree:
+    """
+    Who blocks whom: only waiting sessions and their blockers are read from the target (one query), the tree
+    is built here.
+    """
+    permission_check(_verification, target_alias)
+    content = await pg_repository.execute_sql_select_json(
+        BLOCKING_SQL, limit=0, offset=0, target_alias=target_alias, primary_only=True
+    )
+    return build_blocking_tree(target_alias, json.loads(content))
+
+
 @router.get(
     "/{view_alias}",
     responses={
@@ -60,42 +172,77 @@ async def get_view(
 
 
 async def _execute_view(
-    pg_repository: AbstractPgRepository, view_alias: str, limit: int, offset, target: Target
-) -> Optional[list[dict[str, Any]]]:
+    pg_repository: AbstractPgRepository,
+    view_execution_log: ViewExecutionLog,
+    view_alias: str,
+    limit: int,
+    offset,
+    target_alias: str,
+) -> Optional[list[dict[str, Any]]] | Response:
     view: View = monitoring_settings.views.get(view_alias)
+    if view is None:
+        raise ViewNotFoundException(view_alias)
 
-    rows = await pg_repository.execute_sql_select(view.sql, limit=limit, offset=offset, target=target)
-    return rows
-
-
-# generate routes for each action
-for view_alias, view in monitoring_settings.views.items():
-
-    def wrapper(binded_view_alias: str):
-        # for function closure (to pass action_alias)
-        async def execute_view(
-            _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
-            pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
-            limit: int = 20,
-            offset: int = 0,
-            target_alias: str = Query(...),
-        ):
-            target = settings.TARGETS[target_alias]
-            permission_check(_verification, target)
-            return await _execute_view(pg_repository, binded_view_alias, limit=limit, offset=offset, target=target)
-
-        return execute_view
-
-    router.add_api_route(
-        f"/execute/{view_alias}",
-        wrapper(view_alias),
-        methods=["GET"],
-        responses={
-            200: {"description": "Get view by alias with arguments"},
-            **IncorrectCredentialsException.responses,
-            **NoCredentialsException.responses,
-            **SQLQueryError.responses,
-        },
-        name=f"Get View {view_alias}",
-        response_model=list[dict[str, Any]],
-    )
+    async with view_execution_log.measure(view_alias, view, target_alias, limit=limit, offset=offset):
+        if view.server_json:
+            content = await pg_repository.execute_sql_select_json(
+                view.sql, limit=limit, offset=offset, target_alias=target_alias, primary_only=view.requires_primary
+            )
+            return Response(content=content, media_type="application/json")
+
+        rows = await pg_repository.execute_sql_select(
+            view.sql,
+            limit=limit,
+            offset=offset,
+            target_alias=target_alias,
+            primary_only=view.requires_primary,
+            hot=view.hot,
+        )
+        return rows
+
+
+def build_view_routes() -> APIRouter:
+    """
+    Generate routes for each configured view. Called again when the monitoring config is reloaded.
+    """
+    view_router = APIRouter(prefix="/views", tags=["Views"])
+
+    for view_alias in monitoring_settings.views.keys():
+
+        def wrapper(binded_view_alias: str):
+            # for function closure (to pass view_alias)
+            async def execute_view(
+                _verification: Annotated[VerificationResult, DEPENDS_VERIFIED_REQUEST],
+                pg_repository: Annotated[AbstractPgRepository, DEPENDS_PG_STAT_REPOSITORY],
+                view_execution_log: Annotated[ViewExecutionLog, DEPENDS_VIEW_EXECUTION_LOG],
+                limit: int = 20,
+                offset: int = 0,
+                target_alias: str = Query(...),
+            ):
+                permission_check(_verification, target_alias)
+                return await _execute_view(
+                    pg_repository,
+                    view_execution_log,
+                    binded_view_alias,
+                    limit=limit,
+                    offset=offset,
+                    target_alias=target_alias,
+                )
+
+            return execute_view
+
+        view_router.add_api_route(
+            f"/execute/{view_alias}",
+            wrapper(view_alias),
+            methods=["GET"],
+            responses={
+                200: {"description": "Get view by alias with arguments"},
+                **IncorrectCredentialsException.responses,
+                **NoCredentialsException.responses,
+                **SQLQueryError.responses,
+            },
+            name=f"Get View {view_alias}",
+            response_model=list[dict[str, Any]],
+        )
+
+    return view_router
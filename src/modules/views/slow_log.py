@@ -0,0 +1,153 @@
+__all__ = ["ViewExecutionLog", "ViewTiming", "SlowViewEntry"]
+
+import asyncio
+import datetime
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from pydantic import BaseModel, computed_field
+
+from src.config import settings
+from src.modules.pg.abc import AbstractPgRepository
+from src.storages.monitoring.config import View
+
+logger = logging.getLogger(__name__)
+
+
+class ViewTiming(BaseModel):
+    view_alias: str
+    target_alias: str
+    count: int = 0
+    errors: int = 0
+    # seconds
+    total: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+
+    @computed_field
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class SlowViewEntry(BaseModel):
+    view_alias: str
+    target_alias: str
+    started_at: datetime.datetime
+    # seconds
+    duration: float
+    sql: str
+    # `EXPLAIN (FORMAT JSON)` output, None if it was not captured
+    plan: Optional[Any] = None
+    explain_error: Optional[str] = None
+
+
+class ViewExecutionLog:
+    """
+    Timings of views per (view, target) and a bounded log of slow executions with their plans.
+
+    Plans are captured in the background and at most once per ``EXPLAIN_INTERVAL`` for a view and target,
+    so a slow view does not add much load to the target.
+    """
+
+    def __init__(self, pg_repository: AbstractPgRepository):
+        self.pg_repository = pg_repository
+        self.timings: dict[tuple[str, str], ViewTiming] = {}
+        self.slow: deque[SlowViewEntry] = deque(maxlen=settings.SLOW_VIEWS.SIZE)
+        self._explained_at: dict[tuple[str, str], float] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @asynccontextmanager
+    async def measure(
+        self, view_alias: str, view: View, target_alias: str, limit: int, offset: int
+    ) -> AsyncIterator[None]:
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._record(
+                view_alias, view, target_alias, limit, offset, started_at, time.perf_counter() - started, failed
+            )
+
+    def _record(
+        self,
+        view_alias: str,
+        view: View,
+        target_alias: str,
+        limit: int,
+        offset: int,
+        started_at: datetime.datetime,
+        duration: float,
+        failed: bool,
+    ):
+        key = (view_alias, target_alias)
+        timing = self.timings.get(key)
+        if timing is None:
+            timing = self.timings[key] = ViewTiming(view_alias=view_alias, target_alias=target_alias)
+        timing.count += 1
+        timing.errors += failed
+        timing.total += duration
+        timing.max = max(timing.max, duration)
+        timing.last = duration
+
+        if duration < settings.SLOW_VIEWS.THRESHOLD:
+            return
+
+        entry = SlowViewEntry(
+            view_alias=view_alias,
+            target_alias=target_alias,
+            started_at=started_at,
+            duration=duration,
+            sql=view.sql,
+        )
+        self.slow.append(entry)
+        logger.warning(f"View `{view_alias}` on target `{target_alias}` took {duration:.3f}s")
+
+        interval = settings.SLOW_VIEWS.EXPLAIN_INTERVAL
+        if interval is None or time.monotonic() - self._explained_at.get(key, -interval) < interval:
+            return
+        self._explained_at[key] = time.monotonic()
+
+        task = asyncio.create_task(self._explain(entry, view, limit, offset))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, entry: SlowViewEntry, view: View, limit: int, offset: int):
+        try:
+            entry.plan = await self.pg_repository.explain_sql(
+                view.sql,
+                limit=limit,
+                offset=offset,
+                target_alias=entry.target_alias,
+                primary_only=view.requires_primary,
+            )
+        except Exception as e:
+            entry.explain_error = getattr(e, "detail", None) or repr(e)
+
+    def get_timings(self, target_aliases: Optional[set[str]] = None) -> list[ViewTiming]:
+        timings = self.timings.values()
+        if target_aliases is not None:
+            timings = [timing for timing in timings if timing.target_alias in target_aliases]
+        return sorted(timings, key=lambda timing: timing.total, reverse=True)
+
+    def get_slow(self, target_aliases: Optional[set[str]] = None) -> list[SlowViewEntry]:
+        """
+        Slow executions, the latest first.
+        """
+        return [
+            entry for entry in reversed(self.slow) if target_aliases is None or entry.target_alias in target_aliases
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
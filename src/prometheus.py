@@ -1,21 +1,31 @@
+import json
 import logging
+import os
 from pathlib import Path
 
 import httpx
 import yaml
 
 from src.config import Target, settings
-from src.storages.monitoring.config import Alert, settings as monitoring_settings
+from src.promql import extract_recording_rules
+from src.storages.monitoring.config import Alert, MonitoringConfigChanges, settings as monitoring_settings
+from src.tracing import span
 
 
 async def generate_prometheus_alert_rules(alerts: dict[str, Alert], path: Path):
     # Generate config
     rules = []
+    expressions = {alias: alert.rule.expr for alias, alert in alerts.items()}
+    if settings.PROMETHEUS.RECORDING_RULES:
+        # subexpressions repeated across the alerts are evaluated once, before the alerts of the same group
+        recording_rules, expressions = extract_recording_rules(expressions)
+        rules.extend({"record": record, "expr": expr} for record, expr in recording_rules)
+
     for alias, alert in alerts.items():
         rules.append(
             {
                 "alert": alias,
-                "expr": alert.rule.expr,
+                "expr": expressions[alias],
                 "for": alert.rule.for_,
                 "annotations": alert.rule.annotations,
             }
@@ -31,63 +41,139 @@ async def generate_prometheus_alert_rules(alerts: dict[str, Alert], path: Path):
 
     # Write to file and reload Prometheus
     logging.warning("Prometheus alert rules has changed")
-    path.write_text(rules_config)
+    _write_atomic(path, rules_config)
     return True
 
 
-async def generate_prometheus_scrape_configs(targets: dict[str, Target], path: Path):
-    # Generate scrape configs
-    scrape_static_configs = []
+# jobs of `prometheus.yml` whose targets are written by the application
+SCRAPE_JOBS = ("db", "monitoring_api")
+
+
+def _write_atomic(path: Path, content: str):
+    # Prometheus watches the directory, so it must never see a half-written file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(content)
+    os.replace(tmp_path, path)
+
+
+def _file_sd_path(job_name: str) -> Path:
+    return Path(settings.PROMETHEUS.TARGETS_DIR) / f"{job_name}.json"
+
+
+async def generate_prometheus_targets(targets: dict[str, Target]) -> bool:
+    """
+    Write targets of the scrape jobs as `file_sd_configs` files. Prometheus picks up changed files by itself,
+    so no reload is needed.
+    """
+    db_targets = []
     for alias, target in targets.items():
-        scrape_static_configs.append(
-            {
-                "targets": [f"{target.SSH_HOST}:9187", f"{target.SSH_HOST}:9100"],
-                "labels": {
-                    "target": alias,
-                },
-            }
-        )
-    scrape_configs = [
+        ports = [port for port in (target.POSTGRES_EXPORTER_PORT, target.NODE_EXPORTER_PORT) if port is not None]
+        if ports:
+            db_targets.append(
+                {
+                    "targets": [f"{target.SSH_HOST}:{port}" for port in ports],
+                    "labels": {"target": alias},
+                }
+            )
+    api_targets = []
+    if settings.PROMETHEUS.API_ADDRESS:
+        api_targets.append({"targets": [settings.PROMETHEUS.API_ADDRESS]})
+
+    changed = False
+    for job_name, job_targets in (("db", db_targets), ("monitoring_api", api_targets)):
+        path = _file_sd_path(job_name)
+        content = json.dumps(job_targets, indent=2, ensure_ascii=False) + "\n"
+        if path.exists() and path.read_text() == content:
+            continue
+        logging.warning(f"Prometheus targets of the '{job_name}' job have changed")
+        _write_atomic(path, content)
+        changed = True
+    return changed
+
+
+def _scrape_configs(config_path: Path) -> list[dict]:
+    # paths in `prometheus.yml` are relative to its directory
+    def relative(path: Path) -> str:
+        return os.path.relpath(path, config_path.parent)
+
+    return [
         {
             "job_name": "db",
-            "static_configs": scrape_static_configs,
-        }
+            "file_sd_configs": [{"files": [relative(_file_sd_path("db"))], "refresh_interval": "1m"}],
+        },
+        {
+            "job_name": "monitoring_api",
+            "metrics_path": "/metrics",
+            "file_sd_configs": [{"files": [relative(_file_sd_path("monitoring_api"))], "refresh_interval": "1m"}],
+        },
     ]
 
-    # Read old config to preserve other options
+
+async def generate_prometheus_scrape_configs(path: Path) -> bool:
+    """
+    Write `prometheus.yml` once: jobs of the application read their targets from `file_sd_configs` files, so the
+    config does not change when targets do. An existing config is only rewritten if its jobs still list targets
+    inline (the format before file-based discovery), other options and jobs are kept.
+    """
     if path.exists():
-        old_config = yaml.safe_load(path.read_text())
+        old_config = yaml.safe_load(path.read_text()) or {}
     else:
-        old_config = {}
+        old_config = {
+            "global": {"scrape_interval": "5s", "evaluation_interval": "5s"},
+            "rule_files": [os.path.relpath(settings.PROMETHEUS.ALERT_RULES_PATH, path.parent)],
+        }
 
-    # Merge old and new configs
-    new_config = {**old_config, "scrape_configs": scrape_configs}
+    old_scrape_configs = old_config.get("scrape_configs") or []
+    jobs = {scrape_config.get("job_name"): scrape_config for scrape_config in old_scrape_configs}
+    if all("file_sd_configs" in jobs.get(job_name, {}) for job_name in SCRAPE_JOBS):
+        logging.info("Prometheus scrape configs has not changed")
+        return False
+
+    # Replace jobs of the application, keep jobs added by hand
+    scrape_configs = [
+        scrape_config for scrape_config in old_scrape_configs if scrape_config.get("job_name") not in SCRAPE_JOBS
+    ]
+    new_config = {**old_config, "scrape_configs": _scrape_configs(path) + scrape_configs}
 
-    # Dump to string and check if file has changed
     new_config = yaml.safe_dump(new_config, sort_keys=False, allow_unicode=True)
     new_config = (
-        "# The 'scrape_configs' option is generated by the application. Do not edit it manually.\n\n" + new_config
+        "# Targets of the 'db' and 'monitoring_api' jobs are generated by the application into 'file_sd_configs'"
+        " files.\n\n" + new_config
     )
-    if path.exists() and path.read_text() == new_config:
-        logging.info("Prometheus scrape configs has not changed")
-        return False
-
-    # Write to file and reload Prometheus
     logging.warning("Prometheus scrape configs has changed")
-    path.write_text(new_config)
+    _write_atomic(path, new_config)
     return True
 
 
+async def reload_prometheus():
+    logging.warning("Reloading Prometheus")
+    async with httpx.AsyncClient() as client:
+        with span("prometheus.reload"):
+            await client.post(settings.PROMETHEUS.URL + "/-/reload")
+
+
 async def generate_prometheus_configs():
     need_reload_1 = await generate_prometheus_alert_rules(
         alerts=monitoring_settings.alerts,
         path=Path(settings.PROMETHEUS.ALERT_RULES_PATH),
     )
-    need_reload_2 = await generate_prometheus_scrape_configs(
-        targets=settings.TARGETS,
-        path=Path(settings.PROMETHEUS.PROMETHEUS_CONFIG_PATH),
-    )
+    # targets are written before the config which refers to them
+    await generate_prometheus_targets(settings.TARGETS)
+    need_reload_2 = await generate_prometheus_scrape_configs(path=Path(settings.PROMETHEUS.PROMETHEUS_CONFIG_PATH))
     if need_reload_1 or need_reload_2:
-        logging.warning("Reloading Prometheus")
-        async with httpx.AsyncClient() as client:
-            await client.post(settings.PROMETHEUS.URL + "/-/reload")
+        await reload_prometheus()
+
+
+async def update_prometheus_alert_rules(changes: MonitoringConfigChanges):
+    """
+    Regenerate alert rules after the monitoring config is reloaded.
+    """
+    if not changes.alerts:
+        return
+    need_reload = await generate_prometheus_alert_rules(
+        alerts=monitoring_settings.alerts,
+        path=Path(settings.PROMETHEUS.ALERT_RULES_PATH),
+    )
+    if need_reload:
+        await reload_prometheus()
@@ -0,0 +1,701 @@
+"""
+Parser of PromQL expressions, extraction of their common subexpressions into recording rules and restriction of
+expressions to series with given labels.
+
+Only the syntax used in alert rules is supported: selectors, ranges, subqueries, `offset`, functions, aggregations
+and binary operators with vector matching. Expressions are rendered back in one canonical form, so equal
+subexpressions written differently (order of matchers, `sum(x) by (a)` or `sum by (a) (x)`) are recognized.
+"""
+
+__all__ = [
+    "PromQLSyntaxError",
+    "Expr",
+    "parse",
+    "with_label_matchers",
+    "extract_recording_rules",
+]
+
+import dataclasses
+import hashlib
+import json
+import logging
+import re
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PromQLSyntaxError(ValueError):
+    pass
+
+
+AGGREGATIONS = {
+    "sum",
+    "avg",
+    "min",
+    "max",
+    "count",
+    "group",
+    "stddev",
+    "stdvar",
+    "topk",
+    "bottomk",
+    "quantile",
+    "count_values",
+}
+# aggregations with a parameter before the expression
+PARAMETRIC_AGGREGATIONS = {"topk", "bottomk", "quantile", "count_values"}
+# functions which return a scalar or take no vector
+SCALAR_FUNCTIONS = {"scalar", "time", "pi", "vector", "minute", "hour", "day_of_month", "day_of_week", "month", "year"}
+
+# precedence of binary operators, higher binds tighter
+PRECEDENCE = {
+    "or": 1,
+    "and": 2,
+    "unless": 2,
+    "==": 3,
+    "!=": 3,
+    "<=": 3,
+    "<": 3,
+    ">=": 3,
+    ">": 3,
+    "+": 4,
+    "-": 4,
+    "*": 5,
+    "/": 5,
+    "%": 5,
+    "atan2": 5,
+    "^": 6,
+}
+COMPARISONS = {"==", "!=", "<=", "<", ">=", ">"}
+SET_OPERATORS = {"and", "or", "unless"}
+ARITHMETIC_NAMES = {"+": "add", "-": "sub", "*": "mul", "/": "div", "%": "mod", "^": "pow", "atan2": "atan2"}
+# unary minus binds tighter than everything except `^`
+UNARY_PRECEDENCE = 6
+
+# --------------------------------------------------------------------------------------------------------------------
+# AST
+
+
+class Expr(ABC):
+    @abstractmethod
+    def render(self) -> str:
+        """
+        Canonical form of the expression.
+        """
+
+    def children(self) -> tuple["Expr", ...]:
+        return ()
+
+    def replace_children(self, children: tuple["Expr", ...]) -> "Expr":
+        return self
+
+    def walk(self) -> Iterator["Expr"]:
+        yield self
+        for child in self.children():
+            yield from child.walk()
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+@dataclasses.dataclass(frozen=True)
+class NumberLiteral(Expr):
+    text: str
+
+    def render(self) -> str:
+        return self.text
+
+
+@dataclasses.dataclass(frozen=True)
+class StringLiteral(Expr):
+    text: str
+
+    def render(self) -> str:
+        return self.text
+
+
+@dataclasses.dataclass(frozen=True)
+class Matcher:
+    name: str
+    op: str
+    # quoted as in the source
+    value: str
+
+    def render(self) -> str:
+        return f"{self.name}{self.op}{self.value}"
+
+
+@dataclasses.dataclass(frozen=True)
+class VectorSelector(Expr):
+    name: Optional[str]
+    matchers: tuple[Matcher, ...] = ()
+    offset: Optional[str] = None
+
+    def render_selector(self) -> str:
+        matchers = ",".join(matcher.render() for matcher in sorted(self.matchers, key=lambda m: (m.name, m.op)))
+        selector = self.name or ""
+        if matchers or not self.name:
+            selector += "{" + matchers + "}"
+        return selector
+
+    def render(self) -> str:
+        return self.render_selector() + (f" offset {self.offset}" if self.offset else "")
+
+
+@dataclasses.dataclass(frozen=True)
+class MatrixSelector(Expr):
+    vector: VectorSelector
+    range: str
+
+    def render(self) -> str:
+        offset = f" offset {self.vector.offset}" if self.vector.offset else ""
+        return f"{self.vector.render_selector()}[{self.range}]{offset}"
+
+
+@dataclasses.dataclass(frozen=True)
+class Subquery(Expr):
+    expr: Expr
+    range: str
+    offset: Optional[str] = None
+
+    def children(self) -> tuple[Expr, ...]:
+        return (self.expr,)
+
+    def replace_children(self, children: tuple[Expr, ...]) -> Expr:
+        return dataclasses.replace(self, expr=children[0])
+
+    def render(self) -> str:
+        inner = self.expr.render()
+        if isinstance(self.expr, (Binary, Unary)):
+            inner = f"({inner})"
+        return f"{inner}[{self.range}]" + (f" offset {self.offset}" if self.offset else "")
+
+
+@dataclasses.dataclass(frozen=True)
+class Call(Expr):
+    func: str
+    args: tuple[Expr, ...]
+
+    def children(self) -> tuple[Expr, ...]:
+        return self.args
+
+    def replace_children(self, children: tuple[Expr, ...]) -> Expr:
+        return dataclasses.replace(self, args=children)
+
+    def render(self) -> str:
+        return f"{self.func}({', '.join(arg.render() for arg in self.args)})"
+
+
+@dataclasses.dataclass(frozen=True)
+class Aggregate(Expr):
+    op: str
+    expr: Expr
+    param: Optional[Expr] = None
+    grouping: tuple[str, ...] = ()
+    without: bool = False
+
+    def children(self) -> tuple[Expr, ...]:
+        return (self.expr,) if self.param is None else (self.param, self.expr)
+
+    def replace_children(self, children: tuple[Expr, ...]) -> Expr:
+        if self.param is None:
+            return dataclasses.replace(self, expr=children[0])
+        return dataclasses.replace(self, param=children[0], expr=children[1])
+
+    def render(self) -> str:
+        args = self.expr.render() if self.param is None else f"{self.param.render()}, {self.expr.render()}"
+        if not self.grouping and not self.without:
+            return f"{self.op}({args})"
+        return f"{self.op} {'without' if self.without else 'by'} ({', '.join(sorted(self.grouping))}) ({args})"
+
+
+@dataclasses.dataclass(frozen=True)
+class VectorMatching:
+    on: bool
+    labels: tuple[str, ...]
+    # "group_left" or "group_right"
+    group: Optional[str] = None
+    include: tuple[str, ...] = ()
+
+    def render(self) -> str:
+        rendered = f"{'on' if self.on else 'ignoring'} ({', '.join(sorted(self.labels))})"
+        if self.group:
+            rendered += f" {self.group} ({', '.join(sorted(self.include))})"
+        return rendered
+
+
+@dataclasses.dataclass(frozen=True)
+class Unary(Expr):
+    op: str
+    expr: Expr
+
+    def children(self) -> tuple[Expr, ...]:
+        return (self.expr,)
+
+    def replace_children(self, children: tuple[Expr, ...]) -> Expr:
+        return dataclasses.replace(self, expr=children[0])
+
+    def render(self) -> str:
+        inner = self.expr.render()
+        if isinstance(self.expr, Binary):
+            inner = f"({inner})"
+        return f"{self.op}{inner}"
+
+
+@dataclasses.dataclass(frozen=True)
+class Binary(Expr):
+    op: str
+    lhs: Expr
+    rhs: Expr
+    bool_modifier: bool = False
+    matching: Optional[VectorMatching] = None
+
+    def children(self) -> tuple[Expr, ...]:
+        return self.lhs, self.rhs
+
+    def replace_children(self, children: tuple[Expr, ...]) -> Expr:
+        return dataclasses.replace(self, lhs=children[0], rhs=children[1])
+
+    def _operand(self, operand: Expr, right: bool) -> str:
+        rendered = operand.render()
+        if isinstance(operand, Binary):
+            precedence, own = PRECEDENCE[operand.op], PRECEDENCE[self.op]
+            # `^` is right-associative, the others are left-associative
+            same_side = right == (self.op != "^")
+            if precedence < own or (precedence == own and same_side):
+                rendered = f"({rendered})"
+        elif isinstance(operand, Unary) and self.op == "^" and not right:
+            rendered = f"({rendered})"
+        return rendered
+
+    def render(self) -> str:
+        modifiers = ""
+        if self.bool_modifier:
+            modifiers += " bool"
+        if self.matching is not None:
+            modifiers += f" {self.matching.render()}"
+        return f"{self._operand(self.lhs, False)} {self.op}{modifiers} {self._operand(self.rhs, True)}"
+
+
+# --------------------------------------------------------------------------------------------------------------------
+# Lexer
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<space>\s+|\#[^\n]*)
+    | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`[^`]*`)
+    | (?P<ident>[a-zA-Z_:][a-zA-Z0-9_:]*)
+    | (?P<op>==|!=|<=|>=|=~|!~|[-+*/%^<>=(){},@])
+    | (?P<bracket>\[[^\]]*\])
+    """,
+    re.VERBOSE,
+)
+
+# `1h30m` is lexed as the number `1` and the identifier `h30m`
+_DURATION_RE = re.compile(r"(?:\d+(?:ms|s|m|h|d|w|y))+")
+
+
+@dataclasses.dataclass(frozen=True)
+class _Token:
+    kind: str
+    text: str
+    position: int
+
+
+def _tokenize(expr: str) -> list[_Token]:
+    tokens = []
+    position = 0
+    while position < len(expr):
+        match = _TOKEN_RE.match(expr, position)
+        if match is None:
+            raise PromQLSyntaxError(f"Unexpected character {expr[position]!r} at {position}")
+        kind = match.lastgroup
+        if kind != "space":
+            tokens.append(_Token(kind, match.group(), position))
+        position = match.end()
+    tokens.append(_Token("end", "", position))
+    return tokens
+
+
+# --------------------------------------------------------------------------------------------------------------------
+# Parser
+
+
+class _Parser:
+    def __init__(self, expr: str):
+        self.tokens = _tokenize(expr)
+        self.index = 0
+
+    @property
+    def current(self) -> _Token:
+        return self.tokens[self.index]
+
+    def _peek(self, offset: int = 1) -> _Token:
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def _next(self) -> _Token:
+        token = self.current
+        self.index += 1
+        return token
+
+    def _expect(self, text: str) -> _Token:
+        token = self._next()
+        if token.text != text:
+            raise PromQLSyntaxError(f"Expected {text!r} at {token.position}, got {token.text!r}")
+        return token
+
+    def _is(self, text: str) -> bool:
+        return self.current.kind in ("op", "ident") and self.current.text == text
+
+    def parse(self) -> Expr:
+        expr = self._parse_expr(0)
+        if self.current.kind != "end":
+            raise PromQLSyntaxError(f"Unexpected {self.current.text!r} at {self.current.position}")
+        return expr
+
+    def _binary_operator(self) -> Optional[str]:
+        token = self.current
+        if token.kind == "op" and token.text in PRECEDENCE:
+            return token.text
+        if token.kind == "ident" and token.text.lower() in ("and", "or", "unless", "atan2"):
+            return token.text.lower()
+        return None
+
+    def _parse_expr(self, min_precedence: int) -> Expr:
+        lhs = self._parse_unary()
+        while True:
+            op = self._binary_operator()
+            if op is None or PRECEDENCE[op] < min_precedence:
+                return lhs
+            self._next()
+
+            bool_modifier = False
+            if self._is("bool"):
+                if op not in COMPARISONS:
+                    raise PromQLSyntaxError("`bool` modifier is allowed only for comparisons")
+                self._next()
+                bool_modifier = True
+            matching = self._parse_matching()
+
+            # `^` is right-associative
+            next_precedence = PRECEDENCE[op] if op == "^" else PRECEDENCE[op] + 1
+            rhs = self._parse_expr(next_precedence)
+            lhs = Binary(op, lhs, rhs, bool_modifier, matching)
+
+    def _parse_matching(self) -> Optional[VectorMatching]:
+        if not (self._is("on") or self._is("ignoring")):
+            return None
+        on = self._next().text == "on"
+        labels = self._parse_labels()
+        group, include = None, ()
+        if self._is("group_left") or self._is("group_right"):
+            group = self._next().text
+            if self._is("("):
+                include = self._parse_labels()
+        return VectorMatching(on, labels, group, include)
+
+    def _parse_labels(self) -> tuple[str, ...]:
+        self._expect("(")
+        labels = []
+        while not self._is(")"):
+            token = self._next()
+            if token.kind != "ident":
+                raise PromQLSyntaxError(f"Expected label name at {token.position}, got {token.text!r}")
+            labels.append(token.text)
+            if not self._is(")"):
+                self._expect(",")
+        self._expect(")")
+        return tuple(labels)
+
+    def _parse_unary(self) -> Expr:
+        if self.current.kind == "op" and self.current.text in ("-", "+"):
+            op = self._next().text
+            operand = self._parse_expr(UNARY_PRECEDENCE)
+            if isinstance(operand, NumberLiteral):
+                return NumberLiteral(op + operand.text) if op == "-" else operand
+            return Unary(op, operand)
+        return self._parse_postfix(self._parse_primary())
+
+    def _parse_postfix(self, expr: Expr) -> Expr:
+        while True:
+            if self.current.kind == "bracket":
+                text = self._next().text[1:-1].strip()
+                if ":" in text:
+                    expr = Subquery(expr, text)
+                elif isinstance(expr, VectorSelector):
+                    expr = MatrixSelector(expr, text)
+                else:
+                    raise PromQLSyntaxError(f"Range can only be applied to a selector: {expr.render()}[{text}]")
+            elif self._is("offset"):
+                self._next()
+                offset = self._parse_duration()
+                if isinstance(expr, VectorSelector):
+                    expr = dataclasses.replace(expr, offset=offset)
+                elif isinstance(expr, MatrixSelector):
+                    expr = dataclasses.replace(expr, vector=dataclasses.replace(expr.vector, offset=offset))
+                elif isinstance(expr, Subquery):
+                    expr = dataclasses.replace(expr, offset=offset)
+                else:
+                    raise PromQLSyntaxError("`offset` can only be applied to a selector or a subquery")
+            elif self._is("@"):
+                raise PromQLSyntaxError("`@` modifier is not supported")
+            else:
+                return expr
+
+    def _parse_duration(self) -> str:
+        # durations are lexed as a number followed by a unit, e.g. `5m` or `1h30m`
+        parts = []
+        sign = ""
+        if self._is("-"):
+            sign = self._next().text
+        position = self.current.position
+        while self.current.kind == "number" and self._peek().kind == "ident":
+            parts.append(self._next().text + self._next().text)
+        duration = "".join(parts)
+        if not _DURATION_RE.fullmatch(duration):
+            raise PromQLSyntaxError(f"Expected duration at {position}")
+        return sign + duration
+
+    def _parse_primary(self) -> Expr:
+        token = self.current
+
+        if token.kind == "number":
+            self._next()
+            return NumberLiteral(token.text)
+        if token.kind == "string":
+            self._next()
+            return StringLiteral(token.text)
+        if token.kind == "op" and token.text == "(":
+            self._next()
+            expr = self._parse_expr(0)
+            self._expect(")")
+            return expr
+        if token.kind == "op" and token.text == "{":
+            return VectorSelector(None, self._parse_matchers())
+        if token.kind != "ident":
+            raise PromQLSyntaxError(f"Unexpected {token.text!r} at {token.position}")
+
+        name = token.text
+        if name.lower() in ("inf", "nan"):
+            self._next()
+            return NumberLiteral(name)
+        if name.lower() in AGGREGATIONS and (self._peek().text == "(" or self._peek().text in ("by", "without")):
+            return self._parse_aggregate()
+        self._next()
+        if self._is("("):
+            return Call(name, self._parse_args())
+        matchers = self._parse_matchers() if self._is("{") else ()
+        return VectorSelector(name, matchers)
+
+    def _parse_matchers(self) -> tuple[Matcher, ...]:
+        self._expect("{")
+        matchers = []
+        while not self._is("}"):
+            name = self._next()
+            if name.kind != "ident":
+                raise PromQLSyntaxError(f"Expected label name at {name.position}, got {name.text!r}")
+            op = self._next()
+            if op.text not in ("=", "!=", "=~", "!~"):
+                raise PromQLSyntaxError(f"Expected label matcher at {op.position}, got {op.text!r}")
+            value = self._next()
+            if value.kind != "string":
+                raise PromQLSyntaxError(f"Expected string at {value.position}, got {value.text!r}")
+            matchers.append(Matcher(name.text, op.text, value.text))
+            if not self._is("}"):
+                self._expect(",")
+        self._expect("}")
+        return tuple(matchers)
+
+    def _parse_args(self) -> tuple[Expr, ...]:
+        self._expect("(")
+        args = []
+        while not self._is(")"):
+            args.append(self._parse_expr(0))
+            if not self._is(")"):
+                self._expect(",")
+        self._expect(")")
+        return tuple(args)
+
+    def _parse_grouping(self) -> Optional[tuple[bool, tuple[str, ...]]]:
+        if self._is("by") or self._is("without"):
+            without = self._next().text == "without"
+            return without, self._parse_labels()
+        return None
+
+    def _parse_aggregate(self) -> Aggregate:
+        op = self._next().text.lower()
+        grouping = self._parse_grouping()
+        args = self._parse_args()
+        if grouping is None:
+            grouping = self._parse_grouping()
+        without, labels = grouping or (False, ())
+
+        expected = 2 if op in PARAMETRIC_AGGREGATIONS else 1
+        if len(args) != expected:
+            raise PromQLSyntaxError(f"`{op}` expects {expected} argument(s), got {len(args)}")
+        param, expr = (args[0], args[1]) if expected == 2 else (None, args[0])
+        return Aggregate(op, expr, param, labels, without)
+
+
+def parse(expr: str) -> Expr:
+    """
+    :raises PromQLSyntaxError: if the expression is not valid or uses unsupported syntax
+    """
+    return _Parser(expr).parse()
+
+
+def with_label_matchers(expr: str, labels: dict[str, str]) -> str:
+    """
+    Restrict every selector of the expression to series with the given labels, e.g. to the series of one target.
+    Matchers of the same labels in the expression are replaced.
+
+    :raises PromQLSyntaxError: if the expression is not valid or uses unsupported syntax
+    """
+    added = tuple(Matcher(name, "=", json.dumps(value)) for name, value in labels.items())
+
+    def restrict(selector: VectorSelector) -> VectorSelector:
+        matchers = tuple(matcher for matcher in selector.matchers if matcher.name not in labels)
+        return dataclasses.replace(selector, matchers=matchers + added)
+
+    def rewrite(node: Expr) -> Expr:
+        if isinstance(node, VectorSelector):
+            return restrict(node)
+        if isinstance(node, MatrixSelector):
+            return dataclasses.replace(node, vector=restrict(node.vector))
+        children = node.children()
+        if not children:
+            return node
+        return node.replace_children(tuple(rewrite(child) for child in children))
+
+    return rewrite(parse(expr)).render()
+
+
+# --------------------------------------------------------------------------------------------------------------------
+# Common subexpressions
+
+
+def _is_scalar(expr: Expr) -> bool:
+    if isinstance(expr, NumberLiteral):
+        return True
+    if isinstance(expr, Call):
+        return expr.func in SCALAR_FUNCTIONS
+    if isinstance(expr, Unary):
+        return _is_scalar(expr.expr)
+    if isinstance(expr, Binary):
+        return _is_scalar(expr.lhs) and _is_scalar(expr.rhs)
+    return False
+
+
+def _is_candidate(expr: Expr) -> bool:
+    """
+    Instant vector expressions which are worth recording: aggregations, and functions and arithmetic whose vector
+    operands are all aggregations. Recording anything else (e.g. `rate` of a selector) stores a copy of every input
+    series instead of saving work. Comparisons and set operators filter series, they are left in the alerts.
+    """
+    if isinstance(expr, Aggregate):
+        # `topk` and `bottomk` keep the labels of the input series
+        return expr.op not in ("topk", "bottomk")
+    if isinstance(expr, Call):
+        operands = [arg for arg in expr.args if not _is_scalar(arg)]
+    elif isinstance(expr, Unary):
+        operands = [expr.expr]
+    elif isinstance(expr, Binary) and expr.op not in COMPARISONS and expr.op not in SET_OPERATORS:
+        operands = [operand for operand in (expr.lhs, expr.rhs) if not _is_scalar(operand)]
+    else:
+        return False
+    return bool(operands) and all(_is_candidate(operand) for operand in operands)
+
+
+def _record_name(expr: Expr) -> str:
+    """
+    Name in the `level:metric:operations` convention, with a hash of the expression to keep it unique and stable.
+    The level is the labels kept by the first aggregation, `without_<labels>` if they are removed instead.
+    """
+    # candidates always contain an aggregation
+    aggregate = next(node for node in expr.walk() if isinstance(node, Aggregate))
+    if aggregate.without:
+        level = "_".join(("without", *sorted(aggregate.grouping)))
+    else:
+        level = "_".join(sorted(aggregate.grouping)) or "all"
+
+    metric = next(
+        (node.name for node in expr.walk() if isinstance(node, VectorSelector) and node.name),
+        next((node.vector.name for node in expr.walk() if isinstance(node, MatrixSelector) and node.vector.name), ""),
+    )
+    if isinstance(expr, Aggregate):
+        operation = expr.op
+    elif isinstance(expr, Call):
+        operation = expr.func
+    else:
+        operation = ARITHMETIC_NAMES.get(getattr(expr, "op", ""), "expr")
+
+    digest = hashlib.sha1(expr.render().encode()).hexdigest()[:8]
+    return f"{level}:{metric or 'expr'}:{operation}_{digest}"
+
+
+def extract_recording_rules(expressions: dict[str, str]) -> tuple[list[tuple[str, str]], dict[str, str]]:
+    """
+    Find subexpressions which are evaluated more than once across the expressions (or within one of them)
+    and move them into recording rules.
+
+    :return: recording rules as (record, expr) in the order of evaluation (a rule goes after the rules it uses)
+        and the expressions rewritten to use the recorded series. Expressions which cannot be parsed are kept as is.
+    """
+    parsed: dict[str, Expr] = {}
+    for key, expr in expressions.items():
+        try:
+            parsed[key] = parse(expr)
+        except PromQLSyntaxError as e:
+            logger.warning(f"Expression of `{key}` is not optimized: {e}")
+
+    # occurrences of each candidate by its canonical form
+    counts: Counter[str] = Counter()
+    nodes: dict[str, Expr] = {}
+    for tree in parsed.values():
+        for node in tree.walk():
+            if _is_candidate(node):
+                key = node.render()
+                counts[key] += 1
+                nodes.setdefault(key, node)
+
+    # larger subexpressions first: when one is recorded, its inner subexpressions are computed only once too
+    extracted: set[str] = set()
+    for key in sorted(counts, key=lambda k: sum(1 for _ in nodes[k].walk()), reverse=True):
+        occurrences = counts[key]
+        if occurrences < 2:
+            continue
+        extracted.add(key)
+        for inner in list(nodes[key].walk())[1:]:
+            if _is_candidate(inner):
+                counts[inner.render()] -= occurrences - 1
+
+    if not extracted:
+        return [], dict(expressions)
+
+    recording_rules: list[tuple[str, str]] = []
+    names: dict[str, str] = {}
+
+    def rewrite(node: Expr, root: bool = False) -> Expr:
+        key = node.render() if _is_candidate(node) else None
+        if key in extracted and not root:
+            if key not in names:
+                # inner recorded series are added first, they are evaluated before this rule
+                body = rewrite(node, root=True)
+                names[key] = _record_name(node)
+                recording_rules.append((names[key], body.render()))
+            return VectorSelector(names[key])
+        children = node.children()
+        if not children:
+            return node
+        return node.replace_children(tuple(rewrite(child) for child in children))
+
+    rewritten = dict(expressions)
+    for key, tree in parsed.items():
+        new_tree = rewrite(tree)
+        if new_tree != tree:
+            rewritten[key] = new_tree.render()
+    return recording_rules, rewritten
@@ -58,12 +58,41 @@ class View(BaseModel):
     title: str
     description: str
     sql: str
+    # view shows the state of the primary itself (activity, locks, replication), so it is not routed to replicas
+    requires_primary: bool = False
+    # rows are serialized to JSON by Postgres (`json_agg`) and sent as is, for views with large results.
+    # Values keep their JSON types instead of being converted to strings
+    server_json: bool = False
+    # frequently executed view: prepared once per connection and executed by the driver directly
+    hot: bool = False
+
+
+class Panel(BaseModel):
+    title: str
+    description: str = ""
+    # PromQL expression charted for one target, its selectors are restricted to the series of the target
+    expr: str
+
+
+class MonitoringConfigChanges(BaseModel):
+    """
+    Aliases of added, changed or removed entries after reload.
+    """
+
+    alerts: set[str] = Field(default_factory=set)
+    actions: set[str] = Field(default_factory=set)
+    views: set[str] = Field(default_factory=set)
+    panels: set[str] = Field(default_factory=set)
+
+    def __bool__(self):
+        return bool(self.alerts or self.actions or self.views or self.panels)
 
 
 class MonitoringConfig(BaseModel):
     alerts: dict[str, Alert] = Field(default_factory=dict)
     actions: dict[str, Action] = Field(default_factory=dict)
     views: dict[str, View] = Field(default_factory=dict)
+    panels: dict[str, Panel] = Field(default_factory=dict)
 
     @classmethod
     def from_yamls(cls, alert_path: Path, actions_path: Path, views_path: Path) -> "MonitoringConfig":
@@ -76,7 +105,39 @@ class MonitoringConfig(BaseModel):
         with open(views_path, "r", encoding="utf-8") as f:
             views_config = yaml.safe_load(f)
 
-        return cls(alerts=alerts_config["alerts"], actions=actions_config["actions"], views=views_config["views"])
+        return cls(
+            alerts=alerts_config["alerts"],
+            actions=actions_config["actions"],
+            views=views_config["views"],
+            panels=views_config.get("panels") or {},
+        )
+
+    def replace_with(self, new: "MonitoringConfig") -> MonitoringConfigChanges:
+        """
+        Replace entries with the ones from the new config. Objects of unchanged entries are kept, so anything
+        bound to them stays valid.
+        """
+        changes = MonitoringConfigChanges()
+        sections = {}
+
+        for section in ("alerts", "actions", "views", "panels"):
+            old_entries: dict = getattr(self, section)
+            new_entries: dict = getattr(new, section)
+            merged = {}
+            for alias, entry in new_entries.items():
+                old_entry = old_entries.get(alias)
+                if old_entry is not None and old_entry == entry:
+                    merged[alias] = old_entry
+                else:
+                    merged[alias] = entry
+                    getattr(changes, section).add(alias)
+            getattr(changes, section).update(old_entries.keys() - new_entries.keys())
+            sections[section] = merged
+
+        # no awaits in between, so requests see either old or new config
+        for section, merged in sections.items():
+            setattr(self, section, merged)
+        return changes
 
 
 settings = MonitoringConfig.from_yamls(
@@ -0,0 +1,93 @@
+__all__ = ["MonitoringConfigWatcher", "ReloadCallback"]
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+import yaml
+from pydantic import ValidationError
+
+from src.config import settings as app_settings
+from src.storages.monitoring.config import MonitoringConfig, MonitoringConfigChanges, settings
+
+logger = logging.getLogger(__name__)
+
+ReloadCallback = Callable[[MonitoringConfigChanges], Awaitable[None]]
+
+
+class MonitoringConfigWatcher:
+    """
+    Watch alerts, actions and views YAML files and reload the monitoring config when they change.
+
+    Invalid files are rejected and the previous config keeps serving.
+    """
+
+    def __init__(self, interval: float, callbacks: list[ReloadCallback]):
+        self.interval = interval
+        self.callbacks = callbacks
+        self._task: Optional[asyncio.Task] = None
+        self._last_stat = self._stat()
+
+    @staticmethod
+    def _stat() -> tuple:
+        stat = []
+        for path in (
+            app_settings.ALERTS_CONFIG_PATH,
+            app_settings.ACTIONS_CONFIG_PATH,
+            app_settings.VIEWS_CONFIG_PATH,
+        ):
+            try:
+                st = path.stat()
+                stat.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stat.append(None)
+        return tuple(stat)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            stat = self._stat()
+            if stat != self._last_stat:
+                self._last_stat = stat
+                await self.reload()
+
+    async def reload(self) -> Optional[MonitoringConfigChanges]:
+        """
+        Validate the files and swap the config.
+
+        :return: changed entries or None if the files are invalid
+        """
+        try:
+            new = MonitoringConfig.from_yamls(
+                alert_path=app_settings.ALERTS_CONFIG_PATH,
+                actions_path=app_settings.ACTIONS_CONFIG_PATH,
+                views_path=app_settings.VIEWS_CONFIG_PATH,
+            )
+        except (OSError, yaml.YAMLError, ValidationError, KeyError, TypeError) as e:
+            logger.error(f"Monitoring config is invalid, the previous one is kept: {e}")
+            return None
+
+        changes = settings.replace_with(new)
+        if not changes:
+            return changes
+
+        logger.warning(
+            f"Monitoring config is reloaded: alerts {sorted(changes.alerts)}, actions {sorted(changes.actions)}, "
+            f"views {sorted(changes.views)}, panels {sorted(changes.panels)}"
+        )
+        for callback in self.callbacks:
+            try:
+                await callback(changes)
+            except Exception:
+                logger.exception("Failed to apply reloaded monitoring config")
+        return changes
@@ -3,6 +3,7 @@ import src.storages.sqlalchemy.models.__mixin__  # noqa: F401
 
 # Add all models here
 from src.storages.sqlalchemy.models.users import User, EmailFlow
-from src.storages.sqlalchemy.models.alerts import Alert, AlertDelivery
+from src.storages.sqlalchemy.models.alerts import Alert
+from src.storages.sqlalchemy.models.outbox import OutboxMessage
 
-__all__ = ["Base", "User", "EmailFlow", "Alert", "AlertDelivery"]
+__all__ = ["Base", "User", "EmailFlow", "Alert", "OutboxMessage"]
@@ -1,7 +1,7 @@
 import datetime
-from typing import Any
+from typing import Any, Optional
 
-from sqlalchemy import ForeignKey, DateTime
+from sqlalchemy import DateTime, LargeBinary
 from sqlalchemy.orm import mapped_column, Mapped
 
 from src.storages.sqlalchemy.models.__mixin__ import IdMixin
@@ -15,12 +15,5 @@ class Alert(Base, IdMixin):
     target_alias: Mapped[str] = mapped_column(nullable=False)
     timestamp: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     value: Mapped[dict[str, Any]] = mapped_column(nullable=False)
-
-
-class AlertDelivery(Base, IdMixin):
-    __tablename__ = "alert_deliveries"
-
-    alert_id: Mapped[int] = mapped_column(ForeignKey(Alert.id), nullable=False)
-    receiver_id: Mapped[int] = mapped_column(nullable=False)
-
-    delivered: Mapped[bool] = mapped_column(default=False)
+    # zlib-compressed JSON with results of the related views at the moment of firing
+    snapshot: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
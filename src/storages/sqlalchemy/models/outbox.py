@@ -0,0 +1,47 @@
+__all__ = ["OutboxMessage", "OutboxChannel", "OutboxStatus"]
+
+import datetime
+from enum import StrEnum
+from typing import Any, Optional
+
+from sqlalchemy import ForeignKey, DateTime, Index, func
+from sqlalchemy.orm import mapped_column, Mapped
+
+from src.storages.sqlalchemy.models.__mixin__ import IdMixin
+from src.storages.sqlalchemy.models.alerts import Alert
+from src.storages.sqlalchemy.models.base import Base
+
+
+class OutboxChannel(StrEnum):
+    telegram = "telegram"
+    email = "email"
+
+
+class OutboxStatus(StrEnum):
+    pending = "pending"
+    sent = "sent"
+    dead = "dead"
+
+
+class OutboxMessage(Base, IdMixin):
+    __tablename__ = "outbox"
+
+    channel: Mapped[str] = mapped_column(nullable=False)
+    # telegram id or email address
+    recipient: Mapped[str] = mapped_column(nullable=False)
+    alert_id: Mapped[Optional[int]] = mapped_column(ForeignKey(Alert.id), nullable=True)
+    payload: Mapped[dict[str, Any]] = mapped_column(nullable=False, default=dict)
+    # lower value is delivered first
+    priority: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    status: Mapped[str] = mapped_column(nullable=False, default=OutboxStatus.pending)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    next_attempt_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(nullable=True)
+
+    __table_args__ = (Index("outbox_due_index", "status", "channel", "next_attempt_at"),)
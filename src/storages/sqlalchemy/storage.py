@@ -28,10 +28,10 @@ class SQLAlchemyStorage(AbstractSQLAlchemyStorage):
         self.sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
 
     @classmethod
-    def from_url(cls, url: str) -> "SQLAlchemyStorage":
+    def from_url(cls, url: str, **engine_kwargs) -> "SQLAlchemyStorage":
         from sqlalchemy.ext.asyncio import create_async_engine
 
-        engine = create_async_engine(url, pool_recycle=3600)
+        engine = create_async_engine(url, pool_recycle=3600, **engine_kwargs)
         return cls(engine)
 
     def create_session(self) -> AsyncSession:
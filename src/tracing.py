@@ -0,0 +1,254 @@
+"""
+Lightweight request tracing.
+
+A span measures one unit of work (a request, a dependency, a repository method, a call to a target). The current
+span is kept in a context variable, so it propagates through `await` and into tasks created from the request, and
+nested spans become its children. Finished spans are passed to the exporters.
+"""
+
+__all__ = [
+    "Span",
+    "SpanExporter",
+    "RingBufferExporter",
+    "span",
+    "trace",
+    "traced",
+    "traced_methods",
+    "current_span",
+    "set_exporters",
+    "get_ring_buffer",
+]
+
+import datetime
+import functools
+import inspect
+import logging
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Optional, TypeVar
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable)
+C = TypeVar("C", bound=type)
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "started_at",
+        "duration",
+        "attributes",
+        "error",
+        "_started",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        # seconds, None while the span is not finished
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{error.__class__.__name__}: {getattr(error, 'detail', None) or error}"
+
+
+class _NotSampled:
+    """
+    Marks the context of a trace that was not sampled, so its nested spans are not recorded either.
+    """
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+_NOT_SAMPLED = _NotSampled()
+
+_current_span: ContextVar[Span | _NotSampled | None] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    current = _current_span.get()
+    return current if isinstance(current, Span) else None
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        """
+        Called for every finished span, must not block.
+        """
+
+
+class RingBufferExporter(SpanExporter):
+    """
+    Keep spans of the last traces in memory, the oldest trace is dropped when the buffer is full.
+    """
+
+    def __init__(self, max_traces: int, max_spans: int):
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self._traces: OrderedDict[str, list[Span]] = OrderedDict()
+
+    def export(self, span: Span) -> None:
+        spans = self._traces.get(span.trace_id)
+        if spans is None:
+            spans = self._traces[span.trace_id] = []
+            if len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        if len(spans) < self.max_spans:
+            spans.append(span)
+
+    def traces(self) -> list[list[Span]]:
+        """
+        Spans of the buffered traces, the latest trace first.
+        """
+        return [list(spans) for spans in reversed(self._traces.values())]
+
+    def get(self, trace_id: str) -> Optional[list[Span]]:
+        spans = self._traces.get(trace_id)
+        return list(spans) if spans is not None else None
+
+
+_ring_buffer = RingBufferExporter(settings.TRACING.BUFFER_SIZE, settings.TRACING.MAX_SPANS)
+_exporters: list[SpanExporter] = [_ring_buffer]
+
+
+def set_exporters(exporters: list[SpanExporter]):
+    """
+    Replace exporters of finished spans. The ring buffer is not kept unless it is in the list.
+    """
+    global _exporters
+    _exporters = list(exporters)
+
+
+def get_ring_buffer() -> RingBufferExporter:
+    return _ring_buffer
+
+
+def _export(finished: Span):
+    for exporter in _exporters:
+        try:
+            exporter.export(finished)
+        except Exception:
+            logger.exception(f"Failed to export span with {exporter.__class__.__name__}")
+
+
+class span:
+    """
+    Context manager (sync or async) recording a span, child of the current one. Outside of a trace nothing
+    is recorded, so background loops do not flood the buffer.
+    """
+
+    __slots__ = ("name", "attributes", "_span", "_token")
+    # start a new trace when there is no current span
+    _root = False
+
+    def __init__(self, name: str, **attributes: Any):
+        self.name = name
+        self.attributes = attributes
+        self._span: Optional[Span] = None
+        self._token: Optional[Token] = None
+
+    def __enter__(self) -> Span | _NotSampled:
+        if not settings.TRACING.ENABLED:
+            return _NOT_SAMPLED
+
+        parent = _current_span.get()
+        if parent is _NOT_SAMPLED:
+            return _NOT_SAMPLED
+        if parent is None:
+            if not self._root:
+                return _NOT_SAMPLED
+            if random.random() >= settings.TRACING.SAMPLE_RATE:
+                self._token = _current_span.set(_NOT_SAMPLED)
+                return _NOT_SAMPLED
+            self._span = Span(self.name, os.urandom(16).hex(), None, self.attributes)
+        else:
+            self._span = Span(self.name, parent.trace_id, parent.span_id, self.attributes)
+
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        if self._span is not None:
+            self._span.finish(exc_value)
+            _export(self._span)
+            self._span = None
+
+    async def __aenter__(self) -> Span | _NotSampled:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.__exit__(exc_type, exc_value, traceback)
+
+
+class trace(span):
+    """
+    Like `span`, but starts a new trace when there is no current span (a request, a background job).
+    New traces are sampled with `TRACING.SAMPLE_RATE` probability.
+    """
+
+    __slots__ = ()
+    _root = True
+
+
+def traced(name: Optional[str] = None) -> Callable[[F], F]:
+    """
+    Record a span for each call of the decorated function (sync or async). The signature is kept, so it can be used
+    for FastAPI dependencies.
+    """
+
+    def decorator(function: F) -> F:
+        span_name = name or function.__qualname__
+
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_methods(cls: C) -> C:
+    """
+    Record a span for each call of the public coroutine methods defined in the class.
+    """
+    for attribute, value in list(vars(cls).items()):
+        if not attribute.startswith("_") and inspect.iscoroutinefunction(value):
+            setattr(cls, attribute, traced(f"{cls.__name__}.{attribute}")(value))
+    return cls
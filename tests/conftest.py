@@ -0,0 +1,5 @@
+import os
+from pathlib import Path
+
+# `src.config` loads the settings on import
+os.environ.setdefault("SETTINGS_PATH", str(Path(__file__).parent.parent / "settings.example.yaml"))
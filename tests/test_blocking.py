@@ -0,0 +1,46 @@
+from src.modules.views.blocking import build_blocking_tree
+
+
+def _row(pid: int, blocked_by: list[int] = (), query_duration: float = 1.0) -> dict:
+    return {"pid": pid, "blocked_by": list(blocked_by), "query_duration": query_duration}
+
+
+def test_waiters_are_attached_to_first_blocker():
+    tree = build_blocking_tree(
+        "db",
+        [_row(1, query_duration=100), _row(2, [1], 5), _row(3, [2, 1], 7), _row(4, [1], 1)],
+    )
+
+    assert [root.pid for root in tree.roots] == [1]
+    root = tree.roots[0]
+    assert root.subtree_size == 4
+    assert root.max_wait == 7
+    assert [(child.pid, child.subtree_size) for child in root.blocked] == [(2, 2), (4, 1)]
+    assert [child.pid for child in root.blocked[0].blocked] == [3]
+    assert tree.blocked_sessions == 3
+
+
+def test_cycle_with_waiters_is_broken_at_its_member():
+    # 3 only waits for the cycle 5 <-> 6, it must not become a root
+    tree = build_blocking_tree("db", [_row(5, [6]), _row(6, [5]), _row(3, [5])])
+
+    assert [root.pid for root in tree.roots] == [5]
+    root = tree.roots[0]
+    assert root.subtree_size == 3
+    assert sorted(child.pid for child in root.blocked) == [3, 6]
+    assert tree.blocked_sessions == 3
+
+
+def test_cycle_is_broken_at_lowest_pid_of_longer_chain():
+    # 1 -> 2 -> 10 -> 11 -> 12 -> 10
+    tree = build_blocking_tree("db", [_row(1, [2]), _row(2, [10]), _row(10, [11]), _row(11, [12]), _row(12, [10])])
+
+    assert [root.pid for root in tree.roots] == [10]
+    assert tree.roots[0].subtree_size == 5
+
+
+def test_blocker_outside_of_result_makes_root():
+    # prepared transactions are reported as pid 0
+    tree = build_blocking_tree("db", [_row(20, [0], 2)])
+
+    assert [(root.pid, root.subtree_size, root.max_wait) for root in tree.roots] == [(20, 1, 2)]
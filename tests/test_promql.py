@@ -0,0 +1,71 @@
+from pathlib import Path
+
+import pytest
+import yaml
+
+from src.promql import extract_recording_rules, parse
+
+ALERTS = yaml.safe_load((Path(__file__).parent.parent / "alerts.yaml").read_text(encoding="utf-8"))["alerts"]
+EXPRESSIONS = {alias: alert["rule"]["expr"] for alias, alert in ALERTS.items()}
+
+MAX_CONNECTIONS = (
+    "sum by (instance) (pg_settings_max_connections) - sum by (instance) (pg_settings_superuser_reserved_connections)"
+)
+
+
+@pytest.mark.parametrize("alias", EXPRESSIONS)
+def test_alert_expression_round_trip(alias: str):
+    rendered = parse(EXPRESSIONS[alias]).render()
+
+    assert parse(rendered) == parse(EXPRESSIONS[alias])
+    assert parse(rendered).render() == rendered
+
+
+def test_canonical_form_ignores_spelling():
+    rendered = parse('sum(rate(x{b="2",a="1"}[5m])) by (j, i)').render()
+
+    assert rendered == 'sum by (i, j) (rate(x{a="1",b="2"}[5m]))'
+
+
+def test_recording_rules_of_alerts():
+    recording_rules, rewritten = extract_recording_rules(EXPRESSIONS)
+
+    assert recording_rules == [
+        ("instance:pg_stat_activity_count:sum_ab88f519", "sum by (instance) (pg_stat_activity_count)"),
+        ("instance:pg_settings_max_connections:sub_f1360ebc", MAX_CONNECTIONS),
+    ]
+    assert rewritten == {
+        **EXPRESSIONS,
+        "max_connections_reached": (
+            "instance:pg_stat_activity_count:sum_ab88f519 >= instance:pg_settings_max_connections:sub_f1360ebc"
+        ),
+        "high_connections": (
+            "instance:pg_stat_activity_count:sum_ab88f519 > instance:pg_settings_max_connections:sub_f1360ebc * 0.8"
+        ),
+    }
+
+
+def test_repeated_rate_of_selector_is_not_recorded():
+    # recording a per-series `rate` would store a copy of every series
+    recording_rules, rewritten = extract_recording_rules({"cache_hit_ratio": EXPRESSIONS["cache_hit_ratio"]})
+
+    assert recording_rules == []
+    assert rewritten == {"cache_hit_ratio": EXPRESSIONS["cache_hit_ratio"]}
+
+
+def test_aggregation_without_grouping_is_named_by_level_all():
+    recording_rules, rewritten = extract_recording_rules({"a": "sum(up) > 1", "b": "sum(up) < 5"})
+
+    assert len(recording_rules) == 1
+    assert recording_rules[0][0].startswith("all:up:sum_")
+    assert rewritten["a"] == f"{recording_rules[0][0]} > 1"
+
+
+def test_unparseable_expression_is_kept_as_is():
+    expressions = {"broken": "sum(up) by (instance", "a": "sum(up) by (instance) > 1", "b": "sum(up) by (instance) < 5"}
+
+    recording_rules, rewritten = extract_recording_rules(expressions)
+
+    assert len(recording_rules) == 1
+    assert rewritten["broken"] == expressions["broken"]
+    assert rewritten["a"] == f"{recording_rules[0][0]} > 1"
@@ -0,0 +1,61 @@
+import datetime
+
+from src.modules.statements.sampler import TargetStatements
+from src.modules.statements.schemas import StatementOrder
+
+T0 = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _at(minutes: int) -> datetime.datetime:
+    return T0 + datetime.timedelta(minutes=minutes)
+
+
+def _row(queryid: int, calls: int, total_time: float) -> dict:
+    return {
+        "queryid": queryid,
+        "dbid": 1,
+        "userid": 10,
+        "query": f"SELECT {queryid}",
+        "calls": calls,
+        "total_time": total_time,
+        "rows": calls,
+        "io_blocks": 0,
+    }
+
+
+def test_statement_appeared_since_previous_sample_is_counted_whole():
+    statements = TargetStatements(max_samples=10)
+    statements.add_sample([_row(1, 100, 1000.0)], _at(0), "reset-1")
+    statements.add_sample([_row(1, 110, 1100.0), _row(2, 3, 30.0)], _at(1), "reset-1")
+
+    deltas = statements.samples[-1].deltas
+    assert deltas[(1, 1, 10)].calls == 10
+    assert deltas[(1, 1, 10)].total_time == 100.0
+    assert deltas[(2, 1, 10)].calls == 3
+
+
+def test_unchanged_statement_has_no_delta():
+    statements = TargetStatements(max_samples=10)
+    statements.add_sample([_row(1, 100, 1000.0)], _at(0), "reset-1")
+    statements.add_sample([_row(1, 100, 1000.0)], _at(1), "reset-1")
+
+    assert statements.samples[-1].deltas == {}
+
+
+def test_full_reset_starts_counters_from_zero():
+    statements = TargetStatements(max_samples=10)
+    statements.add_sample([_row(1, 100, 1000.0)], _at(0), "reset-1")
+    # more calls than before the reset, the difference would be wrong
+    statements.add_sample([_row(1, 150, 40.0)], _at(1), "reset-2")
+
+    delta = statements.samples[-1].deltas[(1, 1, 10)]
+    assert delta.calls == 150
+    assert delta.total_time == 40.0
+
+
+def test_first_sample_is_only_the_baseline():
+    statements = TargetStatements(max_samples=10)
+    statements.add_sample([_row(1, 100, 1000.0)], _at(0))
+
+    top, samples = statements.top(_at(-5), by=StatementOrder.total_time, limit=10)
+    assert top == [] and samples == []